@@ -40,8 +40,7 @@ class WechatAPIClient(LoginMixin, MessageMixin, FriendMixin, ChatroomMixin, User
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
         output = ""
-        for id in at:
-            nickname = await self.get_nickname(id)
+        for nickname in await self.get_nickname(list(at)):
             output += f"@{nickname}\u2005"
 
         output += content
@@ -0,0 +1,90 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+
+class AudioConversionCache:
+    """语音格式转换结果缓存
+
+    以 (语音内容哈希, 目标格式) 为键，转发或重复处理的同一段语音每种格式只转换一次。
+    传入消息ID时还会记住消息ID对应的哈希，同一条消息再次转换时不用重新计算哈希。
+    同一段语音的并发转换共用一次结果。
+
+    Args:
+        max_entries (int, optional): 最多缓存的转换结果数. Defaults to 256.
+        max_bytes (int, optional): 缓存最多占用的字节数. Defaults to 32 MB.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._results: OrderedDict[Tuple[bytes, str], bytes] = OrderedDict()
+        self._size = 0
+        self._aliases: OrderedDict[str, bytes] = OrderedDict()  # 消息ID -> 内容哈希
+        self._pending: Dict[Tuple[bytes, str], asyncio.Future] = {}
+
+    def _digest(self, data: bytes, msg_id: Optional[str]) -> bytes:
+        if msg_id is not None:
+            digest = self._aliases.get(msg_id)
+            if digest is not None:
+                self._aliases.move_to_end(msg_id)
+                return digest
+
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        if msg_id is not None:
+            self._aliases[msg_id] = digest
+            while len(self._aliases) > self.max_entries:
+                self._aliases.popitem(last=False)
+        return digest
+
+    def _remember(self, key: Tuple[bytes, str], result: bytes):
+        if len(result) > self.max_bytes:
+            return
+        self._results[key] = result
+        self._size += len(result)
+        while len(self._results) > self.max_entries or self._size > self.max_bytes:
+            _, evicted = self._results.popitem(last=False)
+            self._size -= len(evicted)
+
+    async def convert(self, data: bytes, fmt: str, converter: Callable[[bytes], Awaitable[bytes]],
+                      msg_id: Optional[str] = None) -> bytes:
+        """读取缓存，没有时调用 converter 转换并缓存
+
+        Args:
+            data (bytes): 原始语音
+            fmt (str): 目标格式，如 "wav"、"mp3"、"silk"
+            converter (Callable): 转换函数，data -> 转换后的 bytes
+            msg_id (str, optional): 消息ID
+
+        Returns:
+            bytes: 转换后的语音
+        """
+        key = (self._digest(data, str(msg_id) if msg_id is not None else None), fmt)
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+            return result
+
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.ensure_future(converter(data))
+            self._pending[key] = future
+
+            def done(fut: asyncio.Future):
+                self._pending.pop(key, None)
+                if not fut.cancelled() and fut.exception() is None:
+                    self._remember(key, fut.result())
+
+            future.add_done_callback(done)
+
+        return await asyncio.shield(future)
+
+    def clear(self):
+        self._results.clear()
+        self._aliases.clear()
+        self._size = 0
+
+
+audio_cache = AudioConversionCache()
@@ -1,6 +1,12 @@
+import asyncio
+import copy
+import functools
+import time
 from dataclasses import dataclass
 
 from WechatAPI.errors import *
+from .contact_directory import ContactDirectory
+from .contact_store import ContactStore
 
 
 @dataclass
@@ -31,6 +37,56 @@ class Section:
     start_pos: int
 
 
+def singleflight(ttl: float = 0):
+    """只读接口的请求合并装饰器
+
+    参数相同的并发调用共享同一个进行中的请求；ttl 大于0时，成功的结果还会在 ttl 秒内复用。
+    返回的 list/dict 为浅拷贝，调用方不要修改其中的元素。
+
+    Args:
+        ttl (float, optional): 结果复用时间（秒）. Defaults to 0.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            key = (func.__name__, self.wxid, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:  # 参数不可哈希，直接请求
+                return await func(self, *args, **kwargs)
+
+            cached = self._singleflight_results.get(key)
+            if cached is not None:
+                expire_at, result = cached
+                if time.monotonic() < expire_at:
+                    return copy.copy(result)
+                del self._singleflight_results[key]
+
+            future = self._singleflight_calls.get(key)
+            if future is None:
+                future = asyncio.ensure_future(func(self, *args, **kwargs))
+                self._singleflight_calls[key] = future
+
+                def done(fut: asyncio.Future):
+                    self._singleflight_calls.pop(key, None)
+                    if ttl > 0 and not fut.cancelled() and fut.exception() is None:
+                        now = time.monotonic()
+                        if len(self._singleflight_results) > 256:  # 顺便清理过期结果
+                            for k, (expire_at, _) in list(self._singleflight_results.items()):
+                                if expire_at <= now:
+                                    del self._singleflight_results[k]
+                        self._singleflight_results[key] = (now + ttl, fut.result())
+
+                future.add_done_callback(done)
+
+            return copy.copy(await asyncio.shield(future))
+
+        return wrapper
+
+    return decorator
+
+
 class WechatAPIClientBase:
     """微信API客户端基类
 
@@ -44,6 +100,10 @@ class WechatAPIClientBase:
         alias (str): 别名
         phone (str): 手机号
         ignore_protect (bool): 是否忽略保护机制
+        image_optimizer (ImageOptimizer): 发送图片前的压缩器，为None时原样发送
+        video_transcoder (VideoTranscoder): 发送视频前的转码器，为None时原样发送
+        contact_store (ContactStore): 联系人资料缓存
+        contact_directory (ContactDirectory): 增量同步的通讯录目录
     """
     def __init__(self, ip: str, port: int):
         self.ip = ip
@@ -55,6 +115,15 @@ class WechatAPIClientBase:
         self.phone = ""
 
         self.ignore_protect = False
+        self.image_optimizer = None
+        self.video_transcoder = None
+
+        self.contact_store = ContactStore()
+        self.contact_directory = ContactDirectory(self)
+
+        # singleflight 进行中的请求和短期结果
+        self._singleflight_calls = {}
+        self._singleflight_results = {}
 
         # 调用所有 Mixin 的初始化方法
         super().__init__()
@@ -33,6 +33,7 @@ class ChatroomMixin(WechatAPIClientBase):
             else:
                 self.error_handler(json_resp)
 
+    @singleflight(ttl=5)
     async def get_chatroom_announce(self, chatroom: str) -> dict:
         """获取群聊公告
 
@@ -57,6 +58,7 @@ class ChatroomMixin(WechatAPIClientBase):
             else:
                 self.error_handler(json_resp)
 
+    @singleflight(ttl=5)
     async def get_chatroom_info(self, chatroom: str) -> dict:
         """获取群聊信息
 
@@ -81,6 +83,7 @@ class ChatroomMixin(WechatAPIClientBase):
             else:
                 self.error_handler(json_resp)
 
+    @singleflight(ttl=5)
     async def get_chatroom_member_list(self, chatroom: str) -> list[dict]:
         """获取群聊成员列表
 
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import os
+import time
+
+from loguru import logger
+
+# 系统内置账号，不算作好友
+SPECIAL_ACCOUNTS = {
+    "weixin", "filehelper", "fmessage", "medianote", "floatbottle", "qmessage", "qqmail", "tmessage",
+    "qqsync", "newsapp", "blogapp", "facebookapp", "masssendapp", "meishiapp", "feedsapp", "voip",
+    "blogappweixin", "brandsessionholder", "weibo", "qqfriend", "voipapp", "officialaccounts",
+    "notification_messages", "wxitil", "userexperience_alarm", "exmail_tool", "mphelper",
+}
+
+
+class ContactDirectory:
+    """通讯录目录。
+
+    记录 GetContractList 的 seq 游标，之后只同步增量；目录持久化到磁盘，重启后无需从头翻页。
+    超过 full_sync_interval 秒会从头全量同步一次，以清理已删除的联系人。
+
+    Args:
+        client: WechatAPIClient实例
+        path (str, optional): 持久化文件路径. Defaults to "database/contact_directory.json".
+        sync_interval (int, optional): 读取视图时距上次同步超过多少秒才重新同步. Defaults to 300.
+        full_sync_interval (int, optional): 全量同步间隔（秒）. Defaults to 86400.
+    """
+
+    def __init__(self, client, path: str = None, sync_interval: int = 300, full_sync_interval: int = 86400):
+        self.client = client
+        self.path = path or os.path.join("database", "contact_directory.json")
+        self.sync_interval = sync_interval
+        self.full_sync_interval = full_sync_interval
+
+        self.owner = ""
+        self.wx_seq = 0
+        self.chatroom_seq = 0
+        self.contacts: set[str] = set()
+        self.synced_at = 0.0
+        self.full_synced_at = 0.0
+
+        self._lock = asyncio.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.owner = data.get("owner", "")
+            self.wx_seq = data.get("wx_seq", 0)
+            self.chatroom_seq = data.get("chatroom_seq", 0)
+            self.contacts = set(data.get("contacts", []))
+            self.full_synced_at = data.get("full_synced_at", 0.0)
+        except Exception as e:
+            logger.warning("读取通讯录目录失败，将重新同步: {}", e)
+
+    def _save(self):
+        data = {
+            "owner": self.owner,
+            "wx_seq": self.wx_seq,
+            "chatroom_seq": self.chatroom_seq,
+            "full_synced_at": self.full_synced_at,
+            "contacts": sorted(self.contacts),
+        }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _reset(self):
+        self.wx_seq, self.chatroom_seq = 0, 0
+        self.contacts = set()
+
+    async def sync(self, full: bool = False) -> set[str]:
+        """从上次的seq开始同步通讯录
+
+        Args:
+            full (bool, optional): 是否从头全量同步. Defaults to False.
+
+        Returns:
+            set[str]: 本次同步到的wxid
+        """
+        async with self._lock:
+            if self.owner != self.client.wxid:  # 换号后目录作废
+                self.owner = self.client.wxid
+                self._reset()
+                full = True
+            full = full or time.time() - self.full_synced_at > self.full_sync_interval
+
+            wx_seq, chatroom_seq = (0, 0) if full else (self.wx_seq, self.chatroom_seq)
+            synced = set()
+            while True:
+                contact_list = await self.client.get_contract_list(wx_seq, chatroom_seq)
+                synced.update(contact_list.get("ContactUsernameList") or [])
+                wx_seq = contact_list["CurrentWxcontactSeq"]
+                chatroom_seq = contact_list["CurrentChatRoomContactSeq"]
+                if contact_list["CountinueFlag"] != 1:
+                    break
+
+            if full:
+                self.contacts = synced
+                self.full_synced_at = time.time()
+            else:
+                self.contacts.update(synced)
+            self.wx_seq, self.chatroom_seq = wx_seq, chatroom_seq
+            self.synced_at = time.time()
+            self._save()
+
+        logger.debug("通讯录目录同步完成: {} 本次{}个 共{}个", "全量" if full else "增量", len(synced), len(self.contacts))
+        return synced
+
+    async def _ensure(self):
+        if time.time() - self.synced_at > self.sync_interval or self.owner != self.client.wxid:
+            await self.sync()
+
+    def add(self, wxid: str):
+        """添加联系人到目录"""
+        self.contacts.add(wxid)
+
+    def remove(self, wxid: str):
+        """从目录中移除联系人"""
+        self.contacts.discard(wxid)
+
+    async def all(self) -> list[str]:
+        """全部联系人wxid"""
+        await self._ensure()
+        return sorted(self.contacts)
+
+    async def chatrooms(self) -> list[str]:
+        """群聊wxid"""
+        await self._ensure()
+        return sorted(wxid for wxid in self.contacts if wxid.endswith("@chatroom"))
+
+    async def official_accounts(self) -> list[str]:
+        """公众号wxid"""
+        await self._ensure()
+        return sorted(wxid for wxid in self.contacts if wxid.startswith("gh_"))
+
+    async def friends(self) -> list[str]:
+        """好友wxid（不含群聊、公众号和系统账号）"""
+        await self._ensure()
+        return sorted(wxid for wxid in self.contacts
+                      if not wxid.endswith("@chatroom") and not wxid.startswith("gh_")
+                      and wxid not in SPECIAL_ACCOUNTS and wxid != self.client.wxid)
@@ -0,0 +1,172 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from loguru import logger
+
+
+class ContactStore:
+    """联系人资料缓存，内存LRU + SQLite持久化。
+
+    保存昵称、微信号和头像，超过 ttl 后视为过期需重新获取；查询不到的wxid也会缓存
+    negative_ttl 秒，避免反复请求服务器。
+    写入先更新内存，SQLite写入交给单独的线程按顺序执行，不阻塞事件循环；批量写入只提交一次。
+
+    Args:
+        path (str, optional): SQLite文件路径. Defaults to "database/contact_store.db".
+        ttl (int, optional): 资料有效期（秒）. Defaults to 86400.
+        negative_ttl (int, optional): 查询不到的联系人缓存时间（秒）. Defaults to 600.
+        max_entries (int, optional): 内存中最多缓存的联系人数. Defaults to 5000.
+    """
+
+    def __init__(self, path: str = None, ttl: int = 86400, negative_ttl: int = 600, max_entries: int = 5000):
+        self.path = path or os.path.join("database", "contact_store.db")
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+
+        self._memory: OrderedDict[str, tuple[Optional[dict], float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 首次使用时才打开数据库；读在调用线程，写在 _writer 线程，各用一个连接
+        self._conn: Optional[sqlite3.Connection] = None
+        self._write_conn: Optional[sqlite3.Connection] = None
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="contact_store")
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")  # 写入时不阻塞读取
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS contact ("
+            "wxid TEXT PRIMARY KEY, nickname TEXT, alias TEXT, avatar TEXT, "
+            "missing INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL)"
+        )
+        conn.commit()
+        return conn
+
+    def _read(self, wxid: str):
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn.execute(
+            "SELECT nickname, alias, avatar, missing, updated_at FROM contact WHERE wxid = ?", (wxid,)
+        ).fetchone()
+
+    def _write(self, sql: str, rows: list):
+        """在写线程中执行，多行只提交一次"""
+        try:
+            if self._write_conn is None:
+                self._write_conn = self._connect()
+            self._write_conn.executemany(sql, rows)
+            self._write_conn.commit()
+        except Exception as e:
+            logger.error("写入联系人缓存失败: {}", e)
+
+    def _submit(self, sql: str, rows: list):
+        if rows:
+            self._writer.submit(self._write, sql, rows)
+
+    @staticmethod
+    def parse_contact(contact: dict) -> Optional[dict]:
+        """从 GetContact/GetContractDetail 返回的联系人中提取资料，无效联系人返回None"""
+        wxid = (contact.get("UserName") or {}).get("string", "")
+        nickname = (contact.get("NickName") or {}).get("string", "")
+        if not wxid or not nickname:
+            return None
+        return {
+            "wxid": wxid,
+            "nickname": nickname,
+            "alias": contact.get("Alias", "") or "",
+            "avatar": contact.get("BigHeadImgUrl", "") or contact.get("SmallHeadImgUrl", "") or "",
+        }
+
+    def _remember(self, wxid: str, record: Optional[dict], updated_at: float):
+        self._memory[wxid] = (record, updated_at)
+        self._memory.move_to_end(wxid)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _is_fresh(self, record: Optional[dict], updated_at: float) -> bool:
+        ttl = self.ttl if record is not None else self.negative_ttl
+        return time.time() - updated_at < ttl
+
+    def lookup(self, wxid: str) -> tuple[bool, Optional[dict]]:
+        """查询缓存
+
+        Returns:
+            tuple[bool, Optional[dict]]: (是否命中, 资料)。命中但资料为None表示该联系人不存在
+        """
+        with self._lock:
+            entry = self._memory.get(wxid)
+            if entry is None:
+                row = self._read(wxid)
+                if row is None:
+                    return False, None
+                nickname, alias, avatar, missing, updated_at = row
+                record = None if missing else {"wxid": wxid, "nickname": nickname, "alias": alias, "avatar": avatar}
+                entry = (record, updated_at)
+                self._remember(wxid, *entry)
+            else:
+                self._memory.move_to_end(wxid)
+
+        record, updated_at = entry
+        if not self._is_fresh(record, updated_at):
+            return False, record
+        return True, record
+
+    def _put_many(self, records: list[dict]):
+        now = time.time()
+        with self._lock:
+            for record in records:
+                wxid = record["wxid"]
+                old = self._memory.get(wxid, (None, 0))[0]
+                if old and (old["nickname"], old["avatar"]) != (record["nickname"], record["avatar"]):
+                    logger.debug("联系人资料变更: {} {} -> {}", wxid, old["nickname"], record["nickname"])
+                self._remember(wxid, record, now)
+        self._submit(
+            "INSERT OR REPLACE INTO contact (wxid, nickname, alias, avatar, missing, updated_at) "
+            "VALUES (?, ?, ?, ?, 0, ?)",
+            [(record["wxid"], record["nickname"], record["alias"], record["avatar"], now) for record in records]
+        )
+
+    def put(self, record: dict):
+        """写入联系人资料，昵称/头像有变化时记录日志"""
+        self._put_many([record])
+
+    def put_missing(self, wxid: str):
+        """记录查询不到的联系人"""
+        now = time.time()
+        with self._lock:
+            self._remember(wxid, None, now)
+        self._submit(
+            "INSERT OR REPLACE INTO contact (wxid, nickname, alias, avatar, missing, updated_at) "
+            "VALUES (?, '', '', '', 1, ?)",
+            [(wxid, now)]
+        )
+
+    def update_from_contacts(self, contacts: list[dict]):
+        """用服务器返回的联系人列表刷新缓存，整批只写入一次"""
+        records = [record for record in map(self.parse_contact, contacts or []) if record]
+        if records:
+            self._put_many(records)
+
+    def invalidate(self, wxid: str):
+        """使联系人缓存失效，下次查询时重新获取"""
+        with self._lock:
+            # 记为已过期而不是直接删除，删除写入数据库之前的查询不会读到旧记录
+            self._remember(wxid, None, 0)
+        self._submit("DELETE FROM contact WHERE wxid = ?", [(wxid,)])
+
+    def close(self):
+        """等待未完成的写入后关闭数据库"""
+        self._writer.shutdown(wait=True)
+        for conn in (self._conn, self._write_conn):
+            if conn is not None:
+                conn.close()
+        self._conn = self._write_conn = None
@@ -3,6 +3,7 @@ from typing import Union
 import aiohttp
 
 from .base import *
+from .loader import BatchLoader
 from .protect import protector
 from ..errors import *
 
@@ -67,6 +68,7 @@ class FriendMixin(WechatAPIClientBase):
 
             if json_resp.get("Success"):
                 contact_list = json_resp.get("Data").get("ContactList")
+                self.contact_store.update_from_contacts(contact_list)
                 if len(contact_list) == 1:
                     return contact_list[0]
                 else:
@@ -99,10 +101,13 @@ class FriendMixin(WechatAPIClientBase):
             json_resp = await response.json()
 
             if json_resp.get("Success"):
-                return json_resp.get("Data").get("ContactList")
+                contact_list = json_resp.get("Data").get("ContactList")
+                self.contact_store.update_from_contacts(contact_list)
+                return contact_list
             else:
                 self.error_handler(json_resp)
 
+    @singleflight()
     async def get_contract_list(self, wx_seq: int = 0, chatroom_seq: int = 0) -> dict:
         """获取联系人列表
 
@@ -126,27 +131,75 @@ class FriendMixin(WechatAPIClientBase):
             else:
                 self.error_handler(json_resp)
 
+    async def _fetch_contact_batch(self, wxids: list[str]) -> dict[str, dict]:
+        """BatchLoader的批量查询函数，每批最多20个wxid"""
+        data = await self.get_contract_detail(wxids)
+        return {(contact.get("UserName") or {}).get("string", ""): contact for contact in data or []}
+
+    @property
+    def contact_loader(self) -> BatchLoader:
+        """联系人详情请求合并器，短时间内的单个查询会合并成20个一批"""
+        if getattr(self, "_contact_loader", None) is None:
+            self._contact_loader = BatchLoader(self._fetch_contact_batch, max_batch_size=20)
+        return self._contact_loader
+
+    async def load_contacts(self, wxids: list[str]) -> list[dict]:
+        """批量获取联系人详情，不限数量
+
+        并发的查询会被合并成每批20个、有限并发的 GetContractDetail 请求。
+
+        Args:
+            wxids: 联系人wxid列表
+
+        Returns:
+            list[dict]: 与输入顺序对应的联系人详情，查询不到时为空字典
+        """
+        return [contact or {} for contact in await self.contact_loader.load_many(wxids)]
+
+    async def get_contact_profile(self, wxid: Union[str, list[str]]) -> Union[dict, list[dict]]:
+        """获取联系人资料（昵称、微信号、头像），优先读取本地缓存
+
+        Args:
+            wxid: 用户wxid，可以是单个wxid或wxid列表
+
+        Returns:
+            Union[dict, list[dict]]: {"wxid", "nickname", "alias", "avatar"}，查询不到时为空字典
+        """
+        wxids = [wxid] if isinstance(wxid, str) else list(wxid)
+
+        profiles = {}
+        missing = []
+        for id in wxids:
+            hit, record = self.contact_store.lookup(id)
+            if hit:
+                profiles[id] = record or {}
+            elif id not in missing:
+                missing.append(id)
+
+        for id, contact in zip(missing, await self.load_contacts(missing)):
+            record = self.contact_store.parse_contact(contact)
+            if record:
+                profiles[id] = record
+            else:
+                self.contact_store.put_missing(id)
+                profiles[id] = {}
+
+        if isinstance(wxid, str):
+            return profiles[wxid]
+        return [profiles[id] for id in wxids]
+
     async def get_nickname(self, wxid: Union[str, list[str]]) -> Union[str, list[str]]:
-        """获取用户昵称
+        """获取用户昵称，优先读取本地缓存
 
         Args:
-            wxid: 用户wxid，可以是单个wxid或最多20个wxid的列表
+            wxid: 用户wxid，可以是单个wxid或wxid列表
 
         Returns:
             Union[str, list[str]]: 如果输入单个wxid返回str，如果输入wxid列表则返回对应的昵称列表
         """
-        data = await self.get_contract_detail(wxid)
+        profile = await self.get_contact_profile(wxid)
 
         if isinstance(wxid, str):
-            try:
-                return data[0].get("NickName").get("string")
-            except:
-                return ""
+            return profile.get("nickname", "")
         else:
-            result = []
-            for contact in data:
-                try:
-                    result.append(contact.get("NickName").get("string"))
-                except:
-                    result.append("")
-            return result
+            return [p.get("nickname", "") for p in profile]
@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+import io
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Tuple
+
+from loguru import logger
+
+from .media import Base64Media, MediaInput
+
+
+class ImageOptimizer:
+    """发送前压缩图片
+
+    超过 max_dimension 的图片等比缩小，再重新编码为 JPEG（带透明通道的保持 PNG）；
+    小于 min_bytes 的图片、动图和压缩后反而更大的图片原样发送。
+    压缩在线程池中执行（Pillow 编解码时释放GIL），结果按内容哈希缓存，同一张图片重复发送时不再压缩。
+
+    Args:
+        max_dimension (int, optional): 最长边像素. Defaults to 1920.
+        quality (int, optional): JPEG 质量. Defaults to 85.
+        min_bytes (int, optional): 小于该字节数的图片不压缩. Defaults to 200 KB.
+        workers (int, optional): 压缩线程数. Defaults to 2.
+        cache_entries (int, optional): 最多缓存的图片数. Defaults to 128.
+        cache_bytes (int, optional): 缓存最多占用的字节数. Defaults to 64 MB.
+    """
+
+    def __init__(self, max_dimension: int = 1920, quality: int = 85, min_bytes: int = 200 * 1024,
+                 workers: int = 2, cache_entries: int = 128, cache_bytes: int = 64 * 1024 * 1024):
+        try:
+            from PIL import Image, ImageOps
+        except ImportError as e:
+            raise ImportError("发送前压缩图片需要安装Pillow: pip install Pillow") from e
+        self._image = Image
+        self._image_ops = ImageOps
+
+        self.max_dimension = max_dimension
+        self.quality = quality
+        self.min_bytes = min_bytes
+        self.cache_entries = cache_entries
+        self.cache_bytes = cache_bytes
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-optimizer")
+        self._cache: OrderedDict[bytes, bytes] = OrderedDict()
+        self._cache_size = 0
+        self._pending: Dict[bytes, asyncio.Future] = {}
+
+    async def optimize(self, image: MediaInput) -> MediaInput:
+        """压缩图片，不需要压缩或压缩失败时返回原图
+
+        Args:
+            image (str, bytes, memoryview, os.PathLike, MediaFile): 与 send_image_message 相同
+
+        Returns:
+            压缩后的图片 bytes，或原样返回的 image
+        """
+        media = Base64Media(image)
+        if media.raw_size < self.min_bytes:
+            return image
+
+        loop = asyncio.get_running_loop()
+        data = media.read()  # bytes 输入不复制；MediaFile 在 Base64Media 中已换成 bytes 或文件路径
+        key = await loop.run_in_executor(self._executor, self._digest, data)
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached if cached else image
+
+        future = self._pending.get(key)
+        if future is None:
+            future = loop.run_in_executor(self._executor, self._optimize, data)
+            self._pending[key] = future
+            try:
+                result, size = await future
+            finally:
+                self._pending.pop(key, None)
+            self._remember(key, result)
+            if result:
+                logger.debug("压缩图片: {}字节 -> {}字节 尺寸:{}", len(data), len(result), size)
+        else:
+            result, _ = await asyncio.shield(future)
+
+        return result if result else image
+
+    def _digest(self, data) -> bytes:
+        return hashlib.blake2b(data, digest_size=16,
+                               person=f"{self.max_dimension}:{self.quality}".encode()[:16]).digest()
+
+    def _remember(self, key: bytes, result: bytes):
+        # 不需要压缩的图片缓存空结果，下次直接跳过
+        self._cache[key] = result
+        self._cache_size += len(result)
+        while self._cache and (len(self._cache) > self.cache_entries or self._cache_size > self.cache_bytes):
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_size -= len(evicted)
+
+    def _optimize(self, data) -> Tuple[bytes, Tuple[int, int]]:
+        """在线程池中执行，返回 (压缩后的图片, 尺寸)，不需要压缩时返回空bytes"""
+        try:
+            with self._image.open(io.BytesIO(data)) as original:
+                if getattr(original, "is_animated", False):
+                    return b"", original.size
+
+                # 重新编码不保留EXIF，先按方向标记旋转，否则手机竖拍的照片发出去是横的
+                img = self._image_ops.exif_transpose(original)
+                img.thumbnail((self.max_dimension, self.max_dimension), self._image.LANCZOS)
+                output = io.BytesIO()
+                if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+                    img.save(output, format="PNG", optimize=True)
+                else:
+                    img.convert("RGB").save(output, format="JPEG", quality=self.quality, optimize=True,
+                                            progressive=True)
+                size = img.size
+        except Exception as e:
+            logger.warning("压缩图片失败，发送原图: {}", e)
+            return b"", (0, 0)
+
+        result = output.getvalue()
+        return (result, size) if len(result) < len(data) else (b"", size)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,106 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional
+
+
+class BatchLoader:
+    """请求合并器（DataLoader）。
+
+    在 window 秒内发起的单个查询会被合并成最多 max_batch_size 个一批，
+    以最多 max_concurrency 个并发请求发出，结果再分发给各个调用方。
+    同一个 key 在等待或请求中时不会重复查询。不再使用时调用 close 取消未完成的请求。
+
+    Args:
+        batch_fn (Callable): 批量查询函数，接收key列表，返回 {key: value} 字典，缺失的key结果为None
+        max_batch_size (int, optional): 每批最多的key数量. Defaults to 20.
+        window (float, optional): 合并等待时间（秒）. Defaults to 0.005.
+        max_concurrency (int, optional): 同时进行的批量请求数. Defaults to 4.
+    """
+
+    def __init__(self, batch_fn: Callable[[list], Awaitable[dict]], max_batch_size: int = 20,
+                 window: float = 0.005, max_concurrency: int = 4):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self.max_concurrency = max_concurrency
+
+        self._pending: dict[Hashable, asyncio.Future] = {}
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # 保留进行中的批量请求任务的引用，避免任务在完成前被垃圾回收
+        self._tasks: set[asyncio.Task] = set()
+
+    async def load(self, key: Hashable) -> Any:
+        """查询单个key"""
+        future = self._pending.get(key) or self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.window, self._flush)
+
+        # shield: 某个调用方被取消时不影响共享同一结果的其他调用方
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: Iterable[Hashable]) -> list:
+        """查询多个key，按输入顺序返回结果"""
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+        self._inflight.update(pending)
+
+        keys = list(pending)
+        for i in range(0, len(keys), self.max_batch_size):
+            chunk = keys[i:i + self.max_batch_size]
+            task = asyncio.create_task(self._dispatch({key: pending[key] for key in chunk}))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def close(self):
+        """取消等待合并和进行中的请求，等待结果的调用方会收到 CancelledError"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.cancel()
+
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def _dispatch(self, batch: dict[Hashable, asyncio.Future]):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        try:
+            async with self._semaphore:
+                results = await self.batch_fn(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+                    # 避免没有调用方等待时出现 "exception was never retrieved"
+                    future.exception()
+        else:
+            for key, future in batch.items():
+                if not future.done():
+                    future.set_result((results or {}).get(key))
+        finally:
+            for key, future in batch.items():
+                if not future.done():  # 任务被取消
+                    future.cancel()
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
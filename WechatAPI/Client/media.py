@@ -0,0 +1,366 @@
+import binascii
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import weakref
+from pathlib import Path
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterator, Optional, Tuple, Union
+
+import aiohttp
+
+# 每次编码的原始字节数，必须是3的倍数，分块编码的结果才能直接拼接
+CHUNK_SIZE = 3 * 64 * 1024
+
+# 下载的媒体超过该大小时写入磁盘临时文件
+SPOOL_THRESHOLD = 8 * 1024 * 1024
+
+_BUFFER_KEY = re.compile(rb'"buffer"\s*:\s*"')
+_JSON_ESCAPE = re.compile(rb"\\(.)", re.S)
+# base64字符串中可能出现的JSON转义："\/" 还原为 "/"，编码器插入的换行和缩进直接去掉
+_BASE64_ESCAPES = {b"/": b"/", b"n": b"", b"r": b"", b"t": b""}
+
+
+def _unescape_base64(data: bytes) -> Tuple[bytes, bytes]:
+    """去掉base64字符串中的JSON转义
+
+    Returns:
+        Tuple[bytes, bytes]: (去掉转义后的数据, 末尾被分块截断、留到下一块的反斜杠)
+    """
+    carry = b""
+    if (len(data) - len(data.rstrip(b"\\"))) % 2:
+        data, carry = data[:-1], b"\\"
+
+    def replace(match: re.Match) -> bytes:
+        escaped = _BASE64_ESCAPES.get(match.group(1))
+        if escaped is None:
+            raise ValueError(f"媒体数据包含无法识别的转义: {match.group(0)!r}")
+        return escaped
+
+    return _JSON_ESCAPE.sub(replace, data), carry
+
+
+def _strip_data_url(data: str) -> str:
+    # 去掉 "data:image/png;base64," 这类头部
+    comma = data.find(",", 0, 128)
+    return data[comma + 1:] if comma != -1 else data
+
+
+def decode_base64(data: str) -> bytes:
+    """把服务器返回的base64字符串解码为bytes，不产生中间的ASCII副本"""
+    if not data:
+        return b""
+    return binascii.a2b_base64(_strip_data_url(data))
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class MediaFile:
+    """下载得到的媒体数据
+
+    小于 threshold 时保存在内存中，超过后转存到磁盘临时文件，大附件不会占用大量内存。
+    消息在各插件之间深拷贝时共用同一个对象；XYBot 在消息处理结束后调用 close() 删除临时文件，
+    需要在处理结束后继续使用的插件先调用 keep()，之后由对象被回收时删除，或用 save() 另存。
+
+    Args:
+        threshold (int, optional): 内存中最多保存的字节数. Defaults to SPOOL_THRESHOLD.
+        directory (str, optional): 临时文件目录，默认系统临时目录
+    """
+
+    def __init__(self, threshold: int = SPOOL_THRESHOLD, directory: Optional[str] = None):
+        self.threshold = threshold
+        self.directory = directory
+        self.size = 0
+        self._buffer: Optional[bytearray] = bytearray()
+        self._data: Optional[bytes] = None
+        self._file: Optional[BinaryIO] = None
+        self._path: Optional[str] = None
+        self._finalizer: Optional[weakref.finalize] = None
+        self._kept = False
+        self.closed = False
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "MediaFile":
+        media = cls()
+        media._buffer, media._data, media.size = None, bytes(data), len(data)
+        return media
+
+    def _spill(self) -> BinaryIO:
+        fd, self._path = tempfile.mkstemp(prefix="xybot-media-", dir=self.directory)
+        self._finalizer = weakref.finalize(self, _remove, self._path)
+        return os.fdopen(fd, "wb")
+
+    def write(self, data: bytes):
+        """追加数据，超过阈值时把已有数据转存到临时文件"""
+        self.size += len(data)
+        if self._file is None and self.size > self.threshold:
+            self._file = self._spill()
+            self._file.write(self._buffer)
+            self._buffer = None
+        if self._file is not None:
+            self._file.write(data)
+        else:
+            self._buffer += data
+
+    def finish(self) -> "MediaFile":
+        """写入完成"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        elif self._buffer is not None:
+            self._data, self._buffer = bytes(self._buffer), None
+        return self
+
+    @property
+    def in_memory(self) -> bool:
+        return self._data is not None
+
+    @property
+    def path(self) -> str:
+        """文件路径；数据在内存中时先写入临时文件"""
+        if self._path is None:
+            with self._spill() as f:
+                f.write(self._data or b"")
+        return self._path
+
+    def open(self) -> BinaryIO:
+        """打开一个独立的只读文件对象，用完后关闭"""
+        if self.closed:
+            raise ValueError("MediaFile已关闭")
+        if self._data is not None:
+            return io.BytesIO(self._data)
+        return open(self._path, "rb")
+
+    def read(self) -> bytes:
+        """读取全部数据，大文件请使用 open() 分块读取"""
+        if self._data is not None:
+            return self._data
+        with self.open() as f:
+            return f.read()
+
+    def save(self, dest: Union[str, os.PathLike]) -> str:
+        """另存到 dest，返回目标路径"""
+        if self._data is not None:
+            with open(dest, "wb") as f:
+                f.write(self._data)
+        else:
+            shutil.copyfile(self._path, dest)
+        return os.fspath(dest)
+
+    def keep(self) -> "MediaFile":
+        """消息处理结束后不删除，直到对象被回收"""
+        self._kept = True
+        return self
+
+    def close(self, force: bool = False):
+        """释放数据并删除临时文件；调用过 keep() 时只有 force=True 才会释放"""
+        if self._kept and not force:
+            return
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._finalizer is not None:
+            self._finalizer()
+        self._buffer = self._data = None
+        self.closed = True
+
+    def __bytes__(self) -> bytes:
+        return self.read()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __enter__(self) -> "MediaFile":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(force=True)
+
+    def __copy__(self) -> "MediaFile":
+        return self
+
+    def __deepcopy__(self, memo) -> "MediaFile":
+        # 各插件共用同一份数据
+        return self
+
+    def __repr__(self) -> str:
+        where = "内存" if self._data is not None else self._path
+        return f"<MediaFile {self.size} bytes {where}>"
+
+
+async def read_json_media(response: aiohttp.ClientResponse, threshold: int = SPOOL_THRESHOLD,
+                          directory: Optional[str] = None) -> Tuple[dict, Optional[MediaFile]]:
+    """边接收边解码响应中 "buffer" 字段的base64数据
+
+    媒体数据直接解码写入 MediaFile，不生成完整的响应字符串；其余字段照常解析，"buffer" 的值替换为空字符串。
+
+    Returns:
+        Tuple[dict, Optional[MediaFile]]: (解析后的JSON, 媒体数据)，响应中没有 "buffer" 字符串时媒体数据为None
+    """
+    head = bytearray()
+    tail = bytearray()
+    media: Optional[MediaFile] = None
+    pending = b""  # 不足4个字符、留到下一块解码的base64
+    escape = b""  # 块末尾被截断的转义
+    state = "head"
+
+    try:
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            if state == "head":
+                start = max(0, len(head) - 16)
+                head += chunk
+                match = _BUFFER_KEY.search(head, start)
+                if match is None:
+                    continue
+                chunk = bytes(head[match.end():])
+                del head[match.end():]
+                media = MediaFile(threshold, directory)
+                state = "buffer"
+
+            if state == "buffer":
+                end = chunk.find(b'"')
+                data = escape + (chunk if end == -1 else chunk[:end])
+                escape = b""
+                if b"\\" in data:  # 部分JSON编码器会把 "/" 转义为 "\/"，或每76个字符插入 "\n"
+                    data, escape = _unescape_base64(data)
+                data = pending + data
+                usable = len(data) - len(data) % 4
+                if usable:
+                    media.write(binascii.a2b_base64(data[:usable]))
+                pending = data[usable:]
+                if end == -1:
+                    continue
+                if pending:
+                    media.write(binascii.a2b_base64(pending + b"=" * (-len(pending) % 4)))
+                media.finish()
+                chunk = chunk[end:]
+                state = "tail"
+
+            tail += chunk
+    except Exception:
+        if media is not None:
+            media.close(force=True)
+        raise
+
+    if state == "buffer":  # 响应不完整
+        media.close(force=True)
+        raise ValueError("媒体数据不完整")
+    if media is None:
+        return json.loads(head), None
+    return json.loads(head + tail), media
+
+
+class Base64Media:
+    """发送时才编码为base64的媒体数据
+
+    bytes/memoryview 和文件在构建请求体时按块编码，不生成完整的base64字符串；
+    已经是base64字符串的直接按块发送，不再解码。
+
+    Args:
+        media (str, bytes, bytearray, memoryview, os.PathLike, MediaFile): base64字符串、字节数据、文件路径或下载的媒体
+    """
+
+    __slots__ = ("kind", "source", "size")
+
+    def __init__(self, media: "MediaInput"):
+        if isinstance(media, MediaFile):
+            media = media.read() if media.in_memory else Path(media.path)
+        if isinstance(media, str):
+            self.kind, self.source = "base64", _strip_data_url(media)
+            self.size = len(self.source)
+        elif isinstance(media, (bytes, bytearray, memoryview)):
+            self.kind, self.source = "bytes", memoryview(media).cast("B")
+            self.size = (len(self.source) + 2) // 3 * 4
+        elif isinstance(media, os.PathLike):
+            self.kind, self.source = "file", os.fspath(media)
+            self.size = (os.path.getsize(self.source) + 2) // 3 * 4
+        else:
+            raise ValueError("media should be str, bytes, memoryview, os.PathLike, or MediaFile")
+
+    @property
+    def raw_size(self) -> int:
+        """解码后的字节数"""
+        if self.kind == "bytes":
+            return len(self.source)
+        if self.kind == "file":
+            return os.path.getsize(self.source)
+        return len(self.source) // 4 * 3 - self.source[-2:].count("=")
+
+    def open(self) -> BinaryIO:
+        """以二进制文件的形式读取原始数据，用完后关闭"""
+        if self.kind == "bytes":
+            return io.BytesIO(self.source)
+        if self.kind == "file":
+            return open(self.source, "rb")
+        return io.BytesIO(binascii.a2b_base64(self.source))
+
+    def read(self) -> bytes:
+        """读取全部原始数据"""
+        if self.kind == "bytes":
+            obj = self.source.obj
+            return obj if isinstance(obj, bytes) and len(obj) == len(self.source) else self.source.tobytes()
+        with self.open() as f:
+            return f.read()
+
+    def chunks(self) -> Iterator[bytes]:
+        """按块生成base64编码后的数据"""
+        if self.kind == "bytes":
+            for start in range(0, len(self.source), CHUNK_SIZE):
+                yield binascii.b2a_base64(self.source[start:start + CHUNK_SIZE], newline=False)
+        elif self.kind == "file":
+            with open(self.source, "rb") as f:
+                while chunk := f.read(CHUNK_SIZE):
+                    yield binascii.b2a_base64(chunk, newline=False)
+        else:
+            step = CHUNK_SIZE // 3 * 4
+            for start in range(0, len(self.source), step):
+                yield self.source[start:start + step].encode("ascii")
+
+
+MediaInput = Union[str, bytes, bytearray, memoryview, os.PathLike, MediaFile]
+
+
+def json_body(params: Dict[str, Any]) -> Dict[str, Any]:
+    """生成 session.post 的参数，其中的 Base64Media 在发送时按块编码写入请求体
+
+    没有 Base64Media 时与 json=params 相同。
+
+    例子:
+
+    - await session.post(url, **json_body({"Wxid": wxid, "Base64": Base64Media(image)}))
+    """
+    if not any(isinstance(value, Base64Media) for value in params.values()):
+        return {"json": params}
+
+    parts = []
+    size = 0
+    prefix = "{"
+    for key, value in params.items():
+        if isinstance(value, Base64Media):
+            head = f'{prefix}{json.dumps(key)}: "'.encode()
+            parts += [head, value, b'"']
+            size += len(head) + value.size + 1
+        else:
+            part = f"{prefix}{json.dumps(key)}: {json.dumps(value)}".encode()
+            parts.append(part)
+            size += len(part)
+        prefix = ", "
+    parts.append(b"}")
+    size += 1
+
+    async def body() -> AsyncIterator[bytes]:
+        for part in parts:
+            if isinstance(part, Base64Media):
+                for chunk in part.chunks():
+                    yield chunk
+            else:
+                yield part
+
+    return {"data": body(), "headers": {"Content-Type": "application/json", "Content-Length": str(size)}}
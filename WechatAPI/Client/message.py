@@ -1,11 +1,9 @@
 import asyncio
-import base64
 import os
 from asyncio import Future
 from asyncio import Queue, sleep
-from io import BytesIO
 from pathlib import Path
-from typing import Union
+from typing import Optional, Union
 
 import aiohttp
 import pysilk
@@ -14,6 +12,7 @@ from pydub import AudioSegment
 from pymediainfo import MediaInfo
 
 from .base import *
+from .media import Base64Media, MediaInput, json_body
 from .protect import protector
 from ..errors import *
 
@@ -145,12 +144,12 @@ class MessageMixin(WechatAPIClientBase):
             else:
                 self.error_handler(json_resp)
 
-    async def send_image_message(self, wxid: str, image: Union[str, bytes, os.PathLike]) -> tuple[int, int, int]:
+    async def send_image_message(self, wxid: str, image: MediaInput) -> tuple[int, int, int]:
         """发送图片消息。
 
         Args:
             wxid (str): 接收人wxid
-            image (str, byte, os.PathLike): 图片，支持base64字符串，图片byte，图片路径
+            image (str, bytes, memoryview, os.PathLike): 图片，支持base64字符串，图片byte，图片路径
 
         Returns:
             tuple[int, int, int]: 返回(ClientImgId, CreateTime, NewMsgId)
@@ -163,44 +162,40 @@ class MessageMixin(WechatAPIClientBase):
         """
         return await self._queue_message(self._send_image_message, wxid, image)
 
-    async def _send_image_message(self, wxid: str, image: Union[str, bytes, os.PathLike]) -> tuple[
-        int, int, int]:
+    async def _send_image_message(self, wxid: str, image: MediaInput) -> tuple[int, int, int]:
         if not self.wxid:
             raise UserLoggedOut("请先登录")
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        if isinstance(image, str):
-            pass
-        elif isinstance(image, bytes):
-            image = base64.b64encode(image).decode()
-        elif isinstance(image, os.PathLike):
-            with open(image, 'rb') as f:
-                image = base64.b64encode(f.read()).decode()
-        else:
-            raise ValueError("Argument 'image' can only be str, bytes, or os.PathLike")
+        if self.image_optimizer is not None:
+            image = await self.image_optimizer.optimize(image)
+
+        try:
+            image = Base64Media(image)
+        except ValueError:
+            raise ValueError("Argument 'image' can only be str, bytes, memoryview, or os.PathLike") from None
 
         async with aiohttp.ClientSession() as session:
+            # 图片在写入请求体时才分块编码为base64
             json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": image}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendImageMsg', json=json_param)
+            response = await session.post(f'http://{self.ip}:{self.port}/SendImageMsg', **json_body(json_param))
             json_resp = await response.json()
 
             if json_resp.get("Success"):
-                json_param.pop('Base64')
                 logger.info("发送图片消息: 对方wxid:{} 图片base64略", wxid)
                 data = json_resp.get("Data")
                 return data.get("ClientImgId").get("string"), data.get("CreateTime"), data.get("Newmsgid")
             else:
                 self.error_handler(json_resp)
 
-    async def send_video_message(self, wxid: str, video: Union[str, bytes, os.PathLike],
-                                 image: [str, bytes, os.PathLike] = None):
+    async def send_video_message(self, wxid: str, video: MediaInput, image: MediaInput = None):
         """发送视频消息。不推荐使用，上传速度很慢300KB/s。如要使用，可压缩视频，或者发送链接卡片而不是视频。
 
                 Args:
                     wxid (str): 接收人wxid
-                    video (str, bytes, os.PathLike): 视频 接受base64字符串，字节，文件路径
-                    image (str, bytes, os.PathLike): 视频封面图片 接受base64字符串，字节，文件路径
+                    video (str, bytes, memoryview, os.PathLike): 视频 接受base64字符串，字节，文件路径
+                    image (str, bytes, memoryview, os.PathLike): 视频封面图片 接受base64字符串，字节，文件路径
 
                 Returns:
                     tuple[int, int]: 返回(ClientMsgid, NewMsgId)
@@ -211,58 +206,48 @@ class MessageMixin(WechatAPIClientBase):
                     ValueError: 视频或图片参数都为空或都不为空时
                     根据error_handler处理错误
                 """
-        if not image:
-            image = Path(os.path.join(Path(__file__).resolve().parent, "fallback.png"))
-        # get video base64 and duration
-        if isinstance(video, str):
-            vid_base64 = video
-            video = base64.b64decode(video)
-            file_len = len(video)
-            media_info = MediaInfo.parse(BytesIO(video))
-        elif isinstance(video, bytes):
-            vid_base64 = base64.b64encode(video).decode()
-            file_len = len(video)
-            media_info = MediaInfo.parse(BytesIO(video))
-        elif isinstance(video, os.PathLike):
-            with open(video, "rb") as f:
-                file_len = len(f.read())
-                vid_base64 = base64.b64encode(f.read()).decode()
-            media_info = MediaInfo.parse(video)
-        else:
-            raise ValueError("video should be str, bytes, or path")
+        if self.video_transcoder is None:
+            return await self._send_video_message(wxid, video, image, None)
+        # 发送完成前转码缓存不会被清理
+        async with self.video_transcoder.use(video) as (video, thumb):
+            return await self._send_video_message(wxid, video, image, thumb)
+
+    async def _send_video_message(self, wxid: str, video: MediaInput, image: MediaInput, thumb: Optional[Path]):
+        if not image or image == "None":  # 没有封面时使用转码时截取的封面
+            image = thumb or Path(os.path.join(Path(__file__).resolve().parent, "fallback.png"))
+        # get video duration，视频和封面在写入请求体时才编码为base64
+        try:
+            video = Base64Media(video)
+        except ValueError:
+            raise ValueError("video should be str, bytes, or path") from None
+        file_len = video.raw_size
+        with video.open() as f:
+            media_info = MediaInfo.parse(f)
         duration = media_info.tracks[0].duration
 
-        # get image base64
-        if isinstance(image, str):
-            image_base64 = image
-        elif isinstance(image, bytes):
-            image_base64 = base64.b64encode(image).decode()
-        elif isinstance(image, os.PathLike):
-            with open(image, "rb") as f:
-                image_base64 = base64.b64encode(f.read()).decode()
-        else:
-            raise ValueError("image should be str, bytes, or path")
+        try:
+            image = Base64Media(image)
+        except ValueError:
+            raise ValueError("image should be str, bytes, or path") from None
 
         # 打印预估时间，300KB/s
         predict_time = int(file_len / 1024 / 300)
         logger.info("开始发送视频: 对方wxid:{} 视频base64略 图片base64略 预计耗时:{}秒", wxid, predict_time)
 
         async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": vid_base64, "ImageBase64": image_base64,
+            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": video, "ImageBase64": image,
                           "PlayLength": duration}
-            async with session.post(f'http://{self.ip}:{self.port}/SendVideoMsg', json=json_param) as resp:
+            async with session.post(f'http://{self.ip}:{self.port}/SendVideoMsg', **json_body(json_param)) as resp:
                 json_resp = await resp.json()
 
         if json_resp.get("Success"):
-            json_param.pop('Base64')
-            json_param.pop('ImageBase64')
             logger.info("发送视频成功: 对方wxid:{} 时长:{} 视频base64略 图片base64略", wxid, duration)
             data = json_resp.get("Data")
             return data.get("clientMsgId"), data.get("newMsgId")
         else:
             self.error_handler(json_resp)
 
-    async def send_voice_message(self, wxid: str, voice: Union[str, bytes, os.PathLike], format: str = "amr") -> \
+    async def send_voice_message(self, wxid: str, voice: MediaInput, format: str = "amr") -> \
             tuple[int, int, int]:
         """发送语音消息。
 
@@ -282,7 +267,7 @@ class MessageMixin(WechatAPIClientBase):
         """
         return await self._queue_message(self._send_voice_message, wxid, voice, format)
 
-    async def _send_voice_message(self, wxid: str, voice: Union[str, bytes, os.PathLike], format: str = "amr") -> \
+    async def _send_voice_message(self, wxid: str, voice: MediaInput, format: str = "amr") -> \
             tuple[int, int, int]:
         if not self.wxid:
             raise UserLoggedOut("请先登录")
@@ -291,31 +276,20 @@ class MessageMixin(WechatAPIClientBase):
         elif format not in ["amr", "wav", "mp3"]:
             raise ValueError("format must be one of amr, wav, mp3")
 
-        # read voice to byte
-        if isinstance(voice, str):
-            voice_byte = base64.b64decode(voice)
-        elif isinstance(voice, bytes):
-            voice_byte = voice
-        elif isinstance(voice, os.PathLike):
-            with open(voice, "rb") as f:
-                voice_byte = f.read()
-        else:
-            raise ValueError("voice should be str, bytes, or path")
+        try:
+            voice = Base64Media(voice)
+        except ValueError:
+            raise ValueError("voice should be str, bytes, or path") from None
 
-        # get voice duration and b64
+        # get voice duration，amr原样发送，wav/mp3转为silk
         if format.lower() == "amr":
-            audio = AudioSegment.from_file(BytesIO(voice_byte), format="amr")
-            voice_base64 = base64.b64encode(voice_byte).decode()
-        elif format.lower() == "wav":
-            audio = AudioSegment.from_file(BytesIO(voice_byte), format="wav").set_channels(1)
-            audio = audio.set_frame_rate(self._get_closest_frame_rate(audio.frame_rate))
-            voice_base64 = base64.b64encode(
-                await pysilk.async_encode(audio.raw_data, sample_rate=audio.frame_rate)).decode()
-        elif format.lower() == "mp3":
-            audio = AudioSegment.from_file(BytesIO(voice_byte), format="mp3").set_channels(1)
+            with voice.open() as f:
+                audio = AudioSegment.from_file(f, format="amr")
+        elif format.lower() in ("wav", "mp3"):
+            with voice.open() as f:
+                audio = AudioSegment.from_file(f, format=format.lower()).set_channels(1)
             audio = audio.set_frame_rate(self._get_closest_frame_rate(audio.frame_rate))
-            voice_base64 = base64.b64encode(
-                await pysilk.async_encode(audio.raw_data, sample_rate=audio.frame_rate)).decode()
+            voice = Base64Media(await pysilk.async_encode(audio.raw_data, sample_rate=audio.frame_rate))
         else:
             raise ValueError("format must be one of amr, wav, mp3")
 
@@ -324,13 +298,12 @@ class MessageMixin(WechatAPIClientBase):
         format_dict = {"amr": 0, "wav": 4, "mp3": 4}
 
         async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": voice_base64, "VoiceTime": duration,
+            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": voice, "VoiceTime": duration,
                           "Type": format_dict[format]}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendVoiceMsg', json=json_param)
+            response = await session.post(f'http://{self.ip}:{self.port}/SendVoiceMsg', **json_body(json_param))
             json_resp = await response.json()
 
             if json_resp.get("Success"):
-                json_param.pop('Base64')
                 logger.info("发送语音消息: 对方wxid:{} 时长:{} 格式:{} 音频base64略", wxid, duration, format)
                 data = json_resp.get("Data")
                 return int(data.get("ClientMsgId")), data.get("CreateTime"), data.get("NewMsgId")
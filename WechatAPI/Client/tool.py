@@ -1,19 +1,23 @@
+import asyncio
 import base64
 import io
 import os
+from typing import Optional, Union
 
 import aiohttp
 import pysilk
 from pydub import AudioSegment
 
+from .audio_cache import audio_cache
 from .base import *
+from .media import SPOOL_THRESHOLD, MediaFile, decode_base64, read_json_media
 from .protect import protector
 from ..errors import *
 
 
 class ToolMixin(WechatAPIClientBase):
     async def download_image(self, aeskey: str, cdnmidimgurl: str) -> str:
-        """CDN下载高清图片。
+        """CDN下载高清图片。需要图片数据时使用 download_image_bytes，省去base64字符串。
 
         Args:
             aeskey (str): 图片的AES密钥
@@ -39,8 +43,16 @@ class ToolMixin(WechatAPIClientBase):
             else:
                 self.error_handler(json_resp)
 
+    async def download_image_bytes(self, aeskey: str, cdnmidimgurl: str) -> bytes:
+        """CDN下载高清图片，返回图片数据。参数与 download_image 相同。
+
+        Returns:
+            bytes: 图片数据
+        """
+        return decode_base64(await self.download_image(aeskey, cdnmidimgurl))
+
     async def download_voice(self, msg_id: str, voiceurl: str, length: int) -> str:
-        """下载语音文件。
+        """下载语音文件。需要语音数据时使用 download_voice_bytes。
 
         Args:
             msg_id (str): 消息的msgid
@@ -67,14 +79,22 @@ class ToolMixin(WechatAPIClientBase):
             else:
                 self.error_handler(json_resp)
 
-    async def download_attach(self, attach_id: str) -> dict:
-        """下载附件。
+    async def download_voice_bytes(self, msg_id: str, voiceurl: str, length: int) -> bytes:
+        """下载语音文件，返回语音数据。参数与 download_voice 相同。
+
+        Returns:
+            bytes: silk格式的语音数据
+        """
+        return decode_base64(await self.download_voice(msg_id, voiceurl, length))
+
+    async def download_attach(self, attach_id: str) -> str:
+        """下载附件。整个响应读入内存，大附件请使用 download_attach_media。
 
         Args:
             attach_id (str): 附件ID
 
         Returns:
-            dict: 附件数据
+            str: 附件的base64编码字符串
 
         Raises:
             UserLoggedOut: 未登录时调用
@@ -93,8 +113,39 @@ class ToolMixin(WechatAPIClientBase):
             else:
                 self.error_handler(json_resp)
 
+    async def download_attach_media(self, attach_id: str, spool_threshold: int = SPOOL_THRESHOLD,
+                                    spool_dir: str = None) -> Optional[MediaFile]:
+        """下载附件。边接收边解码，超过 spool_threshold 的附件写入磁盘临时文件。
+
+        Args:
+            attach_id (str): 附件ID
+            spool_threshold (int, optional): 超过该字节数时写入磁盘. Defaults to SPOOL_THRESHOLD.
+            spool_dir (str, optional): 临时文件目录，默认系统临时目录
+
+        Returns:
+            MediaFile: 附件数据，用完后调用 close() 删除临时文件
+
+        Raises:
+            UserLoggedOut: 未登录时调用
+            根据error_handler处理错误
+        """
+        if not self.wxid:
+            raise UserLoggedOut("请先登录")
+
+        async with aiohttp.ClientSession() as session:
+            json_param = {"Wxid": self.wxid, "AttachId": attach_id}
+            async with session.post(f'http://{self.ip}:{self.port}/DownloadAttach', json=json_param) as response:
+                json_resp, media = await read_json_media(response, spool_threshold, spool_dir)
+
+            if json_resp.get("Success"):
+                return media
+            else:
+                if media is not None:
+                    media.close()
+                self.error_handler(json_resp)
+
     async def download_video(self, msg_id) -> str:
-        """下载视频。
+        """下载视频。整个响应读入内存，大视频请使用 download_video_media。
 
         Args:
             msg_id (str): 消息的msg_id
@@ -119,6 +170,37 @@ class ToolMixin(WechatAPIClientBase):
             else:
                 self.error_handler(json_resp)
 
+    async def download_video_media(self, msg_id, spool_threshold: int = SPOOL_THRESHOLD,
+                                   spool_dir: str = None) -> Optional[MediaFile]:
+        """下载视频。边接收边解码，超过 spool_threshold 的视频写入磁盘临时文件。
+
+        Args:
+            msg_id (str): 消息的msg_id
+            spool_threshold (int, optional): 超过该字节数时写入磁盘. Defaults to SPOOL_THRESHOLD.
+            spool_dir (str, optional): 临时文件目录，默认系统临时目录
+
+        Returns:
+            MediaFile: 视频数据，用完后调用 close() 删除临时文件
+
+        Raises:
+            UserLoggedOut: 未登录时调用
+            根据error_handler处理错误
+        """
+        if not self.wxid:
+            raise UserLoggedOut("请先登录")
+
+        async with aiohttp.ClientSession() as session:
+            json_param = {"Wxid": self.wxid, "MsgId": msg_id}
+            async with session.post(f'http://{self.ip}:{self.port}/DownloadVideo', json=json_param) as response:
+                json_resp, media = await read_json_media(response, spool_threshold, spool_dir)
+
+            if json_resp.get("Success"):
+                return media
+            else:
+                if media is not None:
+                    media.close()
+                self.error_handler(json_resp)
+
     async def set_step(self, count: int) -> bool:
         """设置步数。
 
@@ -265,16 +347,40 @@ class ToolMixin(WechatAPIClientBase):
         return base64.b64encode(byte).decode("utf-8")
 
     @staticmethod
-    async def silk_byte_to_byte_wav_byte(silk_byte: bytes) -> bytes:
-        """将silk字节转换为wav字节。
+    async def silk_byte_to_byte_wav_byte(silk_byte: bytes, msg_id: Union[int, str] = None) -> bytes:
+        """将silk字节转换为wav字节。结果会缓存，同一段语音只转换一次。
 
         Args:
             silk_byte (bytes): silk格式的字节数据
+            msg_id (int, str, optional): 语音消息的MsgId
 
         Returns:
             bytes: wav格式的字节数据
         """
-        return await pysilk.async_decode(silk_byte, to_wav=True)
+        return await audio_cache.convert(silk_byte, "wav", lambda data: pysilk.async_decode(data, to_wav=True),
+                                         msg_id)
+
+    @staticmethod
+    async def wav_byte_to_mp3_byte(wav_byte: bytes, msg_id: Union[int, str] = None, sample_rate: int = 16000) -> bytes:
+        """将WAV字节数据转换为单声道MP3（需要ffmpeg），常用于语音识别接口。结果会缓存，同一段语音只转换一次。
+
+        Args:
+            wav_byte (bytes): WAV格式的字节数据
+            msg_id (int, str, optional): 语音消息的MsgId
+            sample_rate (int, optional): 采样率. Defaults to 16000.
+
+        Returns:
+            bytes: MP3格式的字节数据
+        """
+
+        def export(data: bytes) -> bytes:
+            audio = AudioSegment.from_wav(io.BytesIO(data)).set_channels(1).set_frame_rate(sample_rate)
+            output = io.BytesIO()
+            audio.export(output, format="mp3")
+            return output.getvalue()
+
+        return await audio_cache.convert(wav_byte, f"mp3:{sample_rate}",
+                                         lambda data: asyncio.to_thread(export, data), msg_id)
 
     @staticmethod
     def wav_byte_to_amr_byte(wav_byte: bytes) -> bytes:
@@ -330,10 +436,14 @@ class ToolMixin(WechatAPIClientBase):
         Returns:
             bytes: silk格式的字节数据
         """
-        # get pcm data
-        audio = AudioSegment.from_wav(io.BytesIO(wav_byte))
-        pcm = audio.raw_data
-        return await pysilk.async_encode(pcm, data_rate=audio.frame_rate, sample_rate=audio.frame_rate)
+
+        async def encode(data: bytes) -> bytes:
+            # get pcm data
+            audio = AudioSegment.from_wav(io.BytesIO(data))
+            pcm = audio.raw_data
+            return await pysilk.async_encode(pcm, data_rate=audio.frame_rate, sample_rate=audio.frame_rate)
+
+        return await audio_cache.convert(wav_byte, "silk", encode)
 
     @staticmethod
     async def wav_byte_to_silk_base64(wav_byte: bytes) -> str:
@@ -348,13 +458,14 @@ class ToolMixin(WechatAPIClientBase):
         return base64.b64encode(await ToolMixin.wav_byte_to_silk_byte(wav_byte)).decode()
 
     @staticmethod
-    async def silk_base64_to_wav_byte(silk_base64: str) -> bytes:
+    async def silk_base64_to_wav_byte(silk_base64: str, msg_id: Union[int, str] = None) -> bytes:
         """将silk格式的base64字符串转换为WAV字节数据。
 
         Args:
             silk_base64 (str): silk格式的base64编码字符串
+            msg_id (int, str, optional): 语音消息的MsgId
 
         Returns:
             bytes: WAV格式的字节数据
         """
-        return await ToolMixin.silk_byte_to_byte_wav_byte(base64.b64decode(silk_base64))
\ No newline at end of file
+        return await ToolMixin.silk_byte_to_byte_wav_byte(base64.b64decode(silk_base64), msg_id)
\ No newline at end of file
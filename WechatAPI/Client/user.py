@@ -6,6 +6,7 @@ from ..errors import *
 
 
 class UserMixin(WechatAPIClientBase):
+    @singleflight(ttl=5)
     async def get_profile(self, wxid: str = None) -> dict:
         """获取用户信息。
 
@@ -0,0 +1,221 @@
+import asyncio
+import contextlib
+import hashlib
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+
+from loguru import logger
+from pymediainfo import MediaInfo
+
+from .media import Base64Media, MediaInput
+
+
+class VideoTranscoder:
+    """发送前把视频转码到限定码率
+
+    视频上传只有约300KB/s，码率过高的视频先用 ffmpeg 转为 H.264/AAC，同一次转码顺带截取封面。
+    码率本来就不高的视频只截取封面。ffmpeg 以子进程异步运行，同时运行的转码数受 concurrency 限制，
+    超时、失败或找不到 ffmpeg 时原样发送。结果按源视频哈希缓存在 cache_dir 中，同一个视频重复发送时不再转码。
+    通过 use 取得的缓存文件在退出前不会被清理，超出 cache_entries 时要等正在发送的视频发送完再删除。
+
+    Args:
+        ffmpeg (str, optional): ffmpeg 可执行文件. Defaults to "ffmpeg".
+        max_bitrate (int, optional): 视频码率上限（kbps）. Defaults to 1200.
+        target_size (int, optional): 目标文件大小（字节），按时长换算成码率，0为不限制. Defaults to 0.
+        max_height (int, optional): 视频最大高度（像素）. Defaults to 720.
+        min_bytes (int, optional): 小于该字节数的视频不转码. Defaults to 2 MB.
+        concurrency (int, optional): 同时运行的转码数. Defaults to 1.
+        timeout (float, optional): 单次转码超时（秒）. Defaults to 300.
+        cache_dir (str, optional): 缓存目录，默认系统临时目录下的 xybot-video-cache
+        cache_entries (int, optional): 最多缓存的视频数. Defaults to 32.
+    """
+
+    AUDIO_BITRATE = 64  # kbps
+
+    def __init__(self, ffmpeg: str = "ffmpeg", max_bitrate: int = 1200, target_size: int = 0, max_height: int = 720,
+                 min_bytes: int = 2 * 1024 * 1024, concurrency: int = 1, timeout: float = 300,
+                 cache_dir: str = None, cache_entries: int = 32):
+        self.ffmpeg = shutil.which(ffmpeg)
+        if self.ffmpeg is None:
+            logger.warning("未找到ffmpeg: {}，发送视频前不转码", ffmpeg)
+
+        self.max_bitrate = max_bitrate
+        self.target_size = target_size
+        self.max_height = max_height
+        self.min_bytes = min_bytes
+        self.timeout = timeout
+        self.cache_entries = cache_entries
+        self.cache_dir = Path(cache_dir or os.path.join(tempfile.gettempdir(), "xybot-video-cache"))
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._pending: Dict[str, asyncio.Future] = {}
+        # 哈希 -> 是否转码了视频（否则只有封面），按最近使用排序，重启后从缓存目录恢复
+        self._cache: OrderedDict[str, bool] = OrderedDict()
+        for thumb in sorted(self.cache_dir.glob("*.jpg"), key=lambda p: p.stat().st_mtime):
+            self._cache[thumb.stem] = (self.cache_dir / f"{thumb.stem}.mp4").exists()
+        # 哈希 -> 正在使用的次数；已被淘汰但仍在使用的哈希，使用结束后再删除文件
+        self._in_use: Dict[str, int] = {}
+        self._evicted: Set[str] = set()
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        return self.cache_dir / f"{key}.mp4", self.cache_dir / f"{key}.jpg"
+
+    def _digest(self, source: Base64Media) -> str:
+        h = hashlib.blake2b(digest_size=16, person=f"{self.max_bitrate}:{self.target_size}:{self.max_height}"
+                            .encode()[:16])
+        with source.open() as f:
+            while chunk := f.read(1024 * 1024):
+                h.update(chunk)
+        return h.hexdigest()
+
+    async def transcode(self, video: MediaInput) -> Tuple[MediaInput, Optional[Path]]:
+        """转码视频并截取封面
+
+        返回的缓存文件可能在之后被淘汰删除，需要在读取期间保留文件时使用 use。
+
+        Args:
+            video (str, bytes, memoryview, os.PathLike, MediaFile): 与 send_video_message 相同
+
+        Returns:
+            Tuple[视频, 封面]: 转码后的视频文件路径和封面路径；不需要转码时返回原视频，失败时封面为None
+        """
+        video, thumb, _ = await self._transcode(video)
+        return video, thumb
+
+    @contextlib.asynccontextmanager
+    async def use(self, video: MediaInput) -> AsyncIterator[Tuple[MediaInput, Optional[Path]]]:
+        """与 transcode 相同，退出前返回的缓存文件不会被淘汰删除
+
+        用法: async with transcoder.use(video) as (video, thumb): ...
+        """
+        result, thumb, key = await self._transcode(video)
+        if key is None:
+            yield result, thumb
+            return
+
+        self._in_use[key] = self._in_use.get(key, 0) + 1
+        try:
+            if thumb.exists():
+                yield result, thumb
+            else:  # 等待转码期间已被淘汰，发送原视频
+                yield video, None
+        finally:
+            self._release(key)
+
+    async def _transcode(self, video: MediaInput) -> Tuple[MediaInput, Optional[Path], Optional[str]]:
+        """transcode 的实现，另外返回缓存文件的哈希，没有用到缓存文件时为None"""
+        if self.ffmpeg is None:
+            return video, None, None
+
+        source = Base64Media(video)
+        if source.raw_size < self.min_bytes:
+            return video, None, None
+
+        key = await asyncio.to_thread(self._digest, source)
+        output, thumb = self._paths(key)
+        if key in self._cache and thumb.exists():
+            self._cache.move_to_end(key)
+            return (output if self._cache[key] else video), thumb, key
+
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(source, key))
+            self._pending[key] = future
+            future.add_done_callback(lambda _: self._pending.pop(key, None))
+        transcoded = await asyncio.shield(future)
+
+        if transcoded is None:
+            return video, None, None
+        return (output if transcoded else video), thumb, key
+
+    async def _run(self, source: Base64Media, key: str) -> Optional[bool]:
+        """运行ffmpeg，返回是否转码了视频；失败返回None"""
+        output, thumb = self._paths(key)
+        input_path, temp_input = source.source, None
+        if source.kind != "file":  # 字节数据先写入临时文件，mp4 的索引可能在文件末尾，不能用管道读取
+            fd, temp_input = tempfile.mkstemp(suffix=".mp4", dir=self.cache_dir)
+            with os.fdopen(fd, "wb") as f, source.open() as src:
+                shutil.copyfileobj(src, f)
+            input_path = temp_input
+
+        try:
+            media_info = await asyncio.to_thread(MediaInfo.parse, input_path)
+            duration = (media_info.tracks[0].duration or 0) / 1000
+            bitrate = self._target_bitrate(duration)
+            source_bitrate = source.raw_size * 8 / 1000 / duration if duration else 0
+            transcode = bitrate is not None and source_bitrate > bitrate * 1.1
+
+            args = [self.ffmpeg, "-y", "-v", "error", "-i", input_path]
+            scale = f"scale=-2:'min({self.max_height},ih)'"
+            if transcode:
+                args += ["-map", "0:v:0", "-map", "0:a:0?", "-map_metadata", "0", "-vf", scale,
+                         "-c:v", "libx264", "-preset", "veryfast", "-b:v", f"{bitrate}k", "-maxrate", f"{bitrate}k",
+                         "-bufsize", f"{bitrate * 2}k", "-pix_fmt", "yuv420p",
+                         "-c:a", "aac", "-b:a", f"{self.AUDIO_BITRATE}k", "-movflags", "+faststart",
+                         f"{output}.part.mp4"]
+            args += ["-map", "0:v:0", "-frames:v", "1", "-vf", scale, "-q:v", "4", f"{thumb}.part.jpg"]
+
+            async with self._semaphore:
+                process = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.DEVNULL,
+                                                               stderr=asyncio.subprocess.PIPE)
+                try:
+                    _, stderr = await asyncio.wait_for(process.communicate(), self.timeout)
+                except asyncio.TimeoutError:
+                    process.kill()
+                    await process.wait()
+                    logger.warning("视频转码超时（{}秒），发送原视频", self.timeout)
+                    return None
+
+            if process.returncode != 0:
+                logger.warning("视频转码失败，发送原视频: {}", stderr.decode(errors="ignore")[-500:])
+                return None
+
+            if transcode:
+                os.replace(f"{output}.part.mp4", output)
+                logger.info("视频转码完成: {}字节 -> {}字节 码率:{}kbps", source.raw_size, output.stat().st_size, bitrate)
+            os.replace(f"{thumb}.part.jpg", thumb)
+            self._remember(key, transcode)
+            return transcode
+        except Exception as e:
+            logger.warning("视频转码失败，发送原视频: {}", e)
+            return None
+        finally:
+            for path in (temp_input, f"{output}.part.mp4", f"{thumb}.part.jpg"):
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+    def _target_bitrate(self, duration: float) -> Optional[int]:
+        """视频码率（kbps），时长未知时只按码率上限"""
+        bitrate = self.max_bitrate
+        if self.target_size and duration:
+            bitrate = min(bitrate, int(self.target_size * 8 / 1000 / duration) - self.AUDIO_BITRATE)
+        return bitrate if bitrate > 0 else None
+
+    def _remember(self, key: str, transcoded: bool):
+        self._cache[key] = transcoded
+        self._cache.move_to_end(key)
+        self._evicted.discard(key)
+        while len(self._cache) > self.cache_entries:
+            evicted, _ = self._cache.popitem(last=False)
+            if evicted in self._in_use:  # 正在发送，使用结束后再删除
+                self._evicted.add(evicted)
+            else:
+                self._unlink(evicted)
+
+    def _release(self, key: str):
+        self._in_use[key] -= 1
+        if self._in_use[key] > 0:
+            return
+        del self._in_use[key]
+        if key in self._evicted:
+            self._evicted.discard(key)
+            self._unlink(key)
+
+    def _unlink(self, key: str):
+        for path in self._paths(key):
+            path.unlink(missing_ok=True)
@@ -0,0 +1,812 @@
+import argparse
+import asyncio
+import base64
+import itertools
+import random
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from aiohttp import web
+from loguru import logger
+
+FALLBACK_IMAGE = Path(__file__).resolve().parent.parent / "Client" / "fallback.png"
+
+# 发送类接口，set_rate_limit 默认只限制这些接口
+SEND_ENDPOINTS = ("SendTextMsg", "SendImageMsg", "SendVideoMsg", "SendVoiceMsg", "SendShareLink", "SendEmojiMsg",
+                  "SendCardMsg", "SendAppMsg", "SendCDNFileMsg", "SendCDNImgMsg", "SendCDNVideoMsg", "RevokeMsg")
+
+# 请求中不记录原文的媒体字段
+_MEDIA_PARAMS = ("Base64", "ImageBase64")
+
+
+class Fault:
+    """接口的延迟和错误设置
+
+    Args:
+        latency (float): 固定延迟（秒）
+        jitter (float): 随机附加的延迟上限（秒）
+        error_rate (float): 返回错误的概率，0~1
+        error_code (int): 错误码，见 WechatAPIClientBase.error_handler
+        error_message (str): 错误信息
+    """
+
+    __slots__ = ("latency", "jitter", "error_rate", "error_code", "error_message")
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, error_code: int = -2,
+                 error_message: str = "模拟错误"):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.error_message = error_message
+
+
+class RateLimit:
+    """固定窗口限流，每 per 秒最多 limit 次，超过时返回 code"""
+
+    __slots__ = ("limit", "per", "code", "window_start", "count")
+
+    def __init__(self, limit: int, per: float = 1.0, code: int = -12):
+        self.limit = limit
+        self.per = per
+        self.code = code
+        self.window_start = 0.0
+        self.count = 0
+
+    def hit(self, now: float) -> bool:
+        """记录一次请求，超过限制时返回False"""
+        if now - self.window_start >= self.per:
+            self.window_start, self.count = now, 0
+        self.count += 1
+        return self.count <= self.limit
+
+
+class SyntheticMessages:
+    """生成与 /Sync 返回格式相同的入站消息
+
+    群聊、好友和群成员来自 FakeWechatAPIServer 的模拟通讯录，同一个 seed 生成的消息序列相同。
+
+    Args:
+        server (FakeWechatAPIServer): 模拟服务器
+        seed (int, optional): 随机数种子. Defaults to 0.
+    """
+
+    KINDS = ("text", "at", "image", "voice", "video", "file", "quote", "pat", "join")
+
+    def __init__(self, server: "FakeWechatAPIServer", seed: int = 0):
+        self.server = server
+        self.random = random.Random(seed)
+        self._msg_ids = itertools.count(1700000000)
+        self._seq = itertools.count(800000000)
+
+    def _pick_chat(self, group: Optional[bool] = None):
+        """随机选一个会话，返回 (会话, 发送人)"""
+        server = self.server
+        if group is None:
+            group = bool(server.chatrooms) and (not server.friends or self.random.random() < 0.8)
+        if group:
+            chatroom = self.random.choice(server.chatrooms)
+            return chatroom, self.random.choice(server.chatroom_members[chatroom])
+        friend = self.random.choice(server.friends)
+        return friend, friend
+
+    def _raw(self, msg_type: int, chat: str, sender: str, content: str, msg_source: str = None,
+             push_content: str = "", img_buf: dict = None, from_self: bool = False) -> Dict[str, Any]:
+        bot = self.server.wxid
+        is_group = chat.endswith("@chatroom")
+        if is_group and not from_self:
+            content = f"{sender}:\n{content}"
+        if msg_source is None:
+            msg_source = self.msg_source(member_count=len(self.server.chatroom_members.get(chat, ())))
+        msg_id = next(self._msg_ids)
+        return {
+            "MsgId": msg_id,
+            "FromUserName": {"string": bot if from_self else chat},
+            "ToWxid": {"string": chat if from_self else bot},
+            "MsgType": msg_type,
+            "Content": {"string": content},
+            "Status": 3,
+            "ImgStatus": 2 if msg_type == 3 else 1,
+            "ImgBuf": img_buf or {"iLen": 0},
+            "CreateTime": int(time.time()),
+            "MsgSource": msg_source,
+            "PushContent": push_content,
+            "NewMsgId": 7000000000000000000 + msg_id,
+            "MsgSeq": next(self._seq),
+        }
+
+    def msg_source(self, ats: Iterable[str] = (), member_count: int = 0) -> str:
+        parts = ["<msgsource>"]
+        ats = list(ats)
+        if ats:
+            parts.append(f"<atuserlist><![CDATA[{','.join(ats)}]]></atuserlist>")
+        parts.append("<bizflag>0</bizflag><pua>1</pua><eggIncluded>1</eggIncluded>")
+        if member_count:
+            parts.append(f"<silence>1</silence><membercount>{member_count}</membercount>")
+        parts.append(f"<signature>V1_{self.random.getrandbits(32):08x}|v1_{self.random.getrandbits(32):08x}"
+                     "</signature><tmp_node><publisher-id></publisher-id></tmp_node></msgsource>")
+        return "".join(parts)
+
+    def nickname(self, wxid: str) -> str:
+        return self.server.nickname_of(wxid)
+
+    def text(self, content: str = None, chat: str = None, sender: str = None) -> Dict[str, Any]:
+        """文本消息"""
+        if chat is None:
+            chat, sender = self._pick_chat()
+        sender = sender or chat
+        content = content or self.random.choice(TEXTS)
+        return self._raw(1, chat, sender, content, push_content=f"{self.nickname(sender)} : {content}")
+
+    def at(self, content: str = None, chat: str = None, sender: str = None, ats: List[str] = None) -> Dict[str, Any]:
+        """@机器人的群聊文本消息"""
+        if chat is None:
+            chat, sender = self._pick_chat(group=True)
+        sender = sender or self.random.choice(self.server.chatroom_members[chat])
+        ats = ats or [self.server.wxid]
+        content = content or self.random.choice(TEXTS)
+        mentions = "".join(f"@{self.nickname(wxid)} " for wxid in ats)
+        return self._raw(1, chat, sender, mentions + content,
+                         msg_source=self.msg_source(ats, len(self.server.chatroom_members[chat])),
+                         push_content=f"{self.nickname(sender)}在群聊中@了你")
+
+    def image(self, chat: str = None, sender: str = None) -> Dict[str, Any]:
+        """图片消息，原图通过 /CdnDownloadImg 下载"""
+        if chat is None:
+            chat, sender = self._pick_chat()
+        sender = sender or chat
+        aeskey = f"{self.random.getrandbits(128):032x}"
+        cdnurl = f"3057020100044b30490201000204{self.random.getrandbits(96):024x}0204{self.random.getrandbits(64):016x}"
+        length = self.server.image_size or FALLBACK_IMAGE.stat().st_size
+        content = (f'<?xml version="1.0"?>\n<msg>\n\t<img aeskey="{aeskey}" encryver="1" cdnthumbaeskey="{aeskey}" '
+                   f'cdnthumburl="{cdnurl}" cdnthumblength="4263" cdnthumbheight="120" cdnthumbwidth="90" '
+                   f'cdnmidheight="0" cdnmidwidth="0" cdnhdheight="0" cdnhdwidth="0" cdnmidimgurl="{cdnurl}" '
+                   f'length="{length}" md5="{self.random.getrandbits(128):032x}" hevc_mid_size="{length}" />\n</msg>\n')
+        thumb = base64.b64encode(self.server.image_bytes()[:4096]).decode()
+        return self._raw(3, chat, sender, content, push_content=f"{self.nickname(sender)} : [图片]",
+                         img_buf={"iLen": len(thumb) // 4 * 3, "buffer": thumb})
+
+    def voice(self, chat: str = None, sender: str = None) -> Dict[str, Any]:
+        """语音消息，私聊语音直接带在 ImgBuf 中，群聊语音通过 /DownloadVoice 下载"""
+        if chat is None:
+            chat, sender = self._pick_chat()
+        sender = sender or chat
+        silk = self.server.voice_bytes()
+        content = (f'<msg><voicemsg endflag="1" cancelflag="0" forwardflag="0" voiceformat="4" voicelength="1000" '
+                   f'length="{len(silk)}" bufid="0" aeskey="{self.random.getrandbits(128):032x}" '
+                   f'voiceurl="3052020100044b30490201000204{self.random.getrandbits(96):024x}" voicemd5="" '
+                   f'clientmsgid="{self.random.getrandbits(64):016x}" fromusername="{sender}" /></msg>')
+        img_buf = None
+        if not chat.endswith("@chatroom"):
+            img_buf = {"iLen": len(silk), "buffer": base64.b64encode(silk).decode()}
+        return self._raw(34, chat, sender, content, push_content=f"{self.nickname(sender)} : [语音]", img_buf=img_buf)
+
+    def video(self, chat: str = None, sender: str = None) -> Dict[str, Any]:
+        """视频消息，视频通过 /DownloadVideo 下载"""
+        if chat is None:
+            chat, sender = self._pick_chat()
+        sender = sender or chat
+        content = (f'<?xml version="1.0"?>\n<msg>\n\t<videomsg aeskey="{self.random.getrandbits(128):032x}" '
+                   f'cdnvideourl="3057020100044b30490201000204{self.random.getrandbits(96):024x}" '
+                   f'cdnthumbaeskey="{self.random.getrandbits(128):032x}" cdnthumburl="3057020100044b3049" '
+                   f'length="{self.server.video_size}" playlength="10" cdnthumblength="8192" cdnthumbwidth="224" '
+                   f'cdnthumbheight="398" fromusername="{sender}" md5="{self.random.getrandbits(128):032x}" '
+                   f'newmd5="{self.random.getrandbits(128):032x}" isplaceholder="0" />\n</msg>\n')
+        return self._raw(43, chat, sender, content, push_content=f"{self.nickname(sender)} : [视频]")
+
+    def file(self, chat: str = None, sender: str = None, filename: str = None) -> Dict[str, Any]:
+        """文件消息，附件通过 /DownloadAttach 下载"""
+        if chat is None:
+            chat, sender = self._pick_chat()
+        sender = sender or chat
+        filename = filename or self.random.choice(FILENAMES)
+        content = (f'<?xml version="1.0"?>\n<msg>\n\t<appmsg appid="" sdkver="0">\n\t\t<title>{filename}</title>\n'
+                   '\t\t<des></des>\n\t\t<action></action>\n\t\t<type>6</type>\n\t\t<showtype>0</showtype>\n'
+                   f'\t\t<content></content>\n\t\t<url></url>\n\t\t<appattach>\n\t\t\t<totallen>{self.server.attach_size}'
+                   f'</totallen>\n\t\t\t<attachid>@cdn_3057020100044b3049_{self.random.getrandbits(64):016x}_1'
+                   f'</attachid>\n\t\t\t<emoticonmd5></emoticonmd5>\n\t\t\t<fileext>{filename.rsplit(".", 1)[-1]}'
+                   f'</fileext>\n\t\t\t<cdnattachurl>3057020100044b30490201000204{self.random.getrandbits(96):024x}'
+                   f'</cdnattachurl>\n\t\t\t<aeskey>{self.random.getrandbits(128):032x}</aeskey>\n'
+                   f'\t\t\t<encryver>1</encryver>\n\t\t</appattach>\n\t\t<md5>{self.random.getrandbits(128):032x}</md5>\n'
+                   f'\t</appmsg>\n\t<fromusername>{sender}</fromusername>\n\t<scene>0</scene>\n\t<appinfo>\n'
+                   '\t\t<version>1</version>\n\t\t<appname></appname>\n\t</appinfo>\n\t<commenturl></commenturl>\n'
+                   '</msg>\n')
+        return self._raw(49, chat, sender, content, push_content=f"{self.nickname(sender)} : [文件]{filename}")
+
+    def quote(self, content: str = None, chat: str = None, sender: str = None, quoted: str = None) -> Dict[str, Any]:
+        """引用文本消息的消息"""
+        if chat is None:
+            chat, sender = self._pick_chat()
+        sender = sender or chat
+        content = content or self.random.choice(TEXTS)
+        quoted = quoted or self.random.choice(TEXTS)
+        quoted_sender = self.random.choice(self.server.chatroom_members.get(chat) or [chat])
+        xml = (f'<?xml version="1.0"?>\n<msg>\n\t<appmsg appid="" sdkver="0">\n\t\t<title>{content}</title>\n'
+               '\t\t<des></des>\n\t\t<action></action>\n\t\t<type>57</type>\n\t\t<showtype>0</showtype>\n'
+               '\t\t<soundtype>0</soundtype>\n\t\t<mediatagname></mediatagname>\n\t\t<messageext></messageext>\n'
+               '\t\t<messageaction></messageaction>\n\t\t<content></content>\n\t\t<contentattr>0</contentattr>\n'
+               '\t\t<url></url>\n\t\t<lowurl></lowurl>\n\t\t<dataurl></dataurl>\n\t\t<lowdataurl></lowdataurl>\n'
+               '\t\t<appattach>\n\t\t\t<totallen>0</totallen>\n\t\t\t<attachid></attachid>\n'
+               '\t\t\t<emoticonmd5></emoticonmd5>\n\t\t\t<fileext></fileext>\n\t\t\t<aeskey></aeskey>\n'
+               '\t\t</appattach>\n\t\t<extinfo></extinfo>\n\t\t<sourceusername></sourceusername>\n'
+               '\t\t<sourcedisplayname></sourcedisplayname>\n\t\t<thumburl></thumburl>\n\t\t<md5></md5>\n'
+               '\t\t<statextstr></statextstr>\n\t\t<refermsg>\n\t\t\t<type>1</type>\n'
+               f'\t\t\t<svrid>{8000000000000000000 + self.random.getrandbits(48)}</svrid>\n'
+               f'\t\t\t<fromusr>{chat}</fromusr>\n\t\t\t<chatusr>{quoted_sender}</chatusr>\n'
+               f'\t\t\t<displayname>{self.nickname(quoted_sender)}</displayname>\n'
+               '\t\t\t<msgsource>&lt;msgsource&gt;&lt;sequence_id&gt;'
+               f'{self.random.getrandbits(30)}&lt;/sequence_id&gt;&lt;/msgsource&gt;</msgsource>\n'
+               f'\t\t\t<content>{quoted}</content>\n\t\t\t<createtime>{int(time.time()) - 60}</createtime>\n'
+               f'\t\t</refermsg>\n\t</appmsg>\n\t<fromusername>{sender}</fromusername>\n\t<scene>0</scene>\n'
+               '\t<appinfo>\n\t\t<version>1</version>\n\t\t<appname></appname>\n\t</appinfo>\n'
+               '\t<commenturl></commenturl>\n</msg>\n')
+        return self._raw(49, chat, sender, xml, push_content=f"{self.nickname(sender)} : {content}")
+
+    def pat(self, chat: str = None, patter: str = None, patted: str = None) -> Dict[str, Any]:
+        """拍一拍系统消息，默认拍机器人"""
+        if chat is None:
+            chat, patter = self._pick_chat(group=True)
+        patter = patter or self.random.choice(self.server.chatroom_members[chat])
+        patted = patted or self.server.wxid
+        content = (f'<sysmsg type="pat">\n<pat>\n  <fromusername>{patter}</fromusername>\n'
+                   f'  <chatusername>{chat}</chatusername>\n  <pattedusername>{patted}</pattedusername>\n'
+                   '  <patsuffix><![CDATA[]]></patsuffix>\n  <patsuffixversion>0</patsuffixversion>\n\n\n\n\n'
+                   f'  <template><![CDATA["${{{patter}}}" 拍了拍 "${{{patted}}}"]]></template>\n\n\n\n\n'
+                   '</pat>\n</sysmsg>')
+        return self._raw(10002, chat, chat, content, msg_source="")
+
+    def join(self, chat: str = None, inviter: str = None, new_members: List[str] = None) -> Dict[str, Any]:
+        """邀请进群系统消息，新成员同时加入模拟通讯录"""
+        if chat is None:
+            chat, inviter = self._pick_chat(group=True)
+        inviter = inviter or self.random.choice(self.server.chatroom_members[chat])
+        new_members = new_members or [f"wxid_new{self.random.getrandbits(40):010x}"]
+        self.server.add_members(chat, new_members)
+
+        def memberlist(wxids):
+            return "".join(f"<member><username><![CDATA[{wxid}]]></username><nickname><![CDATA["
+                           f"{self.nickname(wxid)}]]></nickname></member>" for wxid in wxids)
+
+        content = ('<sysmsg type="sysmsgtemplate">\n\t<sysmsgtemplate>\n\t\t<content_template type="tmpl_type_profile">'
+                   '\n\t\t\t<plain><![CDATA[]]></plain>\n\t\t\t<template><![CDATA["$username$"邀请"$names$"加入了群聊]]>'
+                   '</template>\n\t\t\t<link_list>\n\t\t\t\t<link name="username" type="link_profile">\n'
+                   f'\t\t\t\t\t<memberlist>{memberlist([inviter])}</memberlist>\n\t\t\t\t</link>\n'
+                   '\t\t\t\t<link name="names" type="link_profile">\n'
+                   f'\t\t\t\t\t<memberlist>{memberlist(new_members)}</memberlist>\n'
+                   '\t\t\t\t\t<separator><![CDATA[、]]></separator>\n\t\t\t\t</link>\n\t\t\t</link_list>\n'
+                   '\t\t</content_template>\n\t</sysmsgtemplate>\n</sysmsg>\n')
+        return self._raw(10002, chat, chat, content, msg_source="")
+
+    def make(self, kind: str) -> Dict[str, Any]:
+        """生成一条 kind 类型的消息，见 KINDS"""
+        if kind not in self.KINDS:
+            raise ValueError(f"未知的消息类型: {kind}，可选: {', '.join(self.KINDS)}")
+        return getattr(self, kind)()
+
+    def mix(self, weights: Dict[str, float], count: int) -> Iterator[Dict[str, Any]]:
+        """按权重随机生成 count 条消息
+
+        例子:
+
+        - server.messages.mix({"text": 70, "at": 10, "image": 10, "quote": 10}, 1000)
+        """
+        kinds, values = zip(*weights.items())
+        for kind in self.random.choices(kinds, values, k=count):
+            yield self.make(kind)
+
+
+TEXTS = ("早上好", "今天天气怎么样", "签到", "积分", "菜单", "帮我查一下明天北京的天气", "哈哈哈哈哈",
+         "这个周末有人去爬山吗？", "收到", "好的，我晚点看一下", "有没有人知道这个报错是什么意思",
+         "👍👍👍", "下午三点开会，记得带电脑", "谁有上次的会议纪要，发我一份谢谢")
+
+FILENAMES = ("季度报告.pdf", "会议纪要.docx", "数据汇总.xlsx", "设计稿.zip", "需求说明.md")
+
+
+class FakeWechatAPIServer:
+    """纯 Python 的 WechatAPI 模拟服务器，用于离线测试和压测
+
+    实现 WechatAPIClient 用到的接口，返回格式与真实服务器相同的数据，不需要登录微信账号。
+    通讯录（好友、群聊、群成员）由 seed 确定性生成；/Sync 返回 inject() 注入的消息；
+    发送类接口记录在 sent 中。每个接口可以单独设置延迟、错误率和限流，"*" 为所有接口的默认设置。
+
+    例子:
+
+    - async with FakeWechatAPIServer(port=9000) as server:
+          server.inject(*server.messages.mix({"text": 8, "image": 1, "pat": 1}, 100))
+          server.set_latency(0.05, jitter=0.02)
+          server.set_rate_limit(5, endpoint="SendTextMsg")
+
+    Args:
+        host (str, optional): 监听地址. Defaults to "127.0.0.1".
+        port (int, optional): 监听端口，0为随机端口. Defaults to 9000.
+        wxid (str, optional): 机器人wxid. Defaults to "wxid_fakebot".
+        nickname (str, optional): 机器人昵称. Defaults to "XYBot".
+        friends (int, optional): 好友数. Defaults to 200.
+        chatrooms (int, optional): 群聊数. Defaults to 20.
+        members (int, optional): 每个群的成员数. Defaults to 100.
+        image_size (int, optional): 下载图片的字节数，0为使用 fallback.png. Defaults to 0.
+        attach_size (int, optional): 下载附件的字节数. Defaults to 256 KB.
+        video_size (int, optional): 下载视频的字节数. Defaults to 1 MB.
+        sync_batch (int, optional): 每次 /Sync 最多返回的消息数. Defaults to 50.
+        seed (int, optional): 随机数种子. Defaults to 0.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9000, wxid: str = "wxid_fakebot",
+                 nickname: str = "XYBot", friends: int = 200, chatrooms: int = 20, members: int = 100,
+                 image_size: int = 0, attach_size: int = 256 * 1024, video_size: int = 1024 * 1024,
+                 sync_batch: int = 50, seed: int = 0):
+        self.host = host
+        self.port = port
+        self.wxid = wxid
+        self.nickname = nickname
+        self.image_size = image_size
+        self.attach_size = attach_size
+        self.video_size = video_size
+        self.sync_batch = sync_batch
+
+        self.random = random.Random(seed)
+        self.friends = [f"wxid_{self.random.getrandbits(56):014x}" for _ in range(friends)]
+        self.chatrooms = [f"{self.random.randrange(10 ** 10, 10 ** 11)}@chatroom" for _ in range(chatrooms)]
+        self.chatroom_members: Dict[str, List[str]] = {}
+        self.chatroom_owners: Dict[str, str] = {}
+        for chatroom in self.chatrooms:
+            known = self.random.sample(self.friends, min(len(self.friends), members // 2))
+            strangers = [f"wxid_{self.random.getrandbits(56):014x}" for _ in range(members - len(known) - 1)]
+            self.chatroom_members[chatroom] = [self.wxid, *known, *strangers]
+            self.chatroom_owners[chatroom] = self.random.choice(self.chatroom_members[chatroom])
+        self._nicknames: Dict[str, str] = {self.wxid: nickname}
+        self._known = {self.wxid, *self.friends, *self.chatrooms}
+        for members in self.chatroom_members.values():
+            self._known.update(members)
+
+        self.messages = SyntheticMessages(self, seed)
+        self.inbox: deque = deque()
+        self.sent: deque = deque(maxlen=10000)  # (接口, 请求参数)，媒体字段只记录长度
+        self.requests: Counter = Counter()
+        self.errors: Counter = Counter()
+
+        self._faults: Dict[str, Fault] = {}
+        self._limits: Dict[str, RateLimit] = {}
+        self._media: Dict[str, bytes] = {}
+        self._msg_ids = itertools.count(int(time.time()) % 10 ** 8 * 10)
+        self._runner: Optional[web.AppRunner] = None
+
+        self._handlers: Dict[str, Callable[[dict], Any]] = {
+            "Sync": self._sync,
+            "SendTextMsg": self._send_text,
+            "SendCardMsg": self._send_text,
+            "SendImageMsg": self._send_image,
+            "SendCDNImgMsg": self._send_image,
+            "SendVideoMsg": self._send_video,
+            "SendCDNVideoMsg": self._send_video,
+            "SendVoiceMsg": self._send_voice,
+            "SendShareLink": self._send_app,
+            "SendAppMsg": self._send_app,
+            "SendCDNFileMsg": self._send_app,
+            "SendEmojiMsg": self._send_emoji,
+            "GetProfile": self._get_profile,
+            "GetContact": self._get_contact,
+            "GetContractDetail": self._get_contact,
+            "GetContractList": self._get_contract_list,
+            "GetChatroomInfo": self._get_chatroom_info,
+            "GetChatroomInfoNoAnnounce": self._get_chatroom_info,
+            "GetChatroomMemberDetail": self._get_chatroom_member_detail,
+            "GetChatroomQRCode": self._get_qrcode,
+            "GetMyQRCode": self._get_qrcode,
+            "CdnDownloadImg": self._download_image,
+            "DownloadVoice": self._download_voice,
+            "DownloadAttach": self._download_attach,
+            "DownloadVideo": self._download_video,
+            "GetQRCode": self._get_login_qrcode,
+            "CheckUuid": self._check_uuid,
+            "AwakenLogin": self._awaken_login,
+            "GetCachedInfo": self._get_cached_info,
+            "AutoHeartbeatStatus": lambda params: {"Running": True},
+        }
+
+    # ---------- 启动/停止 ----------
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=256 * 1024 * 1024)
+        app.router.add_get("/IsRunning", self._is_running)
+        app.router.add_get("/CheckDatabaseOK", self._check_database)
+        app.router.add_post("/FakeInject", self._fake_inject)
+        app.router.add_get("/FakeStats", self._fake_stats)
+        app.router.add_route("*", "/{endpoint}", self._dispatch)
+        return app
+
+    async def start(self) -> "FakeWechatAPIServer":
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]  # port=0 时为实际端口
+        logger.info("模拟WechatAPI服务器已启动: http://{}:{} 好友:{} 群聊:{}", self.host, self.port,
+                    len(self.friends), len(self.chatrooms))
+        return self
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "FakeWechatAPIServer":
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    # ---------- 入站消息 ----------
+
+    def inject(self, *messages: Dict[str, Any]):
+        """注入入站消息，之后的 /Sync 按顺序返回"""
+        self.inbox.extend(messages)
+
+    async def stream(self, messages: Iterable[Dict[str, Any]], rate: float = 0) -> int:
+        """按 rate 条/秒持续注入消息，rate 为0时一次全部注入，返回注入的消息数"""
+        count = 0
+        start = time.monotonic()
+        for message in messages:
+            self.inbox.append(message)
+            count += 1
+            if rate > 0:
+                delay = start + count / rate - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+        return count
+
+    async def drained(self, poll: float = 0.01):
+        """等待注入的消息全部被 /Sync 取走"""
+        while self.inbox:
+            await asyncio.sleep(poll)
+
+    # ---------- 延迟/错误/限流 ----------
+
+    def set_latency(self, seconds: float, jitter: float = 0.0, endpoint: str = "*"):
+        """设置接口延迟（秒），实际延迟为 seconds + [0, jitter) 的随机值"""
+        fault = self._faults.setdefault(endpoint, Fault())
+        fault.latency, fault.jitter = seconds, jitter
+
+    def set_errors(self, rate: float, code: int = -2, message: str = "模拟错误", endpoint: str = "*"):
+        """设置接口以 rate 的概率返回错误码 code"""
+        fault = self._faults.setdefault(endpoint, Fault())
+        fault.error_rate, fault.error_code, fault.error_message = rate, code, message
+
+    def set_rate_limit(self, limit: int, per: float = 1.0, code: int = -12, endpoint: str = None):
+        """每 per 秒最多 limit 次请求，超过时返回 code（默认 -12 操作过于频繁）
+
+        不指定 endpoint 时分别限制每个发送类接口，见 SEND_ENDPOINTS。
+        """
+        for name in ([endpoint] if endpoint else SEND_ENDPOINTS):
+            self._limits[name] = RateLimit(limit, per, code)
+
+    def clear_faults(self):
+        """清除所有延迟、错误和限流设置"""
+        self._faults.clear()
+        self._limits.clear()
+
+    # ---------- 模拟通讯录 ----------
+
+    def nickname_of(self, wxid: str) -> str:
+        nickname = self._nicknames.get(wxid)
+        if nickname is None:
+            nickname = self._nicknames[wxid] = f"{random.Random(wxid).choice(NICKNAMES)}{len(self._nicknames)}"
+        return nickname
+
+    def add_members(self, chatroom: str, wxids: Iterable[str]):
+        members = self.chatroom_members.setdefault(chatroom, [self.wxid])
+        for wxid in wxids:
+            if wxid not in members:
+                members.append(wxid)
+            self._known.add(wxid)
+
+    def contact(self, wxid: str) -> Dict[str, Any]:
+        """GetContact/GetContractDetail 返回的联系人，不存在的wxid返回空联系人"""
+        if wxid not in self._known:
+            return {"UserName": {}, "NickName": {}, "PyInitial": {}, "QuanPin": {}, "Remark": {}}
+
+        contact = {
+            "UserName": {"string": wxid},
+            "NickName": {"string": self.nickname_of(wxid) if not wxid.endswith("@chatroom") else f"测试群{wxid[:4]}"},
+            "PyInitial": {"string": ""},
+            "QuanPin": {"string": ""},
+            "Sex": random.Random(wxid).randint(0, 2),
+            "ImgBuf": {"iLen": 0},
+            "BitMask": 4294967295,
+            "BitVal": 3,
+            "ImgFlag": 1,
+            "Remark": {},
+            "ContactType": 0,
+            "RoomInfoCount": 0,
+            "DomainList": [{}],
+            "ChatRoomNotify": 1,
+            "AddContactScene": 0,
+            "Province": "",
+            "City": "",
+            "Signature": "",
+            "PersonalCard": 0,
+            "HasWeiXinHdHeadImg": 1,
+            "VerifyFlag": 0,
+            "Level": 0,
+            "Source": 14,
+            "Alias": "",
+            "BigHeadImgUrl": f"https://wx.qlogo.cn/mmhead/ver_1/{wxid}/0",
+            "SmallHeadImgUrl": f"https://wx.qlogo.cn/mmhead/ver_1/{wxid}/132",
+        }
+        if wxid.endswith("@chatroom"):
+            contact["ChatRoomOwner"] = self.chatroom_owners.get(wxid, "")
+            contact["NewChatroomData"] = {"MemberCount": len(self.chatroom_members[wxid]), "ChatRoomMember": [],
+                                          "InfoMask": 1}
+            contact["ChatroomVersion"] = 700000000 + len(self.chatroom_members[wxid])
+            contact["ChatroomMaxCount"] = 500
+        return contact
+
+    def member(self, chatroom: str, wxid: str) -> Dict[str, Any]:
+        return {
+            "UserName": wxid,
+            "NickName": self.nickname_of(wxid),
+            "DisplayName": "",
+            "BigHeadImgUrl": f"https://wx.qlogo.cn/mmhead/ver_1/{wxid}/0",
+            "SmallHeadImgUrl": f"https://wx.qlogo.cn/mmhead/ver_1/{wxid}/132",
+            "ChatroomMemberFlag": 0,
+            "InviterUserName": self.chatroom_owners.get(chatroom, ""),
+        }
+
+    # ---------- 媒体数据 ----------
+
+    def _random_bytes(self, name: str, size: int) -> bytes:
+        data = self._media.get(name)
+        if data is None or len(data) != size:
+            data = self._media[name] = random.Random(name).randbytes(size)
+        return data
+
+    def image_bytes(self) -> bytes:
+        if self.image_size:
+            return self._random_bytes("image", self.image_size)
+        data = self._media.get("fallback")
+        if data is None:
+            data = self._media["fallback"] = FALLBACK_IMAGE.read_bytes()
+        return data
+
+    def voice_bytes(self) -> bytes:
+        """1秒静音的silk语音；没有安装 pysilk 时为随机数据"""
+        data = self._media.get("voice")
+        if data is None:
+            try:
+                import pysilk
+                data = pysilk.encode(b"\x00\x00" * 24000, data_rate=24000, sample_rate=24000)
+            except Exception as e:
+                logger.warning("生成silk语音失败，使用随机数据: {}", e)
+                data = random.Random("voice").randbytes(3000)
+            self._media["voice"] = data
+        return data
+
+    @staticmethod
+    def _buffer(data: bytes) -> Dict[str, Any]:
+        return {"iLen": len(data), "buffer": base64.b64encode(data).decode()}
+
+    # ---------- 请求处理 ----------
+
+    async def _is_running(self, request: web.Request) -> web.Response:
+        return web.Response(text="OK")
+
+    async def _check_database(self, request: web.Request) -> web.Response:
+        return web.json_response({"Running": True})
+
+    async def _fake_inject(self, request: web.Request) -> web.Response:
+        """POST {"Messages": [...]} 注入原始消息，或 {"Mix": {"text": 9, "image": 1}, "Count": 100} 生成消息"""
+        params = await request.json()
+        messages = list(params.get("Messages") or [])
+        if params.get("Mix"):
+            messages += self.messages.mix(params["Mix"], int(params.get("Count", 1)))
+        self.inject(*messages)
+        return web.json_response({"Success": True, "Data": {"Injected": len(messages), "Pending": len(self.inbox)}})
+
+    async def _fake_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"Success": True, "Data": {"Requests": dict(self.requests),
+                                                            "Errors": dict(self.errors),
+                                                            "Sent": len(self.sent), "Pending": len(self.inbox)}})
+
+    async def _dispatch(self, request: web.Request) -> web.Response:
+        endpoint = request.match_info["endpoint"]
+        self.requests[endpoint] += 1
+        try:
+            params = await request.json() if request.can_read_body else {}
+        except ValueError:
+            params = {}
+
+        fault = self._faults.get(endpoint) or self._faults.get("*")
+        if fault is not None and (fault.latency or fault.jitter):
+            await asyncio.sleep(fault.latency + self.random.random() * fault.jitter)
+
+        limit = self._limits.get(endpoint)
+        if limit is not None and not limit.hit(time.monotonic()):
+            self.errors[endpoint] += 1
+            return web.json_response({"Success": False, "Code": limit.code, "Message": "操作过于频繁", "Data": None})
+
+        if fault is not None and fault.error_rate and self.random.random() < fault.error_rate:
+            self.errors[endpoint] += 1
+            return web.json_response({"Success": False, "Code": fault.error_code, "Message": fault.error_message,
+                                      "Data": None})
+
+        if endpoint in SEND_ENDPOINTS:
+            self.sent.append((endpoint, {key: f"<{len(value)} base64>" if key in _MEDIA_PARAMS else value
+                                         for key, value in params.items()}))
+
+        handler = self._handlers.get(endpoint)
+        data = handler(params) if handler is not None else {}
+        return web.json_response({"Success": True, "Code": 0, "Message": "成功", "Data": data})
+
+    def _new_ids(self):
+        msg_id = next(self._msg_ids)
+        return msg_id, 7000000000000000000 + msg_id, int(time.time())
+
+    def _sync(self, params: dict) -> dict:
+        batch = [self.inbox.popleft() for _ in range(min(self.sync_batch, len(self.inbox)))]
+        return {"ModUserInfos": None, "ModContacts": None, "DelContacts": None, "ModUserImgs": None,
+                "FunctionSwitchs": None, "UserInfoExts": None, "AddMsgs": batch or None,
+                "ContinueFlag": 1 if self.inbox else 0, "KeyBuf": {"iLen": 0}, "Status": 0,
+                "Continue": 1 if self.inbox else 0, "Time": int(time.time()), "UnknownCmdId": "", "Remarks": ""}
+
+    def _send_text(self, params: dict) -> dict:
+        msg_id, new_msg_id, now = self._new_ids()
+        return {"Count": 1, "List": [{"Ret": 0, "ToUsetName": {"string": params.get("ToWxid", "")}, "MsgId": msg_id,
+                                      "ClientMsgid": msg_id, "Createtime": now, "Servertime": now, "Type": 1,
+                                      "NewMsgId": new_msg_id}], "NoKnow": 0}
+
+    def _send_image(self, params: dict) -> dict:
+        msg_id, new_msg_id, now = self._new_ids()
+        return {"BaseResponse": {"ret": 0, "errMsg": {}}, "ClientImgId": {"string": f"{self.wxid}_{msg_id}"},
+                "FromUserName": {"string": self.wxid}, "ToUserName": {"string": params.get("ToWxid", "")},
+                "TotalLen": len(params.get("Base64") or params.get("Content") or "") // 4 * 3, "StartPos": 0,
+                "DataLen": 0, "MsgId": msg_id, "CreateTime": now, "Newmsgid": new_msg_id}
+
+    def _send_video(self, params: dict) -> dict:
+        msg_id, new_msg_id, _ = self._new_ids()
+        return {"BaseResponse": {"ret": 0, "errMsg": {}}, "clientMsgId": f"{self.wxid}_{msg_id}", "msgId": msg_id,
+                "thumbStartPos": 0, "videoStartPos": 0, "newMsgId": new_msg_id, "aeskey": ""}
+
+    def _send_voice(self, params: dict) -> dict:
+        msg_id, new_msg_id, now = self._new_ids()
+        return {"BaseResponse": {"ret": 0, "errMsg": {}}, "FromUserName": self.wxid,
+                "ToUserName": params.get("ToWxid", ""), "Offset": 0, "Length": 0, "ClientMsgId": str(msg_id),
+                "MsgId": msg_id, "CreateTime": now, "VoiceLength": params.get("VoiceTime", 0), "EndFlag": 1,
+                "CancelFlag": 0, "NewMsgId": new_msg_id}
+
+    def _send_app(self, params: dict) -> dict:
+        msg_id, new_msg_id, now = self._new_ids()
+        return {"BaseResponse": {"ret": 0, "errMsg": {}}, "appId": "", "fromUserName": self.wxid,
+                "toUserName": params.get("ToWxid", ""), "msgId": msg_id, "clientMsgId": f"{self.wxid}_{msg_id}",
+                "createTime": now, "type": params.get("Type", 5), "newMsgId": new_msg_id, "msgSource": ""}
+
+    def _send_emoji(self, params: dict) -> dict:
+        msg_id, new_msg_id, _ = self._new_ids()
+        return {"BaseResponse": {"ret": 0, "errMsg": {}}, "emojiItemCount": 1,
+                "emojiItem": [{"ret": 0, "startPos": params.get("TotalLen", 0), "totalLen": params.get("TotalLen", 0),
+                               "md5": params.get("Md5", ""), "msgId": msg_id, "newMsgId": new_msg_id}]}
+
+    def _get_profile(self, params: dict) -> dict:
+        return {"baseResponse": {"ret": 0, "errMsg": {}},
+                "userInfo": {"BitFlag": 1, "UserName": {"string": self.wxid}, "NickName": {"string": self.nickname},
+                             "BindUin": 0, "BindEmail": {}, "BindMobile": {"string": "+8613800000000"},
+                             "Status": 0, "Sex": 0, "PersonalCard": 0, "Signature": "", "Alias": "xybot_fake"},
+                "userInfoExt": {"BigHeadImgUrl": f"https://wx.qlogo.cn/mmhead/ver_1/{self.wxid}/0",
+                                "SmallHeadImgUrl": f"https://wx.qlogo.cn/mmhead/ver_1/{self.wxid}/132"}}
+
+    def _get_contact(self, params: dict) -> dict:
+        wxids = [wxid for wxid in str(params.get("RequestWxids", "")).split(",") if wxid]
+        return {"BaseResponse": {"ret": 0, "errMsg": {}}, "ContactCount": len(wxids),
+                "ContactList": [self.contact(wxid) for wxid in wxids],
+                "Ret": [0] * len(wxids), "Ticket": [{}] * len(wxids)}
+
+    def _get_contract_list(self, params: dict) -> dict:
+        # 好友和群聊按顺序分页，seq 为已返回的个数
+        everyone = self.friends + self.chatrooms
+        start = int(params.get("CurrentWxcontactSeq") or 0)
+        page = everyone[start:start + 100]
+        seq = start + len(page)
+        return {"BaseResponse": {"ret": 0, "errMsg": {}}, "CurrentWxcontactSeq": seq,
+                "CurrentChatRoomContactSeq": seq, "CountinueFlag": 1 if seq < len(everyone) else 0,
+                "ContactUsernameList": page}
+
+    def _get_chatroom_info(self, params: dict) -> dict:
+        return {"BaseResponse": {"ret": 0, "errMsg": {}}, "ContactCount": 1,
+                "ContactList": [self.contact(params.get("Chatroom", ""))]}
+
+    def _get_chatroom_member_detail(self, params: dict) -> dict:
+        chatroom = params.get("Chatroom", "")
+        members = [self.member(chatroom, wxid) for wxid in self.chatroom_members.get(chatroom, [])]
+        return {"BaseResponse": {"ret": 0, "errMsg": {}}, "ChatroomUserName": chatroom,
+                "ServerVersion": 700000000 + len(members),
+                "NewChatroomData": {"MemberCount": len(members), "ChatRoomMember": members, "InfoMask": 1}}
+
+    def _get_qrcode(self, params: dict) -> dict:
+        return {"BaseResponse": {"ret": 0, "errMsg": {}}, "qrcode": self._buffer(self.image_bytes()),
+                "revokeQrcodeId": "", "revokeQrcodeWording": "该二维码7天内有效，重新进入将更新",
+                "expiredTime": int(time.time()) + 7 * 86400}
+
+    def _download_image(self, params: dict) -> str:
+        return base64.b64encode(self.image_bytes()).decode()
+
+    def _download_voice(self, params: dict) -> dict:
+        return {"BaseResponse": {"ret": 0, "errMsg": {}}, "msgId": params.get("MsgId", 0), "offset": 0,
+                "length": len(self.voice_bytes()), "voiceLength": 1000, "clientMsgId": "", "endFlag": 1,
+                "data": self._buffer(self.voice_bytes()), "cancelFlag": 0, "newMsgId": params.get("MsgId", 0)}
+
+    def _download_attach(self, params: dict) -> dict:
+        data = self._random_bytes("attach", self.attach_size)
+        return {"BaseResponse": {"ret": 0, "errMsg": {}}, "appId": "", "mediaId": params.get("AttachId", ""),
+                "userName": self.wxid, "totalLen": len(data), "startPos": 0, "dataLen": len(data),
+                "data": self._buffer(data)}
+
+    def _download_video(self, params: dict) -> dict:
+        data = self._random_bytes("video", self.video_size)
+        return {"BaseResponse": {"ret": 0, "errMsg": {}}, "msgId": params.get("MsgId", 0), "newMsgId": 0,
+                "totalLen": len(data), "startPos": 0, "data": self._buffer(data)}
+
+    def _get_login_qrcode(self, params: dict) -> dict:
+        uuid = f"fake_{self.random.getrandbits(64):016x}"
+        return {"Uuid": uuid, "QRCodeURL": f"https://api.pwmqr.com/qrcode/create/?url=http://weixin.qq.com/x/{uuid}",
+                "ExpiredTime": int(time.time()) + 240}
+
+    def _check_uuid(self, params: dict) -> dict:
+        # 扫码立即成功
+        return {"uuid": params.get("Uuid", ""), "expiredTime": 0,
+                "acctSectResp": {"userName": self.wxid, "nickName": self.nickname, "alias": "xybot_fake"}}
+
+    def _awaken_login(self, params: dict) -> dict:
+        return {"QrCodeResponse": {"Uuid": f"fake_{self.random.getrandbits(64):016x}", "Status": 0}}
+
+    def _get_cached_info(self, params: dict) -> dict:
+        return {"Wxid": self.wxid, "Nickname": self.nickname, "Alias": "xybot_fake", "Mobile": "+8613800000000",
+                "Uin": 0, "DeviceId": "fake-device"}
+
+
+NICKNAMES = ("小明", "小红", "阿强", "Alice", "Bob", "老王", "张三", "李四", "王五", "赵六", "🐱猫猫", "Kevin")
+
+
+async def _serve(args: argparse.Namespace):
+    server = FakeWechatAPIServer(host=args.host, port=args.port, friends=args.friends, chatrooms=args.chatrooms,
+                                 members=args.members, seed=args.seed)
+    if args.latency or args.jitter:
+        server.set_latency(args.latency, args.jitter)
+    if args.error_rate:
+        server.set_errors(args.error_rate, args.error_code)
+    if args.rate_limit:
+        server.set_rate_limit(args.rate_limit)
+
+    async with server:
+        if args.rate:
+            mix = dict(item.split("=") for item in args.mix.split(","))
+            messages = server.messages.mix({kind: float(weight) for kind, weight in mix.items()}, args.count)
+            await server.stream(messages, args.rate)
+            logger.info("模拟消息注入完成: {}条", args.count)
+        await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟WechatAPI服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--friends", type=int, default=200)
+    parser.add_argument("--chatrooms", type=int, default=20)
+    parser.add_argument("--members", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="接口延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="随机附加延迟上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回错误的概率")
+    parser.add_argument("--error-code", type=int, default=-2)
+    parser.add_argument("--rate-limit", type=int, default=0, help="发送类接口每秒最多请求数")
+    parser.add_argument("--rate", type=float, default=0.0, help="每秒注入的模拟消息数，0为不注入")
+    parser.add_argument("--count", type=int, default=1000, help="注入的模拟消息总数")
+    parser.add_argument("--mix", default="text=70,at=10,image=8,voice=4,quote=5,pat=3", help="消息类型权重")
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
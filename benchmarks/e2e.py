@@ -0,0 +1,470 @@
+"""端到端吞吐与延迟基准测试
+
+启动 WechatAPI.Server.fake_server 模拟服务器，加载真实插件，按消息类型权重生成消息交给 XYBot.process_message，
+统计吞吐量、各阶段（规范化/过滤/存库/下载/语音转换/插件）延迟分位数和内存峰值。
+测试在临时目录中运行，数据库、插件数据不会写入项目的 database 目录。
+
+每次结果追加到 benchmarks/results/e2e.jsonl，并与参数相同的上一次结果（或 --baseline 指定标签的结果）对比。
+
+运行: python -m benchmarks.e2e [--count 2000] [--concurrency 16] [--mix text=60,at=10,image=10,voice=5,quote=10,pat=5]
+      python -m benchmarks.e2e --sync --latency 0.02     # 经过 /Sync 轮询，模拟服务器接口延迟20ms
+"""
+import argparse
+import asyncio
+import functools
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS = ROOT / "benchmarks" / "results" / "e2e.jsonl"
+
+DEFAULT_MIX = "text=60,at=10,image=10,voice=5,quote=10,pat=5"
+
+# 会请求第三方服务的插件默认不加载，避免结果受网络影响；--exclude "" 加载全部已启用插件
+DEFAULT_EXCLUDE = ("Dify,TencentLke,DailyBot,DependencyManager,DouyinParser,GetContact,GetWeather,GoodMorning,"
+                   "Music,News,RandomPicture,VideoSender")
+
+_MISSING = object()
+
+STAGES = ("total", "normalize", "filter", "db", "download", "convert", "plugins")
+
+
+def prepare_workspace(directory: Path, keep_filter: bool = False):
+    """在临时目录中准备运行环境：链接项目文件，复制 main_config.toml 并改用临时数据库
+
+    keep_filter 为 False 时关闭黑/白名单，模拟的会话不会被过滤。
+    """
+    for entry in ROOT.iterdir():
+        if entry.name in ("main_config.toml", "database", "logs", ".git"):
+            continue
+        (directory / entry.name).symlink_to(entry, target_is_directory=entry.is_dir())
+    (directory / "database").mkdir()
+
+    config = (ROOT / "main_config.toml").read_text(encoding="utf-8")
+    replacements = {
+        "XYBotDB-url": '"sqlite:///database/xybot.db"',
+        "msgDB-url": '"sqlite+aiosqlite:///database/message.db"',
+        "keyvalDB-url": '"sqlite+aiosqlite:///database/keyval.db"',
+        "sync-record": "false",
+    }
+    if not keep_filter:
+        replacements["ignore-mode"] = '"None"'
+    for key, value in replacements.items():
+        config = re.sub(rf'^({re.escape(key)}\s*=\s*)("[^"]*"|\S+)', lambda m: m.group(1) + value, config,
+                        flags=re.MULTILINE)
+    (directory / "main_config.toml").write_text(config, encoding="utf-8")
+
+
+class StageTimer:
+    """把对象上的方法替换为计时包装，记录每次调用的耗时"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self._patched = []
+
+    def record(self, stage: str, seconds: float):
+        self.samples[stage].append(seconds)
+
+    def wrap(self, obj, name: str, stage: str):
+        original = getattr(obj, name)
+        self._patched.append((obj, name, vars(obj).get(name, _MISSING)))
+
+        if asyncio.iscoroutinefunction(original):
+            @functools.wraps(original)
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await original(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - start)
+        else:
+            @functools.wraps(original)
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - start)
+
+        setattr(obj, name, timed)
+
+    def restore(self):
+        for obj, name, original in reversed(self._patched):
+            if original is _MISSING:  # 实例上原本没有该属性，删除后恢复为类的方法
+                delattr(obj, name)
+            else:
+                setattr(obj, name, original)
+        self._patched.clear()
+
+    def clear(self):
+        self.samples.clear()
+
+
+def percentile(values: List[float], q: float) -> float:
+    """最近秩法分位数，values 已排序"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(q / 100 * len(values)) - 1))]
+
+
+def summarize(values: List[float]) -> dict:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values) * 1000 if values else 0.0,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p90_ms": percentile(values, 90) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": values[-1] * 1000 if values else 0.0,
+    }
+
+
+def max_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0.0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              timeout=5).stdout.strip()
+    except Exception:
+        return ""
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for item in mix.split(","):
+        kind, _, weight = item.partition("=")
+        weights[kind.strip()] = float(weight or 1)
+    return weights
+
+
+class Pipeline:
+    """初始化数据库、XYBot 和插件，连接到模拟服务器，并给各阶段加上计时
+
+    以下模块在导入时读取 main_config.toml，必须在切换到 prepare_workspace 准备的目录后创建。
+    """
+
+    def __init__(self, server, args: argparse.Namespace):
+        self.server = server
+        self.args = args
+        self.timer = StageTimer()
+        self.by_kind: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.plugins: List[str] = []
+        self.bot = self.xybot = None
+
+    async def start(self) -> "Pipeline":
+        from WechatAPI import WechatAPIClient
+        from database.XYBotDB import XYBotDB
+        from database.keyvalDB import KeyvalDB
+        from database.messsagDB import MessageDB
+        from utils import xybot as xybot_module
+        from utils.event_manager import EventManager
+        from utils.plugin_manager import plugin_manager
+
+        await self.server.start()
+
+        await KeyvalDB().initialize()
+        await MessageDB().initialize()
+        XYBotDB()
+
+        bot = self.bot = WechatAPIClient("127.0.0.1", self.server.port)
+        bot.wxid, bot.nickname, bot.alias, bot.phone = self.server.wxid, self.server.nickname, "", ""
+        bot.ignore_protect = True
+        xybot = self.xybot = xybot_module.XYBot(bot)
+        xybot.update_profile(bot.wxid, bot.nickname, bot.alias, bot.phone)
+        xybot.ignore_protection = True
+
+        if not self.args.no_plugins:
+            excluded = {name for name in self.args.exclude.split(",") if name}
+            plugin_manager.excluded_plugins = list({*plugin_manager.excluded_plugins, *excluded})
+            self.plugins = await plugin_manager.load_plugins_from_directory(bot, load_disabled_plugin=False) or []
+        print(f"已加载插件({len(self.plugins)}): {', '.join(sorted(self.plugins))}")
+
+        timer = self.timer
+        timer.wrap(xybot_module, "normalize_message", "normalize")
+        timer.wrap(xybot.message_filter, "check", "filter")
+        timer.wrap(xybot.msg_db, "save_message", "db")
+        for name in ("download_image_bytes", "download_voice_bytes", "download_attach_media", "download_video_media"):
+            timer.wrap(bot, name, "download")
+        timer.wrap(bot, "silk_byte_to_byte_wav_byte", "convert")
+        timer.wrap(EventManager, "emit", "plugins")
+        return self
+
+    async def stop(self):
+        from utils.plugin_manager import plugin_manager
+
+        self.timer.restore()
+        await plugin_manager.unload_all_plugins()
+        await self.server.stop()
+        await close_databases()
+
+    def set_profile(self, wxid: str):
+        """回放换号后的录制时切换机器人wxid"""
+        self.server.wxid = self.bot.wxid = wxid
+        self.xybot.update_profile(wxid, self.bot.nickname, self.bot.alias, self.bot.phone)
+
+    async def process(self, kind: str, raw: dict):
+        start = time.perf_counter()
+        try:
+            await self.xybot.process_message(raw)
+        except Exception as e:
+            self.errors[type(e).__name__] += 1
+            if sum(self.errors.values()) <= 3:
+                from loguru import logger
+                logger.exception("处理消息失败: {}", e)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timer.record("total", elapsed)
+            self.by_kind[kind].append(elapsed)
+
+    def reset_stats(self):
+        self.timer.clear()
+        self.by_kind.clear()
+        self.errors.clear()
+        self.server.requests.clear()
+
+    def result(self, args: argparse.Namespace, params: dict, count: int, elapsed: float, traced_peak: int) -> dict:
+        return {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "revision": git_revision(),
+            "label": args.label,
+            "params": {**params, "plugins": sorted(self.plugins)},
+            "throughput": count / elapsed if elapsed else 0.0,
+            "elapsed": elapsed,
+            "stages": {stage: summarize(self.timer.samples[stage]) for stage in STAGES
+                       if self.timer.samples.get(stage)},
+            "kinds": {kind: summarize(values) for kind, values in sorted(self.by_kind.items())},
+            "max_rss_mb": max_rss_mb(),
+            "tracemalloc_peak_mb": traced_peak / 1024 / 1024,
+            "requests": dict(self.server.requests),
+            "errors": dict(self.errors),
+        }
+
+
+def setup_logging(level: str):
+    from loguru import logger
+
+    logger.remove()
+    logger.add(sys.stderr, level=level)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    from WechatAPI.Server.fake_server import FakeWechatAPIServer
+
+    setup_logging(args.log_level)
+    server = FakeWechatAPIServer(port=0, friends=args.friends, chatrooms=args.chatrooms, members=args.members,
+                                 seed=args.seed)
+    if args.latency or args.jitter:
+        server.set_latency(args.latency, args.jitter)
+    pipeline = await Pipeline(server, args).start()
+
+    weights = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    kinds = rng.choices(list(weights), list(weights.values()), k=args.warmup + args.count)
+    messages = [(kind, server.messages.make(kind)) for kind in kinds]
+
+    async def run_direct(batch):
+        queue = iter(batch)
+
+        async def worker():
+            for kind, raw in queue:
+                await pipeline.process(kind, raw)
+
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+    async def run_sync(batch):
+        # 与主循环相同：轮询 /Sync，每条消息创建一个任务
+        kinds_by_id = {raw["MsgId"]: kind for kind, raw in batch}
+        server.inject(*(raw for _, raw in batch))
+        tasks = []
+        while server.inbox:
+            data = await pipeline.bot.sync_message()
+            for raw in data.get("AddMsgs") or []:
+                tasks.append(asyncio.create_task(pipeline.process(kinds_by_id[raw["MsgId"]], raw)))
+        await asyncio.gather(*tasks)
+
+    runner = run_sync if args.sync else run_direct
+    try:
+        if args.warmup:
+            await runner(messages[:args.warmup])
+            pipeline.reset_stats()
+
+        if args.tracemalloc:
+            tracemalloc.start()
+        start = time.perf_counter()
+        await runner(messages[args.warmup:])
+        elapsed = time.perf_counter() - start
+        traced_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else 0
+        tracemalloc.stop()
+    finally:
+        await pipeline.stop()
+
+    params = {"count": args.count, "concurrency": args.concurrency, "mix": args.mix, "sync": args.sync,
+              "latency": args.latency, "jitter": args.jitter}
+    return pipeline.result(args, params, args.count, elapsed, traced_peak)
+
+
+def print_result(result: dict):
+    print(f"\n消息数:{result['params']['count']} 耗时:{result['elapsed']:.2f}秒 "
+          f"吞吐量:{result['throughput']:.1f}条/秒 内存峰值:{result['max_rss_mb']:.1f}MB", end="")
+    if result["tracemalloc_peak_mb"]:
+        print(f" Python分配峰值:{result['tracemalloc_peak_mb']:.1f}MB", end="")
+    print()
+    if result["errors"]:
+        print(f"错误: {result['errors']}")
+
+    for title, rows in (("阶段", result["stages"]), ("消息类型", result["kinds"])):
+        print(f"\n{title:<10}{'次数':>8}{'平均(ms)':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'最大':>10}")
+        for name, s in rows.items():
+            print(f"{name:<12}{s['count']:>8}{s['mean_ms']:>10.2f}{s['p50_ms']:>10.2f}{s['p90_ms']:>10.2f}"
+                  f"{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}")
+
+    print(f"\n接口请求: {result['requests']}")
+
+
+def load_history(path: Path) -> List[dict]:
+    if not path.exists():
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_baseline(history: List[dict], result: dict, label: str = None) -> dict:
+    for previous in reversed(history):
+        if label is not None:
+            if previous.get("label") == label:
+                return previous
+        elif previous["params"] == result["params"]:
+            return previous
+    return None
+
+
+def compare(baseline: dict, result: dict, threshold: float) -> List[str]:
+    """打印与基准的对比，返回退化的指标"""
+    print(f"\n对比 {baseline['time']} {baseline.get('revision', '')} {baseline.get('label') or ''}".rstrip())
+    rows = [("吞吐量(条/秒)", baseline["throughput"], result["throughput"], True)]
+    for stage, s in result["stages"].items():
+        old = baseline["stages"].get(stage)
+        if old:
+            rows.append((f"{stage} p50(ms)", old["p50_ms"], s["p50_ms"], False))
+            rows.append((f"{stage} p99(ms)", old["p99_ms"], s["p99_ms"], False))
+    rows.append(("内存峰值(MB)", baseline["max_rss_mb"], result["max_rss_mb"], False))
+
+    regressions = []
+    for name, old, new, higher_is_better in rows:
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        mark = " 退化" if worse > threshold else ""
+        if mark:
+            regressions.append(name)
+        print(f"{name:<20}{old:>12.2f}{new:>12.2f}{change * 100:>+9.1f}%{mark}")
+    return regressions
+
+
+async def close_databases():
+    """等 XYBotDB 队列中的写入完成并关闭各数据库，在删除临时目录之前调用
+
+    aiosqlite 的工作线程和 XYBotDB 的线程池不关闭时，结果打印完进程也不会退出；
+    临时目录先被删除时，队列中还没执行的写入会报 readonly database。
+    """
+    from database.XYBotDB import XYBotDB
+    from database.keyvalDB import KeyvalDB
+    from database.messsagDB import MessageDB
+    from utils.member_index import ChatroomMemberIndex
+
+    ChatroomMemberIndex().close()  # 后台对账不再往 XYBotDB 队列提交写入
+    await KeyvalDB().close()
+    await MessageDB().close()
+    xybot_db = XYBotDB()
+    await asyncio.to_thread(xybot_db.executor.shutdown, wait=True)
+    xybot_db.engine.dispose()
+
+
+def run_in_workspace(coro_func, args: argparse.Namespace, keep_filter: bool = False) -> dict:
+    """在临时目录中运行 coro_func(args)，结束后删除临时目录"""
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="xybot-bench-") as workspace:
+        prepare_workspace(Path(workspace), keep_filter)
+        os.chdir(workspace)
+        try:
+            return asyncio.run(coro_func(args))
+        finally:
+            os.chdir(cwd)
+
+
+def report(result: dict, args: argparse.Namespace, path: Path):
+    """打印结果，与历史结果对比并保存；有退化时以退出码1结束"""
+    print_result(result)
+
+    history = load_history(path)
+    baseline = find_baseline(history, result, args.baseline)
+    regressions = compare(baseline, result, args.threshold) if baseline else []
+    if baseline is None:
+        print("\n没有可对比的历史结果")
+
+    if not args.no_save:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    if regressions:
+        print(f"\n退化超过{args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+def add_common_arguments(parser: argparse.ArgumentParser):
+    """e2e 与 replay 共用的参数"""
+    parser.add_argument("--no-plugins", action="store_true", help="不加载插件，只测消息解析和存库")
+    parser.add_argument("--exclude", default=DEFAULT_EXCLUDE, help="不加载的插件，逗号分隔")
+    parser.add_argument("--tracemalloc", action="store_true", help="统计Python内存分配峰值（会降低吞吐量）")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--label", default=None, help="本次结果的标签")
+    parser.add_argument("--baseline", default=None, help="与指定标签的结果对比，默认与参数相同的上一次结果对比")
+    parser.add_argument("--threshold", type=float, default=0.1, help="超过该比例视为退化. Defaults to 0.1")
+    parser.add_argument("--no-save", action="store_true", help="不保存本次结果")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端吞吐与延迟基准测试")
+    parser.add_argument("--count", type=int, default=2000, help="计入统计的消息数")
+    parser.add_argument("--warmup", type=int, default=100, help="预热消息数，不计入统计")
+    parser.add_argument("--concurrency", type=int, default=16, help="同时处理的消息数（--sync 时不限制）")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"消息类型权重，可选 text/at/image/voice/video/file/quote/"
+                                                           f"pat/join. Defaults to {DEFAULT_MIX}")
+    parser.add_argument("--sync", action="store_true", help="经过 /Sync 轮询分发消息，与主循环相同")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟服务器接口延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="模拟服务器随机附加延迟上限（秒）")
+    parser.add_argument("--friends", type=int, default=200)
+    parser.add_argument("--chatrooms", type=int, default=20)
+    parser.add_argument("--members", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    add_common_arguments(parser)
+    args = parser.parse_args()
+
+    result = run_in_workspace(run, args)
+    report(result, args, RESULTS)
+
+
+if __name__ == "__main__":
+    main()
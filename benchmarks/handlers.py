@@ -0,0 +1,201 @@
+"""消息处理函数微基准测试
+
+分别测量 XYBot 各消息处理函数、EventManager.emit、ignore_check 和 MessageDB.save_message 的单次耗时，
+修改 utils/xybot.py、utils/event_manager.py 后可以在本地快速对比。
+测试消息由 WechatAPI.Server.fake_server 的 SyntheticMessages 按固定种子生成，与 /Sync 返回的格式相同，
+每条消息在计时前规范化为 Message，计时只包含处理函数本身。
+处理函数场景不含存库，存库单独测量；进群消息的成员写库在 XYBotDB 线程中排队执行，不计入耗时。
+测试在临时目录中运行，不会写入项目的 database 目录，结束前等排队的写入完成再关闭数据库。
+
+运行: python -m benchmarks.handlers [次数] [--only emit,ignore_check]
+"""
+import argparse
+import itertools
+import random
+import time
+import timeit
+
+from benchmarks.e2e import close_databases, run_in_workspace, setup_logging
+
+CORPUS_SIZE = 200
+
+
+class _NullMessageDB:
+    """不存库的 MessageDB，处理函数场景只测量解析和分发"""
+
+    async def save_message(self, **kwargs) -> bool:
+        return True
+
+
+async def measure(func, make_args, number: int, repeat: int = 3) -> float:
+    """await func(*args) 每次调用的平均耗时（微秒），取 repeat 次中最快的一次
+
+    make_args(number) 返回 number 组参数，在计时前准备，处理函数会修改 Message，每次调用都用新的。
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        batch = make_args(number)
+        start = time.perf_counter()
+        for args in batch:
+            await func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best / number * 1e6
+
+
+class Corpus:
+    """按消息类型生成测试消息"""
+
+    def __init__(self, seed: int = 0):
+        from WechatAPI.Server.fake_server import FakeWechatAPIServer, SyntheticMessages
+
+        self.server = FakeWechatAPIServer(friends=200, chatrooms=20, members=100, seed=seed)
+        self.wxid = self.server.wxid
+        generator = SyntheticMessages(self.server, seed)
+        rng = random.Random(seed)
+
+        def many_ats():
+            chat = rng.choice(self.server.chatrooms)
+            ats = rng.sample(self.server.chatroom_members[chat], rng.randint(2, 8))
+            return generator.at(chat=chat, ats=[self.wxid, *ats] if rng.random() < 0.5 else ats)
+
+        self.raw = {
+            "text": [generator.text() for _ in range(CORPUS_SIZE)],
+            "at": [many_ats() for _ in range(CORPUS_SIZE)],
+            "quote": [generator.quote() for _ in range(CORPUS_SIZE)],
+            "pat": [generator.pat() for _ in range(CORPUS_SIZE)],
+            "join": [generator.join(new_members=[f"wxid_new{i:06d}_{n}" for n in range(rng.randint(1, 5))])
+                     for i in range(CORPUS_SIZE)],
+        }
+
+    def messages(self, kind: str):
+        """make_args：按顺序循环取 kind 类型的消息，规范化为 Message"""
+        from utils.message import normalize_message
+
+        def make_args(number: int):
+            raws = itertools.islice(itertools.cycle(self.raw[kind]), number)
+            return [(normalize_message(raw, self.wxid)[0],) for raw in raws]
+
+        return make_args
+
+
+async def bench_handlers(xybot, corpus: Corpus, number: int):
+    yield "文本", await measure(xybot.process_text_message, corpus.messages("text"), number)
+    yield "文本@多人", await measure(xybot.process_text_message, corpus.messages("at"), number)
+    yield "引用", await measure(xybot.process_quote_message, corpus.messages("quote"), number)
+    yield "系统消息 拍一拍", await measure(xybot.process_system_message, corpus.messages("pat"), number)
+    yield "系统消息 进群(不含成员写库)", await measure(xybot.process_system_message, corpus.messages("join"), number)
+
+
+async def bench_emit(xybot, corpus: Corpus, number: int):
+    from utils.decorators import on_text_message
+    from utils.event_manager import EventManager
+
+    class Handler:
+        @on_text_message
+        async def handle_text(self, bot, message):
+            return True
+
+    make_args = corpus.messages("text")
+    for count in (1, 10, 50):
+        handlers = [Handler() for _ in range(count)]
+        for handler in handlers:
+            EventManager.bind_instance(handler)
+        try:
+            yield f"{count}个处理函数", await measure(
+                lambda message: EventManager.emit("text_message", xybot.bot, message), make_args, number)
+        finally:
+            for handler in handlers:
+                EventManager.unbind_instance(handler)
+
+
+async def bench_ignore_check(xybot, corpus: Corpus, number: int):
+    message_filter = xybot.message_filter
+    senders = [f"wxid_list{i:06d}" for i in range(1000)]
+    chats = [f"{10000000000 + i}@chatroom" for i in range(100)]
+    listed_chat, unlisted_chat = chats[0], corpus.server.chatrooms[0]
+
+    original = message_filter.rules
+    try:
+        for mode, from_wxid, sender in (("None", unlisted_chat, senders[0]),
+                                        ("whitelist", listed_chat, "wxid_unlisted"),
+                                        ("whitelist", unlisted_chat, "wxid_unlisted"),
+                                        ("blacklist", unlisted_chat, "wxid_unlisted")):
+            config = {"XYBot": {"ignore-mode": mode, "whitelist": [*chats, *senders], "blacklist": [*chats, *senders],
+                                "ignore-types": ["voice"]}}
+            message_filter.rules = message_filter.compile(config)
+            hit = "命中" if xybot.ignore_check(from_wxid, sender) else "忽略"
+            seconds = min(timeit.repeat(lambda: xybot.ignore_check(from_wxid, sender), number=number * 10, repeat=3))
+            yield f"{mode} {hit}", seconds / (number * 10) * 1e6
+    finally:
+        message_filter.rules = original
+
+
+async def bench_save_message(xybot, corpus: Corpus, number: int):
+    from database.messsagDB import MessageDB
+
+    db = MessageDB()
+    await db.initialize()
+    contents = [raw["Content"]["string"] for raw in corpus.raw["text"] + corpus.raw["quote"]]
+
+    def make_args(count: int):
+        msg_ids = itertools.count(int(time.time() * 1000))
+        return [(next(msg_ids), content) for content in itertools.islice(itertools.cycle(contents), count)]
+
+    async def save(msg_id: int, content: str):
+        await db.save_message(msg_id=msg_id, sender_wxid="wxid_sender", from_wxid="12345678901@chatroom",
+                              msg_type=1, content=content, is_group=True)
+
+    # 每条消息一次事务提交，比解析慢得多，次数减少为1/20
+    try:
+        yield "sqlite", await measure(save, make_args, max(number // 20, 10))
+    finally:
+        await db.close()
+
+
+CASES = [
+    ("process_*_message", bench_handlers),
+    ("EventManager.emit", bench_emit),
+    ("ignore_check", bench_ignore_check),
+    ("MessageDB.save_message", bench_save_message),
+]
+
+
+async def run(args: argparse.Namespace):
+    from WechatAPI import WechatAPIClient
+    from utils.xybot import XYBot
+
+    setup_logging(args.log_level)
+    corpus = Corpus(args.seed)
+
+    bot = WechatAPIClient("127.0.0.1", corpus.server.port)
+    bot.wxid, bot.nickname = corpus.wxid, corpus.server.nickname
+    xybot = XYBot(bot)
+    xybot.update_profile(bot.wxid, bot.nickname, "", "")
+    xybot.ignore_protection = True
+    xybot.msg_db = _NullMessageDB()
+
+    only = [name for name in args.only.split(",") if name]
+    print(f"{'场景':<40}{'每次(us)':>12}{'每秒':>12}")
+    try:
+        for group, bench in CASES:
+            if only and not any(name in group for name in only):
+                continue
+            async for name, micros in bench(xybot, corpus, args.number):
+                print(f"{group + ' ' + name:<40}{micros:>12.2f}{1e6 / micros:>12.0f}")
+    finally:
+        await close_databases()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="消息处理函数微基准测试")
+    parser.add_argument("number", type=int, nargs="?", default=5000, help="每个场景的调用次数. Defaults to 5000")
+    parser.add_argument("--only", default="", help="只运行名称包含这些关键字的场景组，逗号分隔")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    run_in_workspace(run, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""发送前图片压缩基准测试
+
+按 send_image_message 接受的各种输入（bytes、文件路径、base64字符串、内存中和写入磁盘的 MediaFile）
+分别测量 ImageOptimizer.optimize 首次压缩和命中缓存的耗时，并检查压缩结果能正常解码、尺寸不超过上限。
+测试图片为随机噪点的照片尺寸 PNG，测试在临时目录中运行。
+
+运行: python -m benchmarks.image_optimize [次数]
+"""
+import asyncio
+import base64
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from benchmarks.e2e import setup_logging
+from WechatAPI.Client.image_optimizer import ImageOptimizer
+from WechatAPI.Client.media import MediaFile
+
+
+def make_png(width: int = 3000, height: int = 2000) -> bytes:
+    img = Image.effect_noise((width // 4, height // 4), 40).resize((width, height)).convert("RGB")
+    output = io.BytesIO()
+    img.save(output, format="PNG")
+    return output.getvalue()
+
+
+def spooled(data: bytes, directory: str) -> MediaFile:
+    """写入磁盘临时文件的 MediaFile，与大文件下载的结果相同"""
+    media = MediaFile(threshold=0, directory=directory)
+    media.write(data)
+    return media.finish()
+
+
+async def run(number: int):
+    png = make_png()
+    with tempfile.TemporaryDirectory(prefix="image-optimize-") as directory:
+        path = Path(directory) / "image.png"
+        path.write_bytes(png)
+        inputs = {
+            "bytes": lambda: png,
+            "文件路径": lambda: path,
+            "base64字符串": lambda: base64.b64encode(png).decode(),
+            "MediaFile 内存": lambda: MediaFile.from_bytes(png),
+            "MediaFile 磁盘": lambda: spooled(png, directory),
+        }
+
+        print(f"原图 {len(png)}字节 {Image.open(io.BytesIO(png)).size}")
+        print(f"{'输入':<16}{'首次(ms)':>12}{'缓存(ms)':>12}{'结果(字节)':>14}")
+        for name, make_input in inputs.items():
+            optimizer = ImageOptimizer()
+            start = time.perf_counter()
+            result = await optimizer.optimize(make_input())
+            first = time.perf_counter() - start
+
+            assert isinstance(result, bytes) and len(result) < len(png), f"{name}: 没有压缩"
+            with Image.open(io.BytesIO(result)) as img:
+                assert max(img.size) <= optimizer.max_dimension, f"{name}: 尺寸 {img.size}"
+
+            batch = [make_input() for _ in range(number)]
+            start = time.perf_counter()
+            for image in batch:
+                assert await optimizer.optimize(image) is result
+            cached = (time.perf_counter() - start) / number
+            print(f"{name:<16}{first * 1000:>12.1f}{cached * 1000:>12.2f}{len(result):>14}")
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    setup_logging("WARNING")
+    asyncio.run(run(number))
+
+
+if __name__ == "__main__":
+    main()
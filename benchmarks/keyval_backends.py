@@ -0,0 +1,179 @@
+"""KeyvalDB 后端一致性检查
+
+SQL 后端使用临时目录中的 SQLite 文件，Redis 后端默认使用 fakeredis（pip install fakeredis），
+--redis-url 指定后改用真实 Redis（检查前后会删除 kvcheck:* 键）。两个后端跑同一组检查：
+读写删除、TTL 与过期、SCAN 分批遍历、incr 只在新建时设置过期时间（Redis 为 SET NX + INCRBY）、
+execute 事务（Redis 为 MULTI/EXEC）、compare_and_set，以及缺少方法的后端子类无法实例化。
+
+运行: python -m benchmarks.keyval_backends [--only sql,redis] [--redis-url redis://127.0.0.1:6379/15]
+"""
+import argparse
+import asyncio
+import sys
+import tempfile
+import traceback
+from datetime import timedelta
+from pathlib import Path
+
+from database.keyvalDB import KeyvalBackend, RedisKeyvalBackend, SQLKeyvalBackend
+
+P = "kvcheck:"
+
+
+async def check_set_get_delete(db: KeyvalBackend):
+    assert await db.get(P + "missing") is None
+    assert await db.set(P + "a", "1")
+    assert await db.get(P + "a") == "1"
+    assert await db.exists(P + "a")
+    assert await db.delete(P + "a")
+    assert not await db.delete(P + "a")
+    assert not await db.exists(P + "a")
+
+
+async def check_ttl(db: KeyvalBackend):
+    await db.set(P + "forever", "1")
+    await db.set(P + "short", "1", timedelta(seconds=1))
+    assert await db.ttl(P + "forever") == -1
+    assert await db.ttl(P + "missing") == -1
+    assert 0 <= await db.ttl(P + "short") <= 1
+    _, expire_at = await db.get_entry(P + "short")
+    assert expire_at is not None
+
+    assert await db.expire(P + "forever", timedelta(seconds=1))
+    await asyncio.sleep(1.2)
+    assert await db.get(P + "short") is None
+    assert await db.get_entry(P + "forever") is None
+    assert await db.mget_entries([P + "short", P + "forever"]) == [None, None]
+
+
+async def check_scan(db: KeyvalBackend):
+    await db.mset([(f"{P}user:{i:03d}", str(i), None) for i in range(25)] + [(P + "other:1", "x", None)])
+    keys = [key async for key in db.scan_iter(P + "user:*", count=10)]
+    assert sorted(keys) == [f"{P}user:{i:03d}" for i in range(25)], keys
+    assert sorted(await db.keys(P + "user:00?")) == [f"{P}user:00{i}" for i in range(10)]
+    assert await db.keys(P + "*:1") == [P + "other:1"]
+
+    assert await db.mdelete([f"{P}user:{i:03d}" for i in range(20)]) == 20
+    assert len(await db.keys(P + "user:*")) == 5
+
+
+async def check_incr(db: KeyvalBackend):
+    assert await db.incr(P + "counter", ex=timedelta(seconds=100)) == 1
+    assert await db.incr(P + "counter", 5, ex=timedelta(seconds=1)) == 6
+    assert 90 < await db.ttl(P + "counter") <= 100  # 已存在的键不重设过期时间
+    assert await db.incr(P + "counter", -2) == 4
+
+    assert await db.incr(P + "plain") == 1
+    assert await db.ttl(P + "plain") == -1
+
+
+async def check_execute(db: KeyvalBackend):
+    await db.set(P + "b", "old")
+    results = await db.execute([
+        ("set", (P + "a", "1", None)),
+        ("get", (P + "b",)),
+        ("incr", (P + "n", 2, timedelta(seconds=60))),
+        ("incr", (P + "n", 3, None)),
+        ("expire", (P + "a", timedelta(seconds=60))),
+        ("delete", (P + "b",)),
+        ("get", (P + "b",)),
+    ])
+    assert results == [True, "old", 2, 5, True, True, None], results
+    assert 0 < await db.ttl(P + "a") <= 60
+    assert 0 < await db.ttl(P + "n") <= 60
+
+
+async def check_compare_and_set(db: KeyvalBackend):
+    assert await db.compare_and_set(P + "k", None, "1")
+    assert not await db.compare_and_set(P + "k", None, "2")
+    assert not await db.compare_and_set(P + "k", "0", "2")
+    assert await db.compare_and_set(P + "k", "1", "2", timedelta(seconds=1))
+    assert await db.get(P + "k") == "2"
+
+    await asyncio.sleep(1.2)
+    assert not await db.compare_and_set(P + "k", "2", "3")  # 已过期视为不存在
+    assert await db.compare_and_set(P + "k", None, "4")
+    assert await db.get(P + "k") == "4"
+
+
+CHECKS = [
+    ("读写删除", check_set_get_delete),
+    ("TTL 与过期", check_ttl),
+    ("SCAN 分批遍历", check_scan),
+    ("incr 过期时间", check_incr),
+    ("execute 事务", check_execute),
+    ("compare_and_set", check_compare_and_set),
+]
+
+
+def check_abstract() -> bool:
+    class GetOnly(KeyvalBackend):
+        async def get(self, key):
+            return None
+
+    try:
+        GetOnly()
+    except TypeError:
+        return True
+    return False
+
+
+async def run_backend(make_backend) -> int:
+    """在每项检查前新建后端并清空 kvcheck:* 键，返回失败的检查数"""
+    failed = 0
+    for name, check in CHECKS:
+        db = make_backend()
+        await db.initialize()
+        try:
+            await db.mdelete(await db.keys(P + "*"))
+            await check(db)
+            print(f"  {name:<20}通过")
+        except Exception:
+            failed += 1
+            print(f"  {name:<20}失败")
+            traceback.print_exc()
+        finally:
+            await db.mdelete(await db.keys(P + "*"))
+            await db.close()
+    return failed
+
+
+async def run(args: argparse.Namespace) -> int:
+    only = [name for name in args.only.split(",") if name]
+    failed = 0 if check_abstract() else 1
+    print(f"缺少方法的后端子类无法实例化: {'通过' if not failed else '失败'}")
+
+    with tempfile.TemporaryDirectory(prefix="keyval-") as directory:
+        backends = {"sql": lambda: SQLKeyvalBackend(f"sqlite+aiosqlite:///{Path(directory) / 'keyval.db'}")}
+        if args.redis_url:
+            backends["redis"] = lambda: RedisKeyvalBackend(args.redis_url)
+        else:
+            try:
+                import fakeredis
+                server = fakeredis.FakeServer()
+                backends["redis"] = lambda: RedisKeyvalBackend(
+                    client=fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+            except ImportError:
+                print("未安装 fakeredis，跳过 Redis 后端；可用 --redis-url 指定真实 Redis")
+
+        for name, make_backend in backends.items():
+            if only and name not in only:
+                continue
+            print(f"{name}:")
+            failed += await run_backend(make_backend)
+
+    print("全部通过" if not failed else f"{failed} 项失败")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KeyvalDB 后端一致性检查")
+    parser.add_argument("--only", default="", help="只检查这些后端，逗号分隔：sql,redis")
+    parser.add_argument("--redis-url", default="", help="使用真实 Redis 代替 fakeredis")
+    args = parser.parse_args()
+
+    sys.exit(1 if asyncio.run(run(args)) else 0)
+
+
+if __name__ == "__main__":
+    main()
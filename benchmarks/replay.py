@@ -0,0 +1,115 @@
+"""回放录制的原始消息
+
+把 sync-record 录制的消息（见 utils.sync_recorder）按原速、N倍速或最快速度交给 XYBot.process_message，
+插件发出的请求全部发到 WechatAPI.Server.fake_server 模拟服务器，不会发到真实微信。
+统计方式与 benchmarks.e2e 相同，结果追加到 benchmarks/results/replay.jsonl。
+
+运行: python -m benchmarks.replay logs/sync [--speed 1]      # 原速
+      python -m benchmarks.replay logs/sync --speed 10        # 10倍速
+      python -m benchmarks.replay logs/sync --speed 0         # 最快速度，--concurrency 限制同时处理的消息数
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.e2e import ROOT, Pipeline, add_common_arguments, report, run_in_workspace, setup_logging
+
+RESULTS = ROOT / "benchmarks" / "results" / "replay.jsonl"
+
+
+async def replay(args: argparse.Namespace) -> dict:
+    from WechatAPI.Server.fake_server import FakeWechatAPIServer
+    from utils.message import MESSAGE_TYPES
+    from utils.sync_recorder import read_capture
+
+    setup_logging(args.log_level)
+    records = read_capture(args.capture)
+    first = next(records, None)
+    if first is None:
+        raise SystemExit(f"没有录制的消息: {args.capture}")
+    header = first[0]
+
+    server = FakeWechatAPIServer(port=0, wxid=header.get("wxid") or "wxid_fakebot", friends=0, chatrooms=0)
+    if args.latency or args.jitter:
+        server.set_latency(args.latency, args.jitter)
+    pipeline = await Pipeline(server, args).start()
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    tasks = set()
+    count = 0
+    lag = 0.0
+
+    async def process(kind: str, raw: dict):
+        try:
+            await pipeline.process(kind, raw)
+        finally:
+            semaphore.release()
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    start = time.perf_counter()
+    first_time = first[1]
+    try:
+        for record_header, received_at, raw in _chain(first, records):
+            if args.limit and count >= args.limit:
+                break
+            if record_header.get("wxid") and record_header["wxid"] != server.wxid:  # 录制期间换过号
+                pipeline.set_profile(record_header["wxid"])
+
+            kind = MESSAGE_TYPES.get(raw.get("MsgType"), ("unknown",))[0]
+            if args.speed > 0:  # 按录制时的间隔发送，与主循环一样每条消息一个任务
+                delay = (received_at - first_time) / args.speed - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    lag = max(lag, -delay)
+                task = asyncio.create_task(pipeline.process(kind, raw))
+            else:
+                await semaphore.acquire()
+                task = asyncio.create_task(process(kind, raw))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            count += 1
+
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+        traced_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else 0
+        tracemalloc.stop()
+    finally:
+        await pipeline.stop()
+
+    if lag:
+        print(f"最大落后于录制时间: {lag:.3f}秒")
+    params = {"capture": args.capture, "count": count, "speed": args.speed, "concurrency": args.concurrency,
+              "latency": args.latency, "jitter": args.jitter}
+    result = pipeline.result(args, params, count, elapsed, traced_peak)
+    result["max_lag"] = lag
+    return result
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放录制的原始消息")
+    parser.add_argument("capture", help="录制目录或单个录制文件")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放速度倍数，0为最快速度. Defaults to 1")
+    parser.add_argument("--concurrency", type=int, default=16, help="最快速度回放时同时处理的消息数")
+    parser.add_argument("--limit", type=int, default=0, help="最多回放的消息数，0为不限制")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟服务器接口延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="模拟服务器随机附加延迟上限（秒）")
+    parser.add_argument("--keep-filter", action="store_true", help="保留 main_config.toml 中的黑/白名单设置")
+    add_common_arguments(parser)
+    args = parser.parse_args()
+    args.capture = str(Path(args.capture).resolve())  # 回放在临时目录中运行
+
+    result = run_in_workspace(replay, args, keep_filter=args.keep_filter)
+    report(result, args, RESULTS)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ from database.XYBotDB import XYBotDB
 from database.keyvalDB import KeyvalDB
 from database.messsagDB import MessageDB
 from utils.decorators import scheduler
+from utils.logging_config import setup_logging
 from utils.plugin_manager import plugin_manager
 from utils.xybot import XYBot
 
@@ -120,6 +121,7 @@ async def bot_core():
     try:
         with open(config_path, "rb") as f:
             config = tomllib.load(f)
+        setup_logging(config.get("Log", {}))
         logger.success("读取主设置成功")
     except Exception as e:
         logger.error(f"读取主设置失败: {e}")
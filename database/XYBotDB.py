@@ -1,11 +1,11 @@
 import datetime
 import tomllib
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Union
 
 from loguru import logger
-from sqlalchemy import Column, String, Integer, DateTime, create_engine, JSON, Boolean
-from sqlalchemy import update
+from sqlalchemy import Column, String, Integer, DateTime, create_engine, JSON, Boolean, Index
+from sqlalchemy import update, delete
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -36,6 +36,16 @@ class Chatroom(Base):
     llm_thread_id = Column(JSON, nullable=False, default=lambda: {}, comment='llm_thread_id')
 
 
+class ChatroomMember(Base):
+    __tablename__ = 'chatroom_member'
+
+    chatroom_id = Column(String(20), primary_key=True, nullable=False, autoincrement=False, comment='chatroom_id')
+    wxid = Column(String(20), primary_key=True, nullable=False, autoincrement=False, comment='wxid')
+
+    # 主键 (chatroom_id, wxid) 负责"群里有谁"，反向索引负责"某人在哪些群"
+    __table_args__ = (Index('ix_chatroom_member_wxid', 'wxid', 'chatroom_id'),)
+
+
 class XYBotDB(metaclass=Singleton):
     def __init__(self):
         with open("main_config.toml", "rb") as f:
@@ -47,11 +57,35 @@ class XYBotDB(metaclass=Singleton):
 
         # 创建表
         Base.metadata.create_all(self.engine)
+        self._migrate_chatroom_members()
         logger.success("数据库初始化成功")
 
         # 创建线程池执行器
         self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database")
 
+    def _migrate_chatroom_members(self):
+        """把旧版 Chatroom.members JSON 列迁移到 chatroom_member 表，迁移后清空旧列"""
+        session = self.DBSession()
+        try:
+            migrated = 0
+            for chatroom in session.query(Chatroom).all():
+                if not chatroom.members:
+                    continue
+                existing = {row.wxid for row in
+                            session.query(ChatroomMember.wxid).filter_by(chatroom_id=chatroom.chatroom_id)}
+                session.add_all(ChatroomMember(chatroom_id=chatroom.chatroom_id, wxid=wxid)
+                                for wxid in set(chatroom.members) - existing)
+                chatroom.members = []
+                migrated += 1
+            session.commit()
+            if migrated:
+                logger.info(f"数据库: 已迁移{migrated}个群聊的成员列表")
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.error(f"数据库: 迁移群成员列表失败, 错误: {e}")
+        finally:
+            session.close()
+
     def _execute_in_queue(self, method, *args, **kwargs):
         """在队列中执行数据库操作"""
         future = self.executor.submit(method, *args, **kwargs)
@@ -61,6 +95,16 @@ class XYBotDB(metaclass=Singleton):
             logger.error(f"数据库操作失败: {method.__name__} - {str(e)}")
             raise
 
+    def _submit_to_queue(self, method, *args, **kwargs) -> Future:
+        """提交到同一个数据库队列但不等待结果，在事件循环中调用时不阻塞；写入按提交顺序执行"""
+        def log_error(done: Future):
+            if done.exception() is not None:
+                logger.error(f"数据库操作失败: {method.__name__} - {str(done.exception())}")
+
+        future = self.executor.submit(method, *args, **kwargs)
+        future.add_done_callback(log_error)
+        return future
+
     # USER
 
     def add_points(self, wxid: str, num: int) -> bool:
@@ -408,22 +452,43 @@ class XYBotDB(metaclass=Singleton):
         """Get members of a chatroom"""
         session = self.DBSession()
         try:
-            chatroom = session.query(Chatroom).filter_by(chatroom_id=chatroom_id).first()
-            return set(chatroom.members) if chatroom else set()
+            rows = session.query(ChatroomMember.wxid).filter_by(chatroom_id=chatroom_id).all()
+            return {row.wxid for row in rows}
+        finally:
+            session.close()
+
+    def is_chatroom_member(self, chatroom_id: str, wxid: str) -> bool:
+        """Check whether wxid is a member of the chatroom"""
+        session = self.DBSession()
+        try:
+            return session.get(ChatroomMember, (chatroom_id, wxid)) is not None
+        finally:
+            session.close()
+
+    def get_user_chatrooms(self, wxid: str) -> set:
+        """Get chatrooms the user is in"""
+        session = self.DBSession()
+        try:
+            rows = session.query(ChatroomMember.chatroom_id).filter_by(wxid=wxid).all()
+            return {row.chatroom_id for row in rows}
         finally:
             session.close()
 
     def set_chatroom_members(self, chatroom_id: str, members: set) -> bool:
-        """Set members of a chatroom"""
+        """Thread-safe set members of a chatroom, only the difference is written"""
+        return self._execute_in_queue(self._set_chatroom_members, chatroom_id, members)
+
+    def _set_chatroom_members(self, chatroom_id: str, members: set) -> bool:
         session = self.DBSession()
         try:
-            chatroom = session.query(Chatroom).filter_by(chatroom_id=chatroom_id).first()
-            if not chatroom:
-                chatroom = Chatroom(chatroom_id=chatroom_id)
-                session.add(chatroom)
-            chatroom.members = list(members)  # Convert set to list for JSON storage
-            logger.info(f"Database: Set chatroom {chatroom_id} members successfully")
+            members = set(members)
+            self._ensure_chatroom(session, chatroom_id)
+            existing = {row.wxid for row in
+                        session.query(ChatroomMember.wxid).filter_by(chatroom_id=chatroom_id)}
+            self._insert_members(session, chatroom_id, members - existing)
+            self._delete_members(session, chatroom_id, existing - members)
             session.commit()
+            logger.info(f"Database: Set chatroom {chatroom_id} members successfully")
             return True
         except Exception as e:
             session.rollback()
@@ -432,6 +497,84 @@ class XYBotDB(metaclass=Singleton):
         finally:
             session.close()
 
+    def set_chatroom_members_nowait(self, chatroom_id: str, members: set) -> Future:
+        """set_chatroom_members 的非阻塞版本，返回 concurrent.futures.Future"""
+        return self._submit_to_queue(self._set_chatroom_members, chatroom_id, set(members))
+
+    def add_members(self, chatroom_id: str, members: Union[set, list]) -> bool:
+        """Thread-safe add members to a chatroom"""
+        return self._execute_in_queue(self._add_members, chatroom_id, members)
+
+    def _add_members(self, chatroom_id: str, members: Union[set, list]) -> bool:
+        session = self.DBSession()
+        try:
+            members = set(members)
+            self._ensure_chatroom(session, chatroom_id)
+            existing = set()
+            for chunk in self._chunks(members):
+                existing.update(row.wxid for row in session.query(ChatroomMember.wxid).filter(
+                    ChatroomMember.chatroom_id == chatroom_id, ChatroomMember.wxid.in_(chunk)))
+            self._insert_members(session, chatroom_id, members - existing)
+            session.commit()
+            logger.info(f"数据库: 群聊{chatroom_id}新增成员{len(members - existing)}个")
+            return True
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.error(f"数据库: 群聊{chatroom_id}新增成员失败, 错误: {e}")
+            return False
+        finally:
+            session.close()
+
+    def add_members_nowait(self, chatroom_id: str, members: Union[set, list]) -> Future:
+        """add_members 的非阻塞版本，返回 concurrent.futures.Future"""
+        return self._submit_to_queue(self._add_members, chatroom_id, list(members))
+
+    def remove_members(self, chatroom_id: str, members: Union[set, list]) -> bool:
+        """Thread-safe remove members from a chatroom"""
+        return self._execute_in_queue(self._remove_members, chatroom_id, members)
+
+    def _remove_members(self, chatroom_id: str, members: Union[set, list]) -> bool:
+        session = self.DBSession()
+        try:
+            self._delete_members(session, chatroom_id, set(members))
+            session.commit()
+            logger.info(f"数据库: 群聊{chatroom_id}移除成员{len(members)}个")
+            return True
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.error(f"数据库: 群聊{chatroom_id}移除成员失败, 错误: {e}")
+            return False
+        finally:
+            session.close()
+
+    def remove_members_nowait(self, chatroom_id: str, members: Union[set, list]) -> Future:
+        """remove_members 的非阻塞版本，返回 concurrent.futures.Future"""
+        return self._submit_to_queue(self._remove_members, chatroom_id, list(members))
+
+    @staticmethod
+    def _chunks(items: set, size: int = 500):
+        """按批切分，避免 IN 子句参数过多"""
+        items = list(items)
+        for i in range(0, len(items), size):
+            yield items[i:i + size]
+
+    @staticmethod
+    def _ensure_chatroom(session, chatroom_id: str):
+        if not session.query(Chatroom.chatroom_id).filter_by(chatroom_id=chatroom_id).first():
+            session.add(Chatroom(chatroom_id=chatroom_id))
+
+    @staticmethod
+    def _insert_members(session, chatroom_id: str, members: set):
+        session.add_all(ChatroomMember(chatroom_id=chatroom_id, wxid=wxid) for wxid in members)
+
+    def _delete_members(self, session, chatroom_id: str, members: set):
+        for chunk in self._chunks(members):
+            session.execute(
+                delete(ChatroomMember)
+                .where(ChatroomMember.chatroom_id == chatroom_id)
+                .where(ChatroomMember.wxid.in_(chunk))
+            )
+
     def __del__(self):
         """确保关闭时清理资源"""
         if hasattr(self, 'executor'):
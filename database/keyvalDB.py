@@ -1,11 +1,18 @@
 import asyncio
+import contextlib
+import fnmatch
 import logging
+import sys
+import time
 import tomllib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Union, List
+from typing import AsyncIterator, Optional, Union, List, Tuple
 
 from pydantic import validate_arguments
-from sqlalchemy import Column, String, Text, DateTime, delete, select
+from sqlalchemy import Column, String, Text, DateTime, delete, or_, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_scoped_session
 from sqlalchemy.orm import declarative_base, sessionmaker
 
@@ -13,6 +20,8 @@ from utils.singleton import Singleton
 
 DeclarativeBase = declarative_base()
 
+REDIS_SCHEMES = ("redis://", "rediss://", "unix://")
+
 
 class KeyValue(DeclarativeBase):
     __tablename__ = 'key_value_store'
@@ -22,62 +31,168 @@ class KeyValue(DeclarativeBase):
     expire_time = Column(DateTime, index=True, comment='过期时间')
 
 
-class KeyvalDB(metaclass=Singleton):
-    _instance = None
+def _to_timedelta(ex: Union[int, timedelta]) -> timedelta:
+    return ex if isinstance(ex, timedelta) else timedelta(seconds=ex)
 
-    def __new__(cls):
-        with open("main_config.toml", "rb") as f:
-            main_config = tomllib.load(f)
-        db_url = main_config["XYBot"]["keyvalDB-url"]
 
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance.engine = create_async_engine(
-                db_url,
-                echo=False,
-                future=True
-            )
-            cls._async_session_factory = async_scoped_session(
-                sessionmaker(
-                    cls._instance.engine,
-                    class_=AsyncSession,
-                    expire_on_commit=False
-                ),
-                scopefunc=asyncio.current_task
-            )
-        return cls._instance
+def _glob_prefix(pattern: str) -> str:
+    """glob模式中第一个通配符之前的固定前缀"""
+    for i, char in enumerate(pattern):
+        if char in "*?[":
+            return pattern[:i]
+    return pattern
+
+
+class KeyvalBackend(ABC):
+    """KeyvalDB 存储后端接口，子类必须实现全部方法，缺少任何一个时无法实例化"""
+
+    @abstractmethod
+    async def initialize(self):
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ex: Optional[timedelta] = None) -> bool:
+        ...
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def get_entry(self, key: str) -> Optional[Tuple[str, Optional[float]]]:
+        """获取值和过期时间戳（秒），不存在或已过期返回None"""
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def ttl(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    async def expire(self, key: str, ex: timedelta) -> bool:
+        ...
+
+    @abstractmethod
+    async def keys(self, pattern: str = "*") -> List[str]:
+        ...
+
+    @abstractmethod
+    def scan_iter(self, pattern: str = "*", count: int = 500) -> AsyncIterator[str]:
+        """按游标分批迭代匹配模式的键"""
+        ...
+
+    @abstractmethod
+    async def mget_entries(self, keys: List[str]) -> List[Optional[Tuple[str, Optional[float]]]]:
+        """批量获取值和过期时间戳，顺序与keys一致"""
+        ...
+
+    @abstractmethod
+    async def mset(self, items: List[Tuple[str, str, Optional[timedelta]]]) -> bool:
+        ...
+
+    @abstractmethod
+    async def mdelete(self, keys: List[str]) -> int:
+        ...
+
+    @abstractmethod
+    async def incr(self, key: str, amount: int = 1, ex: Optional[timedelta] = None) -> int:
+        """原子自增，键不存在时从0开始并设置过期时间"""
+        ...
+
+    @abstractmethod
+    async def compare_and_set(self, key: str, expected: Optional[str], value: str,
+                              ex: Optional[timedelta] = None) -> bool:
+        """当前值等于 expected（None 表示键不存在）时才设置，多进程之间也是原子的，返回是否设置成功"""
+        ...
+
+    @abstractmethod
+    async def execute(self, ops: List[Tuple[str, tuple]]) -> list:
+        """在一个事务中执行一组操作，返回各操作的结果"""
+        ...
+
+    @abstractmethod
+    async def close(self):
+        ...
+
+
+class SQLKeyvalBackend(KeyvalBackend):
+    """基于 SQLAlchemy 的后端，默认使用 SQLite"""
+
+    def __init__(self, db_url: str):
+        self.engine = create_async_engine(
+            db_url,
+            echo=False,
+            future=True
+        )
+        self._async_session_factory = async_scoped_session(
+            sessionmaker(
+                self.engine,
+                class_=AsyncSession,
+                expire_on_commit=False
+            ),
+            scopefunc=asyncio.current_task
+        )
+        self._write_lock = asyncio.Lock()
 
     async def initialize(self):
-        """异步初始化数据库"""
         async with self.engine.begin() as conn:
             await conn.run_sync(DeclarativeBase.metadata.create_all)
         # 启动后台清理任务
         asyncio.create_task(self._cleanup_expired())
 
-    @validate_arguments
-    async def set(
-            self,
-            key: str,
-            value: Union[str, dict, list],
-            ex: Optional[Union[int, timedelta]] = None
-    ) -> bool:
-        """设置键值对，支持过期时间（秒或timedelta）"""
+    @staticmethod
+    def _is_expired(row: KeyValue) -> bool:
+        return row.expire_time is not None and row.expire_time < datetime.now()
+
+    @staticmethod
+    async def _set(session: AsyncSession, key: str, value: str, ex: Optional[timedelta] = None) -> bool:
+        await session.merge(KeyValue(key=key, value=value, expire_time=datetime.now() + ex if ex else None))
+        return True
+
+    async def _get(self, session: AsyncSession, key: str) -> Optional[str]:
+        row = await session.get(KeyValue, key)
+        if not row:
+            return None
+        if self._is_expired(row):
+            await session.delete(row)
+            return None
+        return row.value
+
+    @staticmethod
+    async def _delete(session: AsyncSession, key: str) -> bool:
+        result = await session.execute(delete(KeyValue).where(KeyValue.key == key))
+        return result.rowcount > 0
+
+    @staticmethod
+    async def _expire(session: AsyncSession, key: str, ex: timedelta) -> bool:
+        row = await session.get(KeyValue, key)
+        if not row:
+            return False
+        row.expire_time = datetime.now() + ex
+        return True
+
+    async def _incr(self, session: AsyncSession, key: str, amount: int = 1, ex: Optional[timedelta] = None) -> int:
+        row = await session.get(KeyValue, key)
+        if row is None or self._is_expired(row):
+            value = amount
+            await session.merge(KeyValue(key=key, value=str(value),
+                                         expire_time=datetime.now() + ex if ex else None))
+        else:
+            value = int(row.value) + amount
+            row.value = str(value)
+        return value
+
+    async def set(self, key: str, value: str, ex: Optional[timedelta] = None) -> bool:
         async with self._async_session_factory() as session:
             try:
-                expire_time = None
-                if ex:
-                    # 统一处理时间类型转换
-                    if isinstance(ex, int):
-                        expire_time = datetime.now() + timedelta(seconds=ex)
-                    else:
-                        expire_time = datetime.now() + ex
-
-                kv = KeyValue(
-                    key=key,
-                    value=str(value),
-                    expire_time=expire_time
-                )
-                await session.merge(kv)
+                await self._set(session, key, value, ex)
                 await session.commit()
                 return True
             except Exception as e:
@@ -86,28 +201,29 @@ class KeyvalDB(metaclass=Singleton):
                 return False
 
     async def get(self, key: str) -> Optional[str]:
-        """获取键值，自动处理过期数据"""
+        async with self._async_session_factory() as session:
+            value = await self._get(session, key)
+            await session.commit()
+            return value
+
+    async def get_entry(self, key: str) -> Optional[Tuple[str, Optional[float]]]:
         async with self._async_session_factory() as session:
             result = await session.get(KeyValue, key)
             if not result:
                 return None
-
             if result.expire_time and result.expire_time < datetime.now():
                 await session.delete(result)
                 await session.commit()
                 return None
-
-            return result.value
+            return result.value, result.expire_time.timestamp() if result.expire_time else None
 
     async def delete(self, key: str) -> bool:
-        """删除键值"""
         async with self._async_session_factory() as session:
-            result = await session.execute(delete(KeyValue).where(KeyValue.key == key))
+            deleted = await self._delete(session, key)
             await session.commit()
-            return result.rowcount > 0
+            return deleted
 
     async def exists(self, key: str) -> bool:
-        """检查键是否存在"""
         async with self._async_session_factory() as session:
             result = await session.get(KeyValue, key)
             if result and result.expire_time and result.expire_time < datetime.now():
@@ -117,7 +233,6 @@ class KeyvalDB(metaclass=Singleton):
             return result is not None
 
     async def ttl(self, key: str) -> int:
-        """获取剩余生存时间（秒）"""
         async with self._async_session_factory() as session:
             result = await session.get(KeyValue, key)
             if not result or not result.expire_time:
@@ -127,39 +242,686 @@ class KeyvalDB(metaclass=Singleton):
             # 明确返回类型处理
             return int(remaining) if remaining > 0 else -2
 
-    async def expire(self, key: str, ex: Union[int, timedelta]) -> bool:
-        """设置过期时间"""
+    async def expire(self, key: str, ex: timedelta) -> bool:
         async with self._async_session_factory() as session:
-            result = await session.get(KeyValue, key)
-            if not result:
+            updated = await self._expire(session, key, ex)
+            await session.commit()
+            return updated
+
+    async def keys(self, pattern: str = "*") -> List[str]:
+        return [key async for key in self.scan_iter(pattern)]
+
+    async def scan_iter(self, pattern: str = "*", count: int = 500) -> AsyncIterator[str]:
+        # 固定前缀转换为主键上的范围查询，剩余的通配符在取回后再匹配
+        prefix = _glob_prefix(pattern)
+        conditions = []
+        if prefix:
+            conditions.append(KeyValue.key >= prefix)
+            conditions.append(KeyValue.key < prefix[:-1] + chr(ord(prefix[-1]) + 1))
+
+        cursor = None
+        while True:
+            query = select(KeyValue.key).where(
+                *conditions,
+                or_(KeyValue.expire_time.is_(None), KeyValue.expire_time >= datetime.now())
+            )
+            if cursor is not None:
+                query = query.where(KeyValue.key > cursor)
+            query = query.order_by(KeyValue.key).limit(count)
+
+            # 每页单独开一个会话，迭代过程中不长时间占用连接
+            async with self._async_session_factory() as session:
+                page = [str(row[0]) for row in (await session.execute(query)).all()]
+
+            for key in page:
+                if fnmatch.fnmatchcase(key, pattern):
+                    yield key
+            if len(page) < count:
+                return
+            cursor = page[-1]
+
+    async def mget_entries(self, keys: List[str]) -> List[Optional[Tuple[str, Optional[float]]]]:
+        entries = {}
+        async with self._async_session_factory() as session:
+            for i in range(0, len(keys), 500):
+                result = await session.execute(select(KeyValue).where(KeyValue.key.in_(keys[i:i + 500])))
+                for row in result.scalars():
+                    if not self._is_expired(row):
+                        entries[row.key] = (row.value, row.expire_time.timestamp() if row.expire_time else None)
+        return [entries.get(key) for key in keys]
+
+    async def mset(self, items: List[Tuple[str, str, Optional[timedelta]]]) -> bool:
+        async with self._async_session_factory() as session:
+            try:
+                for key, value, ex in items:
+                    await self._set(session, key, value, ex)
+                await session.commit()
+                return True
+            except Exception as e:
+                logging.error(f"批量设置键值失败: {str(e)}")
+                await session.rollback()
                 return False
 
-            expire_time = datetime.now() + (ex if isinstance(ex, timedelta) else timedelta(seconds=ex))
-            result.expire_time = expire_time
+    async def mdelete(self, keys: List[str]) -> int:
+        deleted = 0
+        async with self._async_session_factory() as session:
+            for i in range(0, len(keys), 500):
+                result = await session.execute(delete(KeyValue).where(KeyValue.key.in_(keys[i:i + 500])))
+                deleted += result.rowcount
             await session.commit()
-            return True
+        return deleted
 
-    async def keys(self, pattern: str = "*") -> List[str]:
-        """查找匹配模式的键"""
+    async def incr(self, key: str, amount: int = 1, ex: Optional[timedelta] = None) -> int:
+        # 读改写在进程内加锁，保证并发自增不会丢失
+        async with self._write_lock:
+            async with self._async_session_factory() as session:
+                try:
+                    value = await self._incr(session, key, amount, ex)
+                    await session.commit()
+                    return value
+                except Exception:
+                    await session.rollback()
+                    raise
+
+    async def execute(self, ops: List[Tuple[str, tuple]]) -> list:
+        handlers = {"set": self._set, "get": self._get, "delete": self._delete, "expire": self._expire,
+                    "incr": self._incr}
+        async with self._write_lock:
+            async with self._async_session_factory() as session:
+                try:
+                    results = [await handlers[name](session, *args) for name, args in ops]
+                    await session.commit()
+                    return results
+                except Exception:
+                    await session.rollback()
+                    raise
+
+    async def compare_and_set(self, key: str, expected: Optional[str], value: str,
+                              ex: Optional[timedelta] = None) -> bool:
+        # 条件写在 UPDATE/INSERT 语句中，由数据库保证原子性，不依赖进程内的锁
+        now = datetime.now()
+        expire_time = now + ex if ex else None
+        async with self._write_lock:
+            async with self._async_session_factory() as session:
+                try:
+                    if expected is None:
+                        await session.execute(delete(KeyValue).where(KeyValue.key == key,
+                                                                     KeyValue.expire_time < now))
+                        session.add(KeyValue(key=key, value=value, expire_time=expire_time))
+                        await session.commit()
+                        return True
+
+                    result = await session.execute(
+                        update(KeyValue)
+                        .where(KeyValue.key == key, KeyValue.value == expected,
+                               or_(KeyValue.expire_time.is_(None), KeyValue.expire_time >= now))
+                        .values(value=value, expire_time=expire_time)
+                    )
+                    await session.commit()
+                    return result.rowcount == 1
+                except IntegrityError:  # 其他进程已创建该键
+                    await session.rollback()
+                    return False
+
+    async def _sweep_expired(self, batch_size: int = 500) -> int:
+        """按 expire_time 索引删除一批过期数据，返回删除的数量"""
+        now = datetime.now()
         async with self._async_session_factory() as session:
-            # 显式指定查询列类型
-            query = select(KeyValue.key).where(KeyValue.key.like(pattern.replace("*", "%")))
-            result = await session.execute(query)
-            return [str(row[0]) for row in result.all()]  # 确保返回字符串类型
+            result = await session.execute(
+                select(KeyValue.key).where(KeyValue.expire_time < now)
+                .order_by(KeyValue.expire_time).limit(batch_size)
+            )
+            keys = [row[0] for row in result.all()]
+            if not keys:
+                return 0
+            result = await session.execute(
+                delete(KeyValue).where(KeyValue.key.in_(keys), KeyValue.expire_time < now)
+            )
+            await session.commit()
+            return result.rowcount
 
-    async def _cleanup_expired(self, interval: int = 3600):
-        """后台定时清理过期数据"""
+    async def _cleanup_expired(self, interval: int = 60, batch_size: int = 500):
+        """后台增量清理过期数据，每次只删除一小批，避免长时间锁库"""
         while True:
-            async with self._async_session_factory() as session:
-                await session.execute(
-                    delete(KeyValue).where(KeyValue.expire_time < datetime.now())
+            try:
+                deleted = await self._sweep_expired(batch_size)
+            except Exception as e:
+                logging.error(f"清理过期键值失败: {str(e)}")
+                deleted = 0
+
+            # 一批删满说明还有积压，短暂让出后继续；否则等下一轮
+            await asyncio.sleep(0.1 if deleted >= batch_size else interval)
+
+    async def close(self):
+        await self.engine.dispose()
+
+
+class RedisKeyvalBackend(KeyvalBackend):
+    """Redis 后端，使用连接池，过期时间由 Redis 原生处理
+
+    需要安装 redis 包: pip install redis
+
+    Args:
+        db_url (str): Redis地址，如 redis://127.0.0.1:6379/1
+        max_connections (int, optional): 连接池大小. Defaults to 20.
+        client (redis.asyncio.Redis, optional): 直接使用已创建的客户端（需 decode_responses=True），如 fakeredis
+    """
+
+    def __init__(self, db_url: str = "", max_connections: int = 20, client=None):
+        if client is not None:
+            self.client = client
+            return
+        try:
+            from redis import asyncio as aioredis
+        except ImportError as e:
+            raise ImportError("使用Redis作为keyvalDB需要安装redis: pip install redis") from e
+
+        self.client = aioredis.from_url(db_url, decode_responses=True, max_connections=max_connections)
+
+    async def initialize(self):
+        await self.client.ping()
+
+    async def set(self, key: str, value: str, ex: Optional[timedelta] = None) -> bool:
+        try:
+            return bool(await self.client.set(key, value, ex=ex))
+        except Exception as e:
+            logging.error(f"设置键值失败: {str(e)}")
+            return False
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.client.get(key)
+
+    async def get_entry(self, key: str) -> Optional[Tuple[str, Optional[float]]]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            value, pttl = await pipe.get(key).pttl(key).execute()
+        if value is None:
+            return None
+        return value, time.time() + pttl / 1000 if pttl > 0 else None
+
+    async def delete(self, key: str) -> bool:
+        return await self.client.delete(key) > 0
+
+    async def exists(self, key: str) -> bool:
+        return await self.client.exists(key) > 0
+
+    async def ttl(self, key: str) -> int:
+        remaining = await self.client.ttl(key)
+        # 与SQL后端保持一致: 不存在或没有过期时间都返回-1
+        return -1 if remaining == -2 else remaining
+
+    async def expire(self, key: str, ex: timedelta) -> bool:
+        return bool(await self.client.expire(key, ex))
+
+    async def keys(self, pattern: str = "*") -> List[str]:
+        # 使用 SCAN 迭代，避免 KEYS 阻塞 Redis
+        return [key async for key in self.scan_iter(pattern)]
+
+    async def scan_iter(self, pattern: str = "*", count: int = 500) -> AsyncIterator[str]:
+        async for key in self.client.scan_iter(match=pattern, count=count):
+            yield key
+
+    async def mget_entries(self, keys: List[str]) -> List[Optional[Tuple[str, Optional[float]]]]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.get(key).pttl(key)
+            results = await pipe.execute()
+
+        now = time.time()
+        entries = []
+        for value, pttl in zip(results[::2], results[1::2]):
+            entries.append(None if value is None else (value, now + pttl / 1000 if pttl > 0 else None))
+        return entries
+
+    async def mset(self, items: List[Tuple[str, str, Optional[timedelta]]]) -> bool:
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                for key, value, ex in items:
+                    pipe.set(key, value, ex=ex)
+                return all(await pipe.execute())
+        except Exception as e:
+            logging.error(f"批量设置键值失败: {str(e)}")
+            return False
+
+    async def mdelete(self, keys: List[str]) -> int:
+        return await self.client.delete(*keys) if keys else 0
+
+    async def incr(self, key: str, amount: int = 1, ex: Optional[timedelta] = None) -> int:
+        return (await self.execute([("incr", (key, amount, ex))]))[0]
+
+    async def execute(self, ops: List[Tuple[str, tuple]]) -> list:
+        async with self.client.pipeline(transaction=True) as pipe:
+            for name, args in ops:
+                if name == "set":
+                    key, value, ex = args
+                    pipe.set(key, value, ex=ex)
+                elif name == "incr":
+                    key, amount, ex = args
+                    if ex:  # 键不存在时先以0创建并带上过期时间
+                        pipe.set(key, 0, ex=ex, nx=True)
+                    pipe.incrby(key, amount)
+                else:
+                    getattr(pipe, name)(*args)
+            raw = iter(await pipe.execute())
+
+        results = []
+        for name, args in ops:
+            if name == "incr" and args[2]:
+                next(raw)
+            result = next(raw)
+            if name in ("set", "expire"):
+                result = bool(result)
+            elif name == "delete":
+                result = result > 0
+            results.append(result)
+        return results
+
+    async def compare_and_set(self, key: str, expected: Optional[str], value: str,
+                              ex: Optional[timedelta] = None) -> bool:
+        from redis.exceptions import WatchError
+
+        async with self.client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key)
+                if await pipe.get(key) != expected:
+                    return False
+                pipe.multi()
+                pipe.set(key, value, ex=ex)
+                await pipe.execute()
+                return True
+            except WatchError:  # WATCH 之后键被其他客户端修改
+                return False
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class KeyvalCache:
+    """KeyvalDB 的进程内读缓存
+
+    LRU淘汰，按条目数和估算字节数限制大小；条目在键的过期时间或 max_age 秒后失效，
+    不存在的键也会缓存 negative_ttl 秒。
+
+    Args:
+        max_entries (int, optional): 最多缓存的键数量. Defaults to 10000.
+        max_bytes (int, optional): 缓存估算占用的最大字节数. Defaults to 16MB.
+        max_age (float, optional): 条目最长缓存时间（秒），防止其他进程修改后长期读到旧值. Defaults to 60.
+        negative_ttl (float, optional): 不存在的键缓存时间（秒）. Defaults to 10.
+
+    从后端读取期间键被写入时，读到的可能是旧值，不能缓存：读取前调用 begin() 取得键的版本号，
+    invalidate() 使版本号加一，store() 时版本号已变化的结果直接丢弃。版本号只在有读取进行中时保存。
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 16 * 1024 * 1024, max_age: float = 60,
+                 negative_ttl: float = 10):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.negative_ttl = negative_ttl
+
+        # key -> (value, 失效时间戳, 估算字节数)
+        self._entries: OrderedDict[str, Tuple[Optional[str], float, int]] = OrderedDict()
+        self._bytes = 0
+        # key -> [进行中的读取数, 版本号]
+        self._reads: dict[str, list] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+
+    def lookup(self, key: str) -> Tuple[bool, Optional[str]]:
+        """查询缓存，返回 (是否命中, 值)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+
+        value, valid_until, _ = entry
+        if time.time() >= valid_until:
+            self._discard(key)
+            self.misses += 1
+            return False, None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        if value is None:
+            self.negative_hits += 1
+        return True, value
+
+    def begin(self, key: str) -> int:
+        """开始从后端读取 key，返回当前版本号，读取结束后必须调用 end()"""
+        state = self._reads.setdefault(key, [0, 0])
+        state[0] += 1
+        return state[1]
+
+    def end(self, key: str):
+        state = self._reads[key]
+        state[0] -= 1
+        if state[0] == 0:
+            del self._reads[key]
+
+    def store(self, key: str, value: Optional[str], expire_at: Optional[float] = None,
+              version: Optional[int] = None):
+        """写入缓存，value为None表示键不存在；version 为 begin() 返回的版本号，键在读取期间被写入时不缓存"""
+        if version is not None and self._reads.get(key, (0, version))[1] != version:
+            return
+        now = time.time()
+        if value is None:
+            valid_until = now + self.negative_ttl
+        else:
+            valid_until = now + self.max_age
+            if expire_at is not None:
+                valid_until = min(valid_until, expire_at)
+
+        size = sys.getsizeof(key) + sys.getsizeof(value)
+        if size > self.max_bytes:
+            self._discard(key)
+            return
+
+        self._discard(key)
+        self._entries[key] = (value, valid_until, size)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def _discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def invalidate(self, key: str):
+        """键被写入时调用，移除缓存条目，进行中的读取结果不再缓存"""
+        self._discard(key)
+        state = self._reads.get(key)
+        if state is not None:
+            state[1] += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        """命中率等统计信息"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class KeyvalPipeline:
+    """批量操作管道，退出 async with 时在一个事务中提交全部操作
+
+    用法::
+
+        async with db.pipeline() as pipe:
+            pipe.incr("signin:count", ex=86400)
+            pipe.set("signin:last", wxid)
+            pipe.get("signin:streak")
+        count, _, streak = pipe.results
+    """
+
+    def __init__(self, db: "KeyvalDB"):
+        self._db = db
+        self._ops: List[Tuple[str, tuple]] = []
+        self.results: list = []
+
+    def set(self, key: str, value: Union[str, dict, list], ex: Optional[Union[int, timedelta]] = None):
+        self._ops.append(("set", (key, str(value), _to_timedelta(ex) if ex else None)))
+        return self
+
+    def get(self, key: str):
+        self._ops.append(("get", (key,)))
+        return self
+
+    def delete(self, key: str):
+        self._ops.append(("delete", (key,)))
+        return self
+
+    def expire(self, key: str, ex: Union[int, timedelta]):
+        self._ops.append(("expire", (key, _to_timedelta(ex))))
+        return self
+
+    def incr(self, key: str, amount: int = 1, ex: Optional[Union[int, timedelta]] = None):
+        self._ops.append(("incr", (key, amount, _to_timedelta(ex) if ex else None)))
+        return self
+
+    def decr(self, key: str, amount: int = 1, ex: Optional[Union[int, timedelta]] = None):
+        return self.incr(key, -amount, ex)
+
+    async def execute(self) -> list:
+        """立即执行已排队的操作，返回各操作的结果"""
+        ops, self._ops = self._ops, []
+        self.results = await self._db._execute(ops) if ops else []
+        return self.results
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            await self.execute()
+        else:
+            self._ops = []
+
+
+class KeyvalDB(metaclass=Singleton):
+    """键值数据库，根据 keyvalDB-url 选择后端
+
+    - sqlite+aiosqlite:///database/keyval.db 等 SQLAlchemy 地址使用 SQL 后端
+    - redis://127.0.0.1:6379/1 等地址使用 Redis 后端
+
+    keyvalDB-cache 为 true 时在后端前加一层进程内读缓存，命中情况见 cache_stats()
+    """
+    _instance = None
+
+    def __new__(cls):
+        with open("main_config.toml", "rb") as f:
+            main_config = tomllib.load(f)
+        db_url = main_config["XYBot"]["keyvalDB-url"]
+
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            if db_url.startswith(REDIS_SCHEMES):
+                cls._instance.backend = RedisKeyvalBackend(db_url)
+            else:
+                cls._instance.backend = SQLKeyvalBackend(db_url)
+
+            cls._instance.cache = None
+            xybot_config = main_config["XYBot"]
+            if xybot_config.get("keyvalDB-cache", False):
+                cls._instance.cache = KeyvalCache(
+                    max_entries=xybot_config.get("keyvalDB-cache-entries", 10000),
+                    max_bytes=xybot_config.get("keyvalDB-cache-bytes", 16 * 1024 * 1024),
                 )
-                await session.commit()
-            await asyncio.sleep(interval)
+        return cls._instance
+
+    async def initialize(self):
+        """异步初始化数据库"""
+        await self.backend.initialize()
+
+    @validate_arguments
+    async def set(
+            self,
+            key: str,
+            value: Union[str, dict, list],
+            ex: Optional[Union[int, timedelta]] = None
+    ) -> bool:
+        """设置键值对，支持过期时间（秒或timedelta）"""
+        value = str(value)
+        ex = _to_timedelta(ex) if ex else None
+        with self._writing(key):
+            success = await self.backend.set(key, value, ex)
+        if success and self.cache:
+            self.cache.store(key, value, time.time() + ex.total_seconds() if ex else None)
+        return success
+
+    async def get(self, key: str) -> Optional[str]:
+        """获取键值，自动处理过期数据"""
+        if not self.cache:
+            return await self.backend.get(key)
+
+        hit, value = self.cache.lookup(key)
+        if hit:
+            return value
+
+        version = self.cache.begin(key)
+        try:
+            entry = await self.backend.get_entry(key)
+            if entry is None:
+                self.cache.store(key, None, version=version)
+                return None
+            value, expire_at = entry
+            self.cache.store(key, value, expire_at, version=version)
+            return value
+        finally:
+            self.cache.end(key)
+
+    async def delete(self, key: str) -> bool:
+        """删除键值"""
+        with self._writing(key):
+            return await self.backend.delete(key)
+
+    async def exists(self, key: str) -> bool:
+        """检查键是否存在"""
+        if self.cache:
+            return await self.get(key) is not None
+        return await self.backend.exists(key)
+
+    async def ttl(self, key: str) -> int:
+        """获取剩余生存时间（秒）"""
+        return await self.backend.ttl(key)
+
+    async def expire(self, key: str, ex: Union[int, timedelta]) -> bool:
+        """设置过期时间"""
+        with self._writing(key):
+            return await self.backend.expire(key, _to_timedelta(ex))
+
+    async def keys(self, pattern: str = "*") -> List[str]:
+        """查找匹配模式的键，键较多时建议使用 scan_iter"""
+        return await self.backend.keys(pattern)
+
+    async def scan_iter(self, pattern: str = "*", count: int = 500) -> AsyncIterator[str]:
+        """按游标分批迭代匹配模式的键，每批最多 count 个
+
+        用法::
+
+            async for key in db.scan_iter("signin:*"):
+                ...
+        """
+        async for key in self.backend.scan_iter(pattern, count):
+            yield key
+
+    async def mget(self, keys: List[str]) -> List[Optional[str]]:
+        """批量获取键值，按输入顺序返回，不存在的键为None"""
+        if not self.cache:
+            return [entry[0] if entry else None for entry in await self.backend.mget_entries(keys)]
+
+        values = {}
+        missing = []
+        for key in keys:
+            hit, value = self.cache.lookup(key)
+            if hit:
+                values[key] = value
+            elif key not in values:
+                values[key] = None
+                missing.append(key)
+
+        if missing:
+            versions = [self.cache.begin(key) for key in missing]
+            try:
+                entries = await self.backend.mget_entries(missing)
+                for key, entry, version in zip(missing, entries, versions):
+                    if entry is None:
+                        self.cache.store(key, None, version=version)
+                    else:
+                        values[key] = entry[0]
+                        self.cache.store(key, *entry, version=version)
+            finally:
+                for key in missing:
+                    self.cache.end(key)
+        return [values[key] for key in keys]
+
+    @validate_arguments
+    async def mset(
+            self,
+            mapping: dict[str, Union[str, dict, list]],
+            ex: Optional[Union[int, timedelta, dict[str, Union[int, timedelta]]]] = None
+    ) -> bool:
+        """批量设置键值对，ex 可以是统一的过期时间，也可以是 {键: 过期时间} 分别设置"""
+        items = []
+        for key, value in mapping.items():
+            key_ex = ex.get(key) if isinstance(ex, dict) else ex
+            items.append((key, str(value), _to_timedelta(key_ex) if key_ex else None))
+        if not items:
+            return True
+        with self._writing(*mapping):
+            return await self.backend.mset(items)
+
+    async def mdelete(self, keys: List[str]) -> int:
+        """批量删除键值，返回删除的数量"""
+        if not keys:
+            return 0
+        with self._writing(*keys):
+            return await self.backend.mdelete(keys)
+
+    async def incr(self, key: str, amount: int = 1, ex: Optional[Union[int, timedelta]] = None) -> int:
+        """原子自增并返回新值，键不存在时从0开始，ex 仅在创建键时生效"""
+        with self._writing(key):
+            return await self.backend.incr(key, amount, _to_timedelta(ex) if ex else None)
+
+    async def decr(self, key: str, amount: int = 1, ex: Optional[Union[int, timedelta]] = None) -> int:
+        """原子自减并返回新值"""
+        return await self.incr(key, -amount, ex)
+
+    async def compare_and_set(self, key: str, expected: Optional[str], value: Union[str, dict, list],
+                              ex: Optional[Union[int, timedelta]] = None) -> bool:
+        """当前值等于 expected（None 表示键不存在）时才设置为 value，返回是否设置成功
+
+        用于多进程共享的读-改-写：读取旧值，计算新值，用旧值作为 expected 写入，失败说明被其他进程抢先，重新读取再试。
+        """
+        with self._writing(key):
+            return await self.backend.compare_and_set(key, expected, str(value), _to_timedelta(ex) if ex else None)
+
+    def pipeline(self) -> KeyvalPipeline:
+        """创建批量操作管道，所有操作在一次提交中执行"""
+        return KeyvalPipeline(self)
+
+    async def _execute(self, ops: List[Tuple[str, tuple]]) -> list:
+        with self._writing(*(args[0] for name, args in ops if name != "get")):
+            return await self.backend.execute(ops)
+
+    @contextlib.contextmanager
+    def _writing(self, *keys: str):
+        """写入前后都使读缓存失效
+
+        写入完成前开始的读取可能读到旧值，写入后再次失效使这些读取的版本号过期，结果不会被缓存。
+        """
+        if self.cache:
+            for key in keys:
+                self.cache.invalidate(key)
+        try:
+            yield
+        finally:
+            if self.cache:
+                for key in keys:
+                    self.cache.invalidate(key)
+
+    def cache_stats(self) -> dict:
+        """读缓存的命中统计，未启用缓存时返回空字典"""
+        return self.cache.stats() if self.cache else {}
 
     async def close(self):
         """关闭数据库连接"""
-        await self.engine.dispose()
+        await self.backend.close()
 
     async def __aenter__(self):
         return self
@@ -3,6 +3,7 @@ import tomllib
 from WechatAPI import WechatAPIClient
 from database.XYBotDB import XYBotDB
 from utils.decorators import *
+from utils.message_filter import MessageFilter
 from utils.plugin_base import PluginBase
 
 
@@ -61,6 +62,7 @@ class AdminWhitelist(PluginBase):
                 return
 
             self.db.set_whitelist(change_wxid, True)
+            MessageFilter().reload()
 
             nickname = await bot.get_nickname(change_wxid)
             await bot.send_text_message(message["FromWxid"],
@@ -80,6 +82,7 @@ class AdminWhitelist(PluginBase):
                 return
 
             self.db.set_whitelist(change_wxid, False)
+            MessageFilter().reload()
 
             nickname = await bot.get_nickname(change_wxid)
             await bot.send_text_message(message["FromWxid"],
@@ -1,7 +1,6 @@
 import io
 import json
 import re
-import subprocess
 import tomllib
 from typing import Optional, Union, Dict, List, Tuple
 import time
@@ -23,6 +22,7 @@ from WechatAPI import WechatAPIClient
 from database.XYBotDB import XYBotDB
 from utils.decorators import *
 from utils.plugin_base import PluginBase
+from utils.rate_limit import TokenBucketLimiter, check_rate_limit
 from gtts import gTTS
 import traceback
 import shutil
@@ -332,6 +332,8 @@ class Dify(PluginBase):
             raise
 
         self.db = XYBotDB()
+        # 按用户限流，在扣积分、语音转文字和上传图片之前检查
+        self.limiter = TokenBucketLimiter("Dify", capacity=5, rate=1 / 12)
         self.image_cache = {}
         self.image_cache_timeout = 60
         # 添加文件存储目录配置
@@ -470,6 +472,8 @@ class Dify(PluginBase):
                 "IsGroup": True,
                 "MsgType": 1
             }
+            if not await check_rate_limit(self.limiter, bot, message):
+                return
             logger.debug(f"准备检查积分")
             if await self._check_point(bot, message):
                 logger.debug("积分检查通过，开始调用 Dify API")
@@ -579,7 +583,16 @@ class Dify(PluginBase):
         if not message["IsGroup"]:
             # 先检查唤醒词或触发词，获取对应模型
             model, processed_query, is_switch = self.get_model_from_message(content, message["SenderWxid"])
-            
+
+            if command in self.commands:
+                query = content[len(command):].strip()
+            else:
+                query = content
+
+            # 会调用 Dify 的消息先限流，再上传图片和扣积分
+            if query and model.api_key and not is_switch and not await check_rate_limit(self.limiter, bot, message):
+                return
+
             # 检查是否有最近的图片
             image_content = await self.get_cached_image(message["FromWxid"])
             files = []
@@ -600,11 +613,6 @@ class Dify(PluginBase):
                 except Exception as e:
                     logger.error(f"处理图片失败: {e}")
 
-            if command in self.commands:
-                query = content[len(command):].strip()
-            else:
-                query = content
-                
             # 检查API密钥是否可用 - 使用检测到的模型，而非默认模型
             if query and model.api_key:
                 if await self._check_point(bot, message, model):  # 传递模型到_check_point
@@ -681,7 +689,11 @@ class Dify(PluginBase):
                     processed_wakeup_query = content.replace(original_wakeup, "", 1).strip()
                     logger.info(f"处理后的查询内容: '{processed_wakeup_query}'")
                 break
-        
+
+        # 唤醒词、@和指令消息会调用 Dify，先限流，再上传图片和扣积分
+        if (wakeup_detected or is_at or is_command) and not await check_rate_limit(self.limiter, bot, message):
+            return
+
         # 检查是否有最近的图片 - 无论聊天室功能是否启用都获取图片
         files = []
         image_content = await self.get_cached_image(group_id)
@@ -850,6 +862,9 @@ class Dify(PluginBase):
             await bot.send_at_message(message["FromWxid"], "\n请输入你的问题或指令。", [message["SenderWxid"]])
             return False
 
+        if not await check_rate_limit(self.limiter, bot, message):
+            return False
+
         # 检查唤醒词或触发词，在图片上传前获取对应模型
         model, processed_query, is_switch = self.get_model_from_message(query, message["SenderWxid"])
         if is_switch:
@@ -908,6 +923,10 @@ class Dify(PluginBase):
             await bot.send_text_message(message["FromWxid"], "你还没配置Dify API密钥！")
             return False
 
+        # 语音转文字之前限流
+        if not await check_rate_limit(self.limiter, bot, message):
+            return False
+
         query = await self.audio_to_text(bot, message)
         if not query:
             await bot.send_text_message(message["FromWxid"], VOICE_TRANSCRIPTION_FAILED)
@@ -1332,24 +1351,14 @@ class Dify(PluginBase):
             logger.error("未找到ffmpeg，请安装并配置到环境变量")
             await bot.send_text_message(message["FromWxid"], "服务器缺少ffmpeg，无法处理语音")
             return ""
-        
-        silk_file = "temp_audio.silk"
-        mp3_file = "temp_audio.mp3"
-        try:
-            with open(silk_file, "wb") as f:
-                f.write(message["Content"])
-
-            command = f"ffmpeg -y -i {silk_file} -ar 16000 -ac 1 -f mp3 {mp3_file}"
-            process = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
-            if process.returncode != 0:
-                logger.error(f"ffmpeg 执行失败: {process.stderr}")
-                return ""
 
+        # 框架已把语音转为WAV，这里只需转MP3，转换结果按语音缓存
+        wav_data = message["Content"]
+        try:
             if self.audio_to_text_url:
+                mp3_data = await bot.wav_byte_to_mp3_byte(wav_data, message.get("MsgId"))
                 headers = {"Authorization": f"Bearer {self.current_model.api_key}"}
                 formdata = aiohttp.FormData()
-                with open(mp3_file, "rb") as f:
-                    mp3_data = f.read()
                 formdata.add_field("file", mp3_data, filename="audio.mp3", content_type="audio/mp3")
                 formdata.add_field("user", message["SenderWxid"])
                 async with aiohttp.ClientSession(proxy=self.http_proxy) as session:
@@ -1365,14 +1374,8 @@ class Dify(PluginBase):
                         else:
                             logger.error(f"audio-to-text 接口调用失败: {resp.status} - {await resp.text()}")
 
-            command = f"ffmpeg -y -i {mp3_file} {silk_file.replace('.silk', '.wav')}"
-            process = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
-            if process.returncode != 0:
-                logger.error(f"ffmpeg 转为 WAV 失败: {process.stderr}")
-                return ""
-
             r = sr.Recognizer()
-            with sr.AudioFile(silk_file.replace('.silk', '.wav')) as source:
+            with sr.AudioFile(io.BytesIO(wav_data)) as source:
                 audio = r.record(source)
             text = r.recognize_google(audio, language="zh-CN")
             logger.info(f"语音转文字结果 (Google): {text}")
@@ -1380,10 +1383,6 @@ class Dify(PluginBase):
         except Exception as e:
             logger.error(f"语音处理失败: {e}")
             return ""
-        finally:
-            for temp_file in [silk_file, mp3_file, silk_file.replace('.silk', '.wav')]:
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
 
     async def text_to_voice_message(self, bot: WechatAPIClient, message: dict, text: str):
         try:
@@ -1409,9 +1408,19 @@ class Dify(PluginBase):
             return
 
         try:
-            # 解析XML获取图片信息
             xml_content = message.get("Content")
-            if isinstance(xml_content, str):
+            if isinstance(xml_content, bytes):
+                # 框架已下载好的图片数据
+                try:
+                    Image.open(io.BytesIO(xml_content))
+                    self.image_cache[message["FromWxid"]] = {
+                        "content": xml_content,
+                        "timestamp": time.time()
+                    }
+                    logger.debug(f"已缓存用户 {message['FromWxid']} 的图片")
+                except Exception as e:
+                    logger.error(f"图片数据无效: {e}")
+            elif isinstance(xml_content, str):
                 try:
                     # 从XML中提取base64图片数据
                     image_base64 = xml_content.split(',')[-1]  # 获取base64部分
@@ -1432,7 +1441,7 @@ class Dify(PluginBase):
                     logger.error(f"处理base64数据失败: {e}")
                     logger.debug(f"Base64数据: {image_base64[:100]}...")  # 只打印前100个字符
             else:
-                logger.error("图片消息内容不是字符串格式")
+                logger.error("图片消息内容不是图片数据或字符串格式")
             
         except Exception as e:
             logger.error(f"处理图片消息失败: {e}")
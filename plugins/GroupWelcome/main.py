@@ -79,13 +79,13 @@ class GroupWelcome(PluginBase):
 
                 now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-                profile = await bot.get_contact(wxid)
+                profile = await bot.get_contact_profile(wxid)
 
                 await bot.send_link_message(message["FromWxid"],
                                             title=f"👏欢迎 {nickname} 加入群聊！🎉",
                                             description=f"⌚时间：{now}\n{self.welcome_message}",
                                             url=self.url,
-                                            thumb_url=profile.get("BigHeadImgUrl", "")
+                                            thumb_url=profile.get("avatar", "")
                                             )
 
     @staticmethod
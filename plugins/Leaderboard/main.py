@@ -1,10 +1,10 @@
-import asyncio
 import tomllib
 from random import choice
 
 from WechatAPI import WechatAPIClient
 from database.XYBotDB import XYBotDB
 from utils.decorators import *
+from utils.member_index import ChatroomMemberIndex
 from utils.plugin_base import PluginBase
 
 
@@ -26,6 +26,7 @@ class Leaderboard(PluginBase):
         self.max_count = config["max-count"]
 
         self.db = XYBotDB()
+        self.member_index = ChatroomMemberIndex()
 
     @on_text_message
     async def handle_text(self, bot: WechatAPIClient, message: dict):
@@ -39,7 +40,7 @@ class Leaderboard(PluginBase):
             return
 
         if "群" in command[0]:
-            chatroom_members = await bot.get_chatroom_member_list(message["FromWxid"])
+            chatroom_members = await self.member_index.get_members(bot, message["FromWxid"])
             data = []
             for member in chatroom_members:
                 wxid = member["UserName"]
@@ -64,27 +65,8 @@ class Leaderboard(PluginBase):
             data = self.db.get_leaderboard(self.max_count)
 
             wxids = [i[0] for i in data]
-            nicknames = []
-
-            async def get_nicknames_chunk(chunk_wxids):
-                return await bot.get_nickname(chunk_wxids)
-
-            # 将wxids分成每组20个
-            chunks = [wxids[i:i + 20] for i in range(0, len(wxids), 20)]
-            # 使用信号量限制并发数为2
-            sem = asyncio.Semaphore(2)
-
-            async def worker(chunk):
-                async with sem:
-                    return await get_nicknames_chunk(chunk)
-
-            # 并发执行所有请求
-            tasks = [worker(chunk) for chunk in chunks]
-            results = await asyncio.gather(*tasks)
-
-            # 将所有结果合并到nicknames列表中
-            for result in results:
-                nicknames.extend(result)
+            # get_nickname 内部会按20个一批合并请求并限制并发
+            nicknames = await bot.get_nickname(wxids)
 
             out_message = "-----XYBot积分排行榜-----"
             rank_emojis = ["👑", "🥈", "🥉"]
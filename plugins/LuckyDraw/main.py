@@ -7,6 +7,7 @@ from WechatAPI import WechatAPIClient
 from database.XYBotDB import XYBotDB
 from utils.decorators import *
 from utils.plugin_base import PluginBase
+from utils.rate_limit import SlidingWindowLimiter, rate_limit
 
 
 class LuckyDraw(PluginBase):
@@ -41,6 +42,7 @@ class LuckyDraw(PluginBase):
         self.db = XYBotDB()
 
     @on_text_message
+    @rate_limit(SlidingWindowLimiter("LuckyDraw", limit=5, window=60), commands="command")
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
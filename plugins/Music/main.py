@@ -5,6 +5,7 @@ from loguru import logger
 from WechatAPI import WechatAPIClient
 from utils.decorators import *
 from utils.plugin_base import PluginBase
+from utils.rate_limit import SlidingWindowLimiter, rate_limit
 
 
 class Music(PluginBase):
@@ -24,6 +25,7 @@ class Music(PluginBase):
         self.command = config["command"]
         self.command_format = config["command-format"]
         self.play_command = config.get("play_command", "播放")
+        self.limited_commands = self.command + [self.play_command]
         self.search_results = {}
         self.api_url = "https://www.hhlqilongzhu.cn/api/dg_wyymusic.php"
 
@@ -84,6 +86,7 @@ class Music(PluginBase):
             return None
 
     @on_text_message
+    @rate_limit(SlidingWindowLimiter("Music", limit=6, window=60), commands="limited_commands")
     async def handle_text(self, bot: WechatAPIClient, message: dict) -> bool:  # 添加类型提示
         """处理文本消息，实现点歌和播放功能."""
         if not self.enable:
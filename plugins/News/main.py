@@ -72,20 +72,7 @@ class News(PluginBase):
     async def noon_news(self, bot: WechatAPIClient):
         if not self.enable_schedule_news:
             return
-        id_list = []
-        wx_seq, chatroom_seq = 0, 0
-        while True:
-            contact_list = await bot.get_contract_list(wx_seq, chatroom_seq)
-            id_list.extend(contact_list["ContactUsernameList"])
-            wx_seq = contact_list["CurrentWxcontactSeq"]
-            chatroom_seq = contact_list["CurrentChatRoomContactSeq"]
-            if contact_list["CountinueFlag"] != 1:
-                break
-
-        chatrooms = []
-        for id in id_list:
-            if id.endswith("@chatroom"):
-                chatrooms.append(id)
+        chatrooms = await bot.contact_directory.chatrooms()
 
         async with aiohttp.ClientSession() as session:
             async with session.get("http://zj.v.api.aa1.cn/api/60s-v2/?cc=XYBot") as resp:
@@ -99,20 +86,7 @@ class News(PluginBase):
     async def night_news(self, bot: WechatAPIClient):
         if not self.enable_schedule_news:
             return
-        id_list = []
-        wx_seq, chatroom_seq = 0, 0
-        while True:
-            contact_list = await bot.get_contract_list(wx_seq, chatroom_seq)
-            id_list.extend(contact_list["ContactUsernameList"])
-            wx_seq = contact_list["CurrentWxcontactSeq"]
-            chatroom_seq = contact_list["CurrentChatRoomContactSeq"]
-            if contact_list["CountinueFlag"] != 1:
-                break
-
-        chatrooms = []
-        for id in id_list:
-            if id.endswith("@chatroom"):
-                chatrooms.append(id)
+        chatrooms = await bot.contact_directory.chatrooms()
 
         async with aiohttp.ClientSession() as session:
             async with session.get("http://v.api.aa1.cn/api/60s-v3/?cc=XYBot") as resp:
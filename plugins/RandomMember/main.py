@@ -3,6 +3,7 @@ import tomllib
 
 from WechatAPI import WechatAPIClient
 from utils.decorators import *
+from utils.member_index import ChatroomMemberIndex
 from utils.plugin_base import PluginBase
 
 
@@ -23,6 +24,8 @@ class RandomMember(PluginBase):
         self.command = config["command"]
         self.count = config["count"]
 
+        self.member_index = ChatroomMemberIndex()
+
     @on_text_message
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
@@ -38,7 +41,7 @@ class RandomMember(PluginBase):
             await bot.send_text_message(message["FromWxid"], "-----XYBot-----\n😠只能在群里使用！")
             return
 
-        memlist = await bot.get_chatroom_member_list(message["FromWxid"])
+        memlist = await self.member_index.get_members(bot, message["FromWxid"])
         random_members = random.sample(memlist, self.count)
 
         output = "\n-----XYBot-----\n👋嘿嘿，我随机选到了这几位："
@@ -7,6 +7,7 @@ from loguru import logger
 from WechatAPI import WechatAPIClient
 from utils.decorators import *
 from utils.plugin_base import PluginBase
+from utils.rate_limit import TokenBucketLimiter, rate_limit
 
 
 class RandomPicture(PluginBase):
@@ -26,6 +27,7 @@ class RandomPicture(PluginBase):
         self.command = config["command"]
 
     @on_text_message
+    @rate_limit(TokenBucketLimiter("RandomPicture", capacity=3, rate=1 / 20), key="chat", commands="command")
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -73,7 +73,10 @@ def on_text_message(priority=50):
 
 
 def on_image_message(priority=50):
-    """图片消息装饰器"""
+    """图片消息装饰器
+
+    message["Content"] 为图片数据 bytes；main_config.toml 中 media-content-base64 = true 时为base64字符串（旧版本行为）
+    """
     def decorator(func):
         if callable(priority):
             func_to_decorate = priority
@@ -118,7 +121,11 @@ def on_emoji_message(priority=50):
 
 
 def on_file_message(priority=50):
-    """文件消息装饰器"""
+    """文件消息装饰器
+
+    message["File"] 为 MediaFile（见 WechatAPI.Client.media），消息处理结束后删除临时文件，之后还要用时先调用 keep()；
+    main_config.toml 中 media-content-base64 = true 时为base64字符串（旧版本行为）
+    """
     def decorator(func):
         if callable(priority):
             func_to_decorate = priority
@@ -148,7 +155,11 @@ def on_quote_message(priority=50):
 
 
 def on_video_message(priority=50):
-    """视频消息装饰器"""
+    """视频消息装饰器
+
+    message["Video"] 为 MediaFile（见 WechatAPI.Client.media），消息处理结束后删除临时文件，之后还要用时先调用 keep()；
+    main_config.toml 中 media-content-base64 = true 时为base64字符串（旧版本行为）
+    """
     def decorator(func):
         if callable(priority):
             func_to_decorate = priority
@@ -0,0 +1,118 @@
+import random
+import sys
+import time
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+# 默认的控制台格式，与 loguru 默认格式一致
+CONSOLE_FORMAT = ("<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+                  "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>")
+
+DEFAULTS: Dict[str, Any] = {
+    "level": "INFO",
+    "console": True,
+    "file": "logs/xybot.log",
+    "rotation": "50 MB",
+    "retention": "7 days",
+    "json": False,
+    "enqueue": True,
+    "payload-max-length": 1024,
+    "payload-full-per-minute": 10,
+    "sample": {},
+}
+
+
+class LogPatcher:
+    """日志采样与超长内容截断，作为 loguru 的 patcher 对每条日志只执行一次
+
+    事件名取 extra 中的 event，没有时取日志内容冒号前的部分（如 "收到文本消息"），
+    插件无需改动即可按事件配置采样比例。警告及以上级别的日志不采样、不截断。
+
+    Args:
+        sample (dict): 事件名 -> 采样比例，0~1
+        max_length (int): 日志内容超过该长度时截断，0 为不截断
+        full_per_minute (int): 每个事件每分钟最多保留多少条超长日志不截断
+    """
+
+    WARNING_NO = 30
+
+    def __init__(self, sample: Dict[str, float], max_length: int, full_per_minute: int):
+        self.sample = {event: float(rate) for event, rate in sample.items()}
+        self.max_length = max_length
+        self.full_per_minute = full_per_minute
+        self._windows: Dict[str, list] = {}  # 事件名 -> [窗口开始时间, 已完整输出的条数]
+
+    def event_of(self, record: dict) -> str:
+        event = record["extra"].get("event")
+        if event:
+            return event
+        head = record["message"][:32]
+        for sep in (":", "："):
+            index = head.find(sep)
+            if index > 0:
+                head = head[:index]
+        return head.strip()
+
+    def _allow_full(self, event: str) -> bool:
+        if self.full_per_minute <= 0:
+            return False
+        now = time.monotonic()
+        window = self._windows.get(event)
+        if window is None or now - window[0] >= 60:
+            if len(self._windows) > 1000:
+                self._windows.clear()
+            window = self._windows[event] = [now, 0]
+        if window[1] >= self.full_per_minute:
+            return False
+        window[1] += 1
+        return True
+
+    def __call__(self, record: dict):
+        event = self.event_of(record)
+        extra = record["extra"]
+        extra.setdefault("event", event)
+        if record["level"].no >= self.WARNING_NO:
+            return
+
+        rate = self.sample.get(event, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            extra["_dropped"] = True
+            return
+
+        message = record["message"]
+        if self.max_length and len(message) > self.max_length and not self._allow_full(event):
+            record["message"] = f"{message[:self.max_length]}...(已截断，共{len(message)}字)"
+            extra["truncated"] = True
+
+
+def _keep(record: dict) -> bool:
+    return not record["extra"].get("_dropped")
+
+
+def setup_logging(config: Optional[Dict[str, Any]] = None) -> LogPatcher:
+    """按 main_config.toml 的 [Log] 设置配置日志，可重复调用，会替换之前的全部输出
+
+    日志默认在后台线程写出（enqueue），事件循环只负责把日志放进队列；文件日志可输出为每行一条的JSON。
+
+    Args:
+        config (dict, optional): [Log] 设置，缺省的项使用 DEFAULTS
+
+    Returns:
+        LogPatcher: 当前生效的采样与截断设置
+    """
+    config = {**DEFAULTS, **(config or {})}
+    patcher = LogPatcher(config["sample"], int(config["payload-max-length"]),
+                         int(config["payload-full-per-minute"]))
+
+    logger.remove()
+    logger.configure(patcher=patcher)
+
+    level = config["level"]
+    enqueue = bool(config["enqueue"])
+    if config["console"]:
+        logger.add(sys.stderr, level=level, format=CONSOLE_FORMAT, filter=_keep, enqueue=enqueue)
+    if config["file"]:
+        logger.add(config["file"], level=level, filter=_keep, enqueue=enqueue, serialize=bool(config["json"]),
+                   rotation=config["rotation"], retention=config["retention"], encoding="utf-8")
+    return patcher
@@ -0,0 +1,189 @@
+import asyncio
+import time
+import tomllib
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from WechatAPI import WechatAPIClient
+from database.XYBotDB import XYBotDB
+from utils.singleton import Singleton
+
+# 进群系统消息模板 -> 新成员所在的 link 名称
+JOIN_TEMPLATES = {
+    '"$names$"加入了群聊': "names",
+    '"$username$"邀请"$names$"加入了群聊': "names",
+    '你邀请"$names$"加入了群聊': "names",
+    '"$adder$"通过扫描"$from$"分享的二维码加入群聊': "adder",
+    '"$adder$"通过"$from$"的邀请二维码加入群聊': "adder",
+}
+
+# 退群/被移出系统消息模板 -> 离开成员所在的 link 名称
+LEAVE_TEMPLATES = {
+    '你将"$kickoutname$"移出了群聊': "kickoutname",
+    '"$username$"将"$kickoutname$"移出了群聊': "kickoutname",
+    '"$kickoutname$"被移出了群聊': "kickoutname",
+    '"$names$"退出了群聊': "names",
+}
+
+
+def parse_template_members(root: ET.Element, link_name: str) -> List[dict]:
+    """从 sysmsgtemplate 中解析指定 link 下的成员列表"""
+    members = []
+    link = root.find(f".//link[@name='{link_name}']")
+    if link is None:
+        return members
+
+    memberlist = link.find("memberlist")
+    if memberlist is None:
+        return members
+
+    for member in memberlist.findall("member"):
+        username = member.findtext("username")
+        if username:
+            members.append({"UserName": username, "NickName": member.findtext("nickname") or ""})
+    return members
+
+
+class ChatroomMemberIndex(metaclass=Singleton):
+    """群成员索引
+
+    首次读取时从服务器拉取一次群成员列表，之后根据进群/退群系统消息增量更新，
+    超过 refresh-interval 后在后台与服务器对账。插件读取成员时无需再请求服务器。
+    单例，第一次调用 ChatroomMemberIndex() 时（XYBot 初始化时）才读取设置和数据库，导入模块没有副作用。
+    """
+
+    def __init__(self):
+        with open("main_config.toml", "rb") as f:
+            main_config = tomllib.load(f)
+
+        self.refresh_interval = main_config.get("XYBot", {}).get("member-index-refresh", 3600)
+
+        self._members: Dict[str, Dict[str, dict]] = {}
+        self._synced_at: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._refreshing: set = set()
+        # 保留后台对账任务的引用，避免任务在完成前被垃圾回收
+        self._tasks: set = set()
+
+        self.db = XYBotDB()
+
+    def _lock(self, chatroom: str) -> asyncio.Lock:
+        if chatroom not in self._locks:
+            self._locks[chatroom] = asyncio.Lock()
+        return self._locks[chatroom]
+
+    async def sync(self, bot: WechatAPIClient, chatroom: str) -> Dict[str, dict]:
+        """从服务器拉取群成员，覆盖本地索引"""
+        async with self._lock(chatroom):
+            return await self._fetch(bot, chatroom)
+
+    async def _fetch(self, bot: WechatAPIClient, chatroom: str) -> Dict[str, dict]:
+        member_list = await bot.get_chatroom_member_list(chatroom) or []
+        members = {member["UserName"]: member for member in member_list if member.get("UserName")}
+        self._members[chatroom] = members
+        self._synced_at[chatroom] = time.monotonic()
+
+        await asyncio.wrap_future(self.db.set_chatroom_members_nowait(chatroom, set(members)))
+        logger.debug("群成员索引: 已同步 {} 共{}人", chatroom, len(members))
+        return members
+
+    async def _background_refresh(self, bot: WechatAPIClient, chatroom: str):
+        try:
+            await self.sync(bot, chatroom)
+        except Exception as e:
+            logger.warning("群成员索引: 对账 {} 失败: {}", chatroom, e)
+
+    async def _ensure(self, bot: WechatAPIClient, chatroom: str) -> Dict[str, dict]:
+        members = self._members.get(chatroom)
+        if members is None:
+            async with self._lock(chatroom):
+                members = self._members.get(chatroom)
+                if members is None:
+                    return await self._fetch(bot, chatroom)
+
+        # 过期的索引先返回旧数据，再在后台对账
+        if (time.monotonic() - self._synced_at.get(chatroom, 0) > self.refresh_interval
+                and chatroom not in self._refreshing):
+            self._refreshing.add(chatroom)
+            task = asyncio.create_task(self._background_refresh(bot, chatroom))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            # 任务在开始运行前被取消时也要清除标记，否则这个群不会再对账
+            task.add_done_callback(lambda _: self._refreshing.discard(chatroom))
+
+        return members
+
+    async def get_members(self, bot: WechatAPIClient, chatroom: str) -> List[dict]:
+        """获取群成员列表，格式与 get_chatroom_member_list 相同"""
+        return list((await self._ensure(bot, chatroom)).values())
+
+    async def get_member_ids(self, bot: WechatAPIClient, chatroom: str) -> set:
+        """获取群成员wxid集合"""
+        return set(await self._ensure(bot, chatroom))
+
+    async def is_member(self, bot: WechatAPIClient, chatroom: str, wxid: str) -> bool:
+        """判断wxid是否在群内"""
+        return wxid in await self._ensure(bot, chatroom)
+
+    def get_cached(self, chatroom: str) -> Optional[Dict[str, dict]]:
+        """仅读取本地索引，未同步过的群返回None"""
+        return self._members.get(chatroom)
+
+    def add_members(self, chatroom: str, members: List[dict]):
+        """增量添加成员，内存中未同步过的群等首次读取时再全量拉取
+
+        数据库写入提交到 XYBotDB 的队列后立即返回，不阻塞消息处理；队列按提交顺序执行，进群/退群不会乱序。
+        """
+        if chatroom in self._members:
+            for member in members:
+                self._members[chatroom][member["UserName"]] = member
+        self.db.add_members_nowait(chatroom, [member["UserName"] for member in members])
+
+    def remove_members(self, chatroom: str, wxids: List[str]):
+        """增量移除成员"""
+        if chatroom in self._members:
+            for wxid in wxids:
+                self._members[chatroom].pop(wxid, None)
+        self.db.remove_members_nowait(chatroom, wxids)
+
+    def close(self):
+        """取消进行中的后台对账"""
+        for task in list(self._tasks):
+            task.cancel()
+
+    def invalidate(self, chatroom: str):
+        """丢弃本地索引，下次读取时重新拉取"""
+        self._members.pop(chatroom, None)
+        self._synced_at.pop(chatroom, None)
+
+    def apply_system_message(self, chatroom: str, root: ET.Element) -> bool:
+        """根据进群/退群系统消息更新索引
+
+        Returns:
+            bool: 消息是否为成员变动消息
+        """
+        template = root.find("sysmsgtemplate/content_template")
+        if template is None:
+            return False
+
+        template_text = template.findtext("template") or ""
+
+        for pattern, link_name in JOIN_TEMPLATES.items():
+            if pattern in template_text:
+                members = parse_template_members(root, link_name)
+                if members:
+                    self.add_members(chatroom, members)
+                    logger.debug("群成员索引: {} 新增成员 {}", chatroom, [m["UserName"] for m in members])
+                return True
+
+        for pattern, link_name in LEAVE_TEMPLATES.items():
+            if pattern in template_text:
+                wxids = [m["UserName"] for m in parse_template_members(root, link_name)]
+                if wxids:
+                    self.remove_members(chatroom, wxids)
+                    logger.debug("群成员索引: {} 移除成员 {}", chatroom, wxids)
+                return True
+
+        return False
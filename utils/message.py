@@ -0,0 +1,231 @@
+import copy
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from WechatAPI.Client.media import MediaFile
+
+_MISSING = object()
+
+# 不可变类型深拷贝时直接复用
+_IMMUTABLE = (str, int, float, bool, bytes, type(None))
+
+
+class Message:
+    """规范化后的消息
+
+    常用字段存放在 __slots__ 中，比20多个键的字典省内存、拷贝也更快；插件仍然按字典方式读写，
+    message["Content"]、message.get("Ats", []) 等写法不变。不在 FIELDS 中的键存放在额外的字典里。
+    """
+
+    FIELDS = (
+        # 同步消息原有字段
+        "MsgId", "NewMsgId", "MsgSeq", "MsgType", "Content", "Status", "ImgStatus", "ImgBuf",
+        "CreateTime", "MsgSource", "PushContent",
+        # 规范化后添加的字段
+        "FromWxid", "ToWxid", "SenderWxid", "IsGroup", "Ats",
+        # 各类消息处理后添加的字段
+        "Quote", "Patter", "Patted", "PatSuffix", "Filename", "FileExtend", "File", "Video",
+    )
+    _FIELD_SET = frozenset(FIELDS)
+    MEDIA_FIELDS = ("File", "Video")
+
+    __slots__ = FIELDS + ("_extra",)
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None, **kwargs):
+        self._extra: Optional[Dict[str, Any]] = None
+        if data:
+            self.update(data)
+        if kwargs:
+            self.update(kwargs)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._FIELD_SET:
+            value = getattr(self, key, _MISSING)
+        else:
+            value = self._extra.get(key, _MISSING) if self._extra else _MISSING
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any):
+        if key in self._FIELD_SET:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key: str):
+        if key in self._FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key: str) -> bool:
+        if key in self._FIELD_SET:
+            return hasattr(self, key)
+        return bool(self._extra) and key in self._extra
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._FIELD_SET:
+            return getattr(self, key, default)
+        return self._extra.get(key, default) if self._extra else default
+
+    def pop(self, key: str, default: Any = _MISSING) -> Any:
+        try:
+            value = self[key]
+        except KeyError:
+            if default is _MISSING:
+                raise
+            return default
+        del self[key]
+        return value
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            self[key] = value = default
+        return value
+
+    def update(self, data: Dict[str, Any]):
+        for key, value in data.items():
+            self[key] = value
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        for key in self.FIELDS:
+            value = getattr(self, key, _MISSING)
+            if value is not _MISSING:
+                yield key, value
+        if self._extra:
+            yield from self._extra.items()
+
+    def keys(self) -> Iterator[str]:
+        return (key for key, _ in self.items())
+
+    def values(self) -> Iterator[Any]:
+        return (value for _, value in self.items())
+
+    def __iter__(self) -> Iterator[str]:
+        return self.keys()
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.items())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (Message, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def close(self):
+        """释放下载的附件/视频（MediaFile），插件调用过 keep() 的除外"""
+        for key in self.MEDIA_FIELDS:
+            value = getattr(self, key, None)
+            if isinstance(value, MediaFile):
+                value.close()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为普通字典"""
+        return dict(self.items())
+
+    def copy(self) -> "Message":
+        new = Message.__new__(Message)
+        new._extra = dict(self._extra) if self._extra else None
+        for key in self.FIELDS:
+            value = getattr(self, key, _MISSING)
+            if value is not _MISSING:
+                setattr(new, key, value)
+        return new
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo) -> "Message":
+        # EventManager 为每个插件深拷贝一次消息，字符串、数字等不可变字段直接复用
+        new = Message.__new__(Message)
+        new._extra = copy.deepcopy(self._extra, memo) if self._extra else None
+        for key in self.FIELDS:
+            value = getattr(self, key, _MISSING)
+            if value is _MISSING:
+                continue
+            setattr(new, key, value if isinstance(value, _IMMUTABLE) else copy.deepcopy(value, memo))
+        return new
+
+    def __reduce__(self):
+        return Message, (self.to_dict(),)
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+
+# 消息类型 -> (处理方式, 群消息中发送人与内容的分隔符, 是否去掉内容中的换行和制表符)
+# 分隔符为 None 的消息不拆分内容
+MESSAGE_TYPES: Dict[int, Tuple[str, Optional[str], bool]] = {
+    1: ("text", ":\n", False),
+    3: ("image", ":", True),
+    34: ("voice", ":", True),
+    43: ("video", ":", False),
+    49: ("xml", ":", True),
+    10002: ("system", ":", False),
+    37: ("friend_request", None, False),
+    51: ("ignore", None, False),
+}
+
+
+def normalize_message(raw: Dict[str, Any], self_wxid: str) -> Tuple[Message, Optional[str]]:
+    """把同步到的原始消息规范化为 Message
+
+    统一处理 FromWxid/ToWxid/SenderWxid/IsGroup 的拆分，各类消息的处理函数不再重复这些逻辑。
+
+    Args:
+        raw (dict): 同步接口返回的原始消息
+        self_wxid (str): 机器人自己的wxid
+
+    Returns:
+        Tuple[Message, Optional[str]]: (规范化后的消息, 处理方式)，未知类型的处理方式为None
+    """
+    message = Message()
+    for key, value in raw.items():
+        if key == "FromUserName":
+            message.FromWxid = (value or {}).get("string")
+        elif key == "ToWxid" and isinstance(value, dict):
+            message.ToWxid = value.get("string")
+        else:
+            message[key] = value
+
+    from_wxid = message.get("FromWxid")
+    to_wxid = message.get("ToWxid")
+    message.FromWxid, message.ToWxid = from_wxid, to_wxid
+
+    # 处理一下自己发的消息
+    if from_wxid == self_wxid and (to_wxid or "").endswith("@chatroom"):
+        message.FromWxid, message.ToWxid = to_wxid, from_wxid
+
+    kind, separator, strip = MESSAGE_TYPES.get(message.get("MsgType"), (None, None, False))
+    if separator is None:
+        return message, kind
+
+    content = message.get("Content")
+    content = (content or {}).get("string", "") if isinstance(content, dict) else (content or "")
+    if strip:
+        content = content.replace("\n", "").replace("\t", "")
+
+    if (message.FromWxid or "").endswith("@chatroom"):  # 群聊消息
+        message.IsGroup = True
+        sender, found, body = content.partition(separator)
+        if found:
+            message.SenderWxid, message.Content = sender, body
+        else:
+            message.SenderWxid, message.Content = self_wxid, content
+    else:
+        message.IsGroup = False
+        message.SenderWxid = message.FromWxid
+        message.Content = content
+        if message.FromWxid == self_wxid:
+            message.FromWxid = message.ToWxid
+
+    return message, kind
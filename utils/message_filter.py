@@ -0,0 +1,96 @@
+import tomllib
+from typing import Iterable, Optional
+
+from loguru import logger
+
+from database.XYBotDB import XYBotDB
+from utils.singleton import Singleton
+
+
+class FilterRules:
+    """编译后的过滤规则，创建后不再修改，重新加载时整体替换
+
+    Args:
+        mode (str): "none"、"whitelist" 或 "blacklist"
+        chats (Iterable[str]): 名单中的群聊
+        senders (Iterable[str]): 名单中的用户
+        ignore_types (Iterable[str]): 不处理的消息类型，见 utils.message.MESSAGE_TYPES
+    """
+
+    __slots__ = ("mode", "chats", "senders", "ignore_types")
+
+    def __init__(self, mode: str, chats: Iterable[str], senders: Iterable[str], ignore_types: Iterable[str]):
+        self.mode = mode
+        self.chats = frozenset(chats)
+        self.senders = frozenset(senders)
+        self.ignore_types = frozenset(ignore_types)
+
+
+class MessageFilter(metaclass=Singleton):
+    """消息过滤引擎
+
+    把 main_config.toml 中的黑/白名单和 AdminWhitelist 保存在 XYBotDB 中的白名单编译成哈希集合，
+    群聊和用户分开存放，每条消息只需几次集合查找。XYBot 在保存、解析消息之前检查，被忽略的会话几乎没有开销。
+    规则变化后调用 reload()，新规则整体替换旧规则，检查过程中不会读到一半新一半旧的规则。
+    单例，第一次调用 MessageFilter() 时（XYBot 初始化时）才读取设置和数据库，导入模块没有副作用。
+    """
+
+    def __init__(self):
+        self.db = XYBotDB()
+        self.rules = FilterRules("none", (), (), ())
+        self.reload()
+
+    @staticmethod
+    def _split(wxids: Iterable[str]):
+        chats, senders = set(), set()
+        for wxid in wxids:
+            (chats if wxid.endswith("@chatroom") else senders).add(wxid)
+        return chats, senders
+
+    def compile(self, main_config: dict, db_whitelist: Optional[Iterable[str]] = None) -> FilterRules:
+        """根据设置和数据库中的白名单编译规则"""
+        config = main_config.get("XYBot", {})
+        mode = str(config.get("ignore-mode", "None")).lower()
+        if mode == "whitelist":
+            chats, senders = self._split([*config.get("whitelist", []), *(db_whitelist or [])])
+        elif mode == "blacklist":
+            chats, senders = self._split(config.get("blacklist", []))
+        else:
+            mode, chats, senders = "none", (), ()
+        return FilterRules(mode, chats, senders, config.get("ignore-types", []))
+
+    def reload(self) -> FilterRules:
+        """重新读取 main_config.toml 和数据库白名单，原子替换当前规则"""
+        with open("main_config.toml", "rb") as f:
+            main_config = tomllib.load(f)
+
+        try:
+            db_whitelist = self.db.get_whitelist_list()
+        except Exception as e:
+            logger.error("读取数据库白名单失败: {}", e)
+            db_whitelist = None
+
+        self.rules = self.compile(main_config, db_whitelist)
+        logger.debug("消息过滤规则已加载: 模式:{} 群聊:{}个 用户:{}个 忽略类型:{}", self.rules.mode,
+                     len(self.rules.chats), len(self.rules.senders), sorted(self.rules.ignore_types))
+        return self.rules
+
+    def check(self, from_wxid: str, sender_wxid: str, kind: Optional[str] = None) -> bool:
+        """是否处理该消息
+
+        Args:
+            from_wxid (str): 消息来源（群聊或私聊对象）
+            sender_wxid (str): 发送人
+            kind (str, optional): 消息处理方式，如 "text"、"image"
+
+        Returns:
+            bool: True 为处理，False 为忽略
+        """
+        rules = self.rules
+        if kind in rules.ignore_types:
+            return False
+        if rules.mode == "whitelist":
+            return from_wxid in rules.chats or sender_wxid in rules.senders
+        if rules.mode == "blacklist":
+            return from_wxid not in rules.chats and sender_wxid not in rules.senders
+        return True
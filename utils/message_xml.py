@@ -0,0 +1,408 @@
+import copy
+import functools
+import html
+import re
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterable, List, Optional
+
+from loguru import logger
+
+# 依次匹配 CDATA、注释、处理指令/声明，以及普通标签（结束标签/开始标签/自闭合标签）
+_TOKEN = re.compile(r"<!\[CDATA\[(.*?)\]\]>|<!--.*?-->|<[?!][^>]*>|<(/?)([^\s/>]+)([^>]*)>", re.S)
+_ATTR = re.compile(r"""([^\s=]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+
+
+def _unescape(text: str) -> str:
+    return html.unescape(text) if "&" in text else text
+
+
+def _parse_attrs(raw: str) -> Dict[str, str]:
+    return {m.group(1): _unescape(m.group(2) if m.group(2) is not None else m.group(3))
+            for m in _ATTR.finditer(raw)}
+
+
+def _attr_value(raw: str, name: str) -> Optional[str]:
+    """直接查找单个属性，属性很多的标签（如图片）比全部解析快得多"""
+    needle = f'{name}="'
+    start = raw.find(needle)
+    while start > 0 and not raw[start - 1].isspace():
+        start = raw.find(needle, start + 1)
+    if start <= 0:
+        return _parse_attrs(raw).get(name) if "'" in raw else None  # 单引号属性走完整解析
+    start += len(needle)
+    end = raw.find('"', start)
+    return _unescape(raw[start:end]) if end != -1 else None
+
+
+def _text_after(content: str, match: re.Match) -> Optional[str]:
+    """开始标签之后、第一个子元素或结束标签之前的文本，与 Element.text 一致"""
+    if match.group(4).endswith("/"):
+        return None
+
+    pos = match.end()
+    end = content.find("<", pos)
+    if end == -1:
+        return None
+    if not content.startswith("<!", end):
+        return _unescape(content[pos:end]) or None
+
+    # 常见情况：文本只有一段CDATA，后面紧跟子元素或结束标签；有注释或多段时逐个标签拼接
+    if content.startswith("<![CDATA[", end):
+        cdata_end = content.find("]]>", end + 9)
+        if cdata_end != -1 and content.startswith("<", cdata_end + 3) and not content.startswith("<!", cdata_end + 3):
+            return (_unescape(content[pos:end]) + content[end + 9:cdata_end]) or None
+
+    parts = []
+    for token in _TOKEN.finditer(content, pos):
+        parts.append(_unescape(content[pos:token.start()]))
+        if token.group(1) is None:
+            if token.group(3) is not None:  # 子元素或结束标签
+                break
+        else:
+            parts.append(token.group(1))
+        pos = token.end()
+
+    return "".join(parts) or None
+
+
+def scan(content: str, paths: Iterable[str]) -> Dict[str, re.Match]:
+    """单次扫描定位多个元素，不构建DOM树，全部找到后提前结束
+
+    不在目标路径上的子树直接跳到对应的结束标签，不逐个扫描其中的标签。
+
+    Args:
+        content (str): XML字符串
+        paths (Iterable[str]): 从根元素开始的路径，如 "msg/appmsg/type"
+
+    Returns:
+        Dict[str, re.Match]: 路径 -> 元素开始标签的匹配结果，找不到的路径不在结果中
+    """
+    targets, prefixes = _plan(tuple(paths))
+    wanted = dict(targets)
+    found = {}
+    stack = []
+    pos = 0
+    while wanted:
+        match = _TOKEN.search(content, pos)
+        if match is None:
+            break
+        pos = match.end()
+
+        closing, tag, attrs = match.group(2, 3, 4)
+        if tag is None:  # CDATA/注释/声明
+            continue
+        if closing:  # 结束标签
+            if stack:
+                stack.pop()
+            continue
+        if attrs.endswith("/"):  # 自闭合标签
+            path = wanted.pop((*stack, tag), None)
+            if path is not None:
+                found[path] = match
+            continue
+
+        stack.append(tag)
+        key = tuple(stack)
+        path = wanted.pop(key, None)
+        if path is not None:
+            found[path] = match
+            if not wanted:
+                break
+        if key not in prefixes:  # 子树中没有要找的元素，跳过
+            pos = _skip_subtree(content, tag, pos)
+            if pos == -1:
+                break
+            stack.pop()
+    return found
+
+
+@functools.lru_cache(maxsize=256)
+def _plan(paths: tuple):
+    """路径元组 -> 要找的元素和它们的上级路径，同一组路径只拆分一次"""
+    targets = {tuple(path.split("/")): path for path in paths}
+    prefixes = frozenset(key[:i] for key in targets for i in range(1, len(key)))
+    return targets, prefixes
+
+
+@functools.lru_cache(maxsize=256)
+def _subtree_tags(tag: str) -> re.Pattern:
+    """匹配 tag 的开始/结束/自闭合标签，CDATA 和注释整体匹配，其中像标签的文本不会被当作标签"""
+    return re.compile(rf"<!\[CDATA\[.*?\]\]>|<!--.*?-->|<(/?){re.escape(tag)}(?:\s[^>]*?)?(/?)>", re.S)
+
+
+def _skip_subtree(content: str, tag: str, pos: int) -> int:
+    """跳过 pos 处开始的 tag 子树，返回对应结束标签之后的位置，找不到时返回-1
+
+    子树中有同名元素时按嵌套层数匹配结束标签，不会停在内层元素的结束标签上。
+    """
+    open_tag, close_tag = f"<{tag}", f"</{tag}>"
+    depth = 1
+    while True:
+        close = content.find(close_tag, pos)
+        if close == -1:
+            return -1
+        if content.find("<!", pos, close) != -1:  # CDATA/注释中可能有像标签的文本，改用正则整体跳过
+            return _skip_subtree_tokens(content, tag, pos, depth)
+        start = content.find(open_tag, pos, close)
+        while start != -1:
+            after = start + len(open_tag)
+            if content[after] in " \t\r\n/>":  # 排除 <ab> 这样前缀相同的标签
+                end = content.find(">", after)
+                if content[end - 1] != "/":  # 自闭合的同名元素不增加层数
+                    depth += 1
+            start = content.find(open_tag, after, close)
+        depth -= 1
+        pos = close + len(close_tag)
+        if depth == 0:
+            return pos
+
+
+def _skip_subtree_tokens(content: str, tag: str, pos: int, depth: int) -> int:
+    """_skip_subtree 的慢速路径：逐个匹配同名标签，CDATA 和注释整体跳过"""
+    for match in _subtree_tags(tag).finditer(content, pos):
+        closing = match.group(1)
+        if closing is None:  # CDATA/注释
+            continue
+        if closing:
+            depth -= 1
+            if depth == 0:
+                return match.end()
+        elif not match.group(2):
+            depth += 1
+    return -1
+
+
+def find_text(content: str, path: str) -> Optional[str]:
+    """读取元素的文本（含CDATA）；元素不存在时返回None"""
+    match = scan(content, (path,)).get(path)
+    return _text_after(content, match) if match is not None else None
+
+
+def find_attrs(content: str, path: str) -> Optional[Dict[str, str]]:
+    """读取元素的全部属性；元素不存在时返回None"""
+    match = scan(content, (path,)).get(path)
+    return _parse_attrs(match.group(4)) if match is not None else None
+
+
+class MessageXml:
+    """消息XML的共享解析结果
+
+    常用字段通过单次扫描直接提取，不构建DOM树；确实需要完整树时访问 root，
+    同一条消息最多只解析一次，各处理步骤共用同一个实例。
+
+    Args:
+        content (str): XML字符串
+    """
+
+    __slots__ = ("content", "_root", "_matches")
+
+    def __init__(self, content: str):
+        self.content = content or ""
+        self._root: Optional[ET.Element] = None
+        self._matches: Dict[str, Optional[re.Match]] = {}
+
+    @property
+    def root(self) -> ET.Element:
+        """完整的DOM树，首次访问时解析，解析失败抛出 ET.ParseError"""
+        if self._root is None:
+            self._root = ET.fromstring(self.content)
+        return self._root
+
+    def _element(self, path: str) -> Optional[ET.Element]:
+        root_tag, *names = path.split("/")
+        element = self._root if self._root.tag == root_tag else None
+        for name in names:  # 逐级 find 比 ElementPath 路径查询快
+            if element is None:
+                break
+            element = element.find(name)
+        return element
+
+    def _locate(self, paths: List[str]) -> List[Optional[re.Match]]:
+        missing = [path for path in paths if path not in self._matches]
+        if missing:
+            found = scan(self.content, missing)
+            for path in missing:
+                self._matches[path] = found.get(path)
+        return [self._matches[path] for path in paths]
+
+    def texts(self, *paths: str) -> List[Optional[str]]:
+        """读取多个元素的文本，路径从根元素开始，如 "msg/appmsg/title"
+
+        单个字段用扫描提取；一次读取多个字段时直接解析整棵树（C实现的解析器更快），之后的读取共用这棵树。
+        """
+        if self._root is None and len(paths) > 1:
+            try:
+                self._root = ET.fromstring(self.content)
+            except ET.ParseError:
+                pass
+        if self._root is not None:
+            elements = [self._element(path) for path in paths]
+            return [element.text if element is not None else None for element in elements]
+        return [_text_after(self.content, match) if match is not None else None
+                for match in self._locate(list(paths))]
+
+    def text(self, path: str, default=None) -> Optional[str]:
+        """读取元素文本，元素不存在或文本为空时返回 default"""
+        value = self.texts(path)[0]
+        return default if value is None else value
+
+    def attrs(self, path: str, *names: str) -> Dict[str, str]:
+        """读取元素属性，指定 names 时只读取这些属性；元素不存在时返回空字典"""
+        if self._root is not None:
+            element = self._element(path)
+            if element is None:
+                return {}
+            return {name: element.get(name) for name in names if name in element.attrib} if names \
+                else dict(element.attrib)
+        match = self._locate([path])[0]
+        if match is None:
+            return {}
+        if not names:
+            return _parse_attrs(match.group(4))
+        values = {name: _attr_value(match.group(4), name) for name in names}
+        return {name: value for name, value in values.items() if value is not None}
+
+    def root_tag(self) -> Optional[str]:
+        """根元素的标签名"""
+        if self._root is not None:
+            return self._root.tag
+        for match in _TOKEN.finditer(self.content):
+            if match.group(3) is not None:
+                return None if match.group(2) else match.group(3)
+        return None
+
+    def root_attrs(self, *names: str) -> Dict[str, str]:
+        """根元素的属性，如系统消息 <sysmsg type="pat"> 的 type"""
+        tag = self.root_tag()
+        return self.attrs(tag, *names) if tag else {}
+
+
+# 被引用的xml消息中 appmsg 下的字段: (键名, 标签, 类型)
+QUOTE_APPMSG_FIELDS = (
+    ("Content", "title", str),
+    ("destination", "des", str),
+    ("action", "action", str),
+    ("XmlType", "type", int),
+    ("showtype", "showtype", int),
+    ("soundtype", "soundtype", int),
+    ("url", "url", str),
+    ("lowurl", "lowurl", str),
+    ("dataurl", "dataurl", str),
+    ("lowdataurl", "lowdataurl", str),
+    ("songlyric", "songlyric", str),
+    ("extinfo", "extinfo", str),
+    ("sourceusername", "sourceusername", str),
+    ("sourcedisplayname", "sourcedisplayname", str),
+    ("thumburl", "thumburl", str),
+    ("md5", "md5", str),
+    ("statextstr", "statextstr", str),
+    ("directshare", "directshare", int),
+)
+
+QUOTE_APPATTACH_FIELDS = (
+    ("totallen", "totallen", int),
+    ("attachid", "attachid", str),
+    ("emoticonmd5", "emoticonmd5", str),
+    ("fileext", "fileext", str),
+    ("cdnthumbaeskey", "cdnthumbaeskey", str),
+    ("aeskey", "aeskey", str),
+)
+
+
+def _read_fields(parent: Optional[ET.Element], fields) -> dict:
+    values = {}
+    for key, tag, kind in fields:
+        element = parent.find(tag) if parent is not None else None
+        if kind is int:
+            values[key] = int(element.text) if element is not None and element.text else 0
+        else:
+            values[key] = element.text if element is not None else ""
+    return values
+
+
+def parse_quote_appmsg(content: str) -> dict:
+    """解析被引用的xml消息，返回 QUOTE_APPMSG_FIELDS 中的字段和 appattach"""
+    appmsg = ET.fromstring(content).find("appmsg")
+    values = _read_fields(appmsg, QUOTE_APPMSG_FIELDS)
+    values["appattach"] = _read_fields(appmsg.find("appattach") if appmsg is not None else None,
+                                       QUOTE_APPATTACH_FIELDS)
+    return values
+
+
+class QuoteMessage(dict):
+    """引用消息中被引用的消息，message["Quote"]
+
+    被引用的是xml消息时，其内容要再解析一层XML才能得到标题、链接、附件等字段。
+    这些字段在第一次读取时才解析，只读 MsgType、FromWxid 等基本字段的插件不用付出解析的代价。
+    打印/记录日志不会触发解析。
+
+    Args:
+        fields (dict): 基本字段
+        appmsg (str, optional): 被引用消息的XML内容，需要延迟解析时传入
+    """
+
+    __slots__ = ("_appmsg",)
+
+    def __init__(self, fields: dict, appmsg: Optional[str] = None):
+        super().__init__(fields)
+        self._appmsg = appmsg
+
+    def load(self) -> "QuoteMessage":
+        """立即解析全部字段"""
+        if self._appmsg is not None:
+            appmsg, self._appmsg = self._appmsg, None
+            try:
+                self.update(parse_quote_appmsg(appmsg))
+            except Exception as e:
+                logger.error("解析被引用的消息失败: {}, 内容: {}", e, appmsg)
+        return self
+
+    def __getitem__(self, key):
+        self.load()
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        self.load()
+        return super().__contains__(key)
+
+    def __iter__(self):
+        self.load()
+        return super().__iter__()
+
+    def __len__(self):
+        self.load()
+        return super().__len__()
+
+    def __eq__(self, other):
+        self.load()
+        return super().__eq__(other)
+
+    __hash__ = None
+
+    def get(self, key, default=None):
+        self.load()
+        return super().get(key, default)
+
+    def keys(self):
+        self.load()
+        return super().keys()
+
+    def values(self):
+        self.load()
+        return super().values()
+
+    def items(self):
+        self.load()
+        return super().items()
+
+    def copy(self) -> "QuoteMessage":
+        return QuoteMessage(dict(super().items()), self._appmsg)
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        # EventManager 为每个插件深拷贝消息，未解析时原样带上XML内容，不提前解析
+        return QuoteMessage(copy.deepcopy(dict(super().items()), memo), self._appmsg)
+
+    def __reduce__(self):
+        return QuoteMessage, (dict(self.load().items()),)
@@ -0,0 +1,232 @@
+import asyncio
+import math
+import random
+import time
+import tomllib
+from collections import deque
+from functools import wraps
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from loguru import logger
+
+from database.keyvalDB import KeyvalDB
+
+# 限流键：按用户、按会话（群/私聊）、按指令
+KEY_FUNCS: Dict[str, Callable[[dict], str]] = {
+    "user": lambda message: message.get("SenderWxid", ""),
+    "chat": lambda message: message.get("FromWxid", ""),
+    "command": lambda message: str(message.get("Content", "")).strip().split(" ")[0],
+}
+
+
+def _default_storage() -> str:
+    with open("main_config.toml", "rb") as f:
+        main_config = tomllib.load(f)
+    return main_config.get("XYBot", {}).get("rate-limit-storage", "memory")
+
+
+class RateLimiter:
+    """限流器基类
+
+    Args:
+        name (str): 限流器名称，用作 KeyvalDB 中的键前缀
+        storage (str, optional): "memory" 或 "keyval"，默认读取 main_config.toml 中的 rate-limit-storage
+    """
+
+    def __init__(self, name: str, storage: Optional[str] = None):
+        self.name = name
+        self.storage = storage or _default_storage()
+        if self.storage not in ("memory", "keyval"):
+            raise ValueError(f"不支持的限流存储: {self.storage}")
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._noticed: Dict[str, float] = {}  # 键 -> 提醒过的限流到期时间，同一窗口内只提醒一次
+
+    def _lock(self, key: str) -> asyncio.Lock:
+        if key not in self._locks:
+            if len(self._locks) > 10000:
+                self._locks = {k: lock for k, lock in self._locks.items() if lock.locked()}
+            self._locks[key] = asyncio.Lock()
+        return self._locks[key]
+
+    def _db_key(self, key: str) -> str:
+        return f"ratelimit:{self.name}:{key}"
+
+    async def acquire(self, key: str) -> Tuple[bool, float]:
+        """尝试消耗一次额度
+
+        Returns:
+            Tuple[bool, float]: (是否允许, 被拒绝时还需等待的秒数)
+        """
+        if self.storage == "memory":
+            return self._acquire_memory(key)
+        return await self._acquire_keyval(key)
+
+    def _acquire_memory(self, key: str) -> Tuple[bool, float]:
+        raise NotImplementedError
+
+    async def _acquire_keyval(self, key: str) -> Tuple[bool, float]:
+        raise NotImplementedError
+
+
+class SlidingWindowLimiter(RateLimiter):
+    """滑动窗口限流，window 秒内最多 limit 次
+
+    内存存储记录每次调用的时间戳，结果精确；KeyvalDB 存储使用前后两个固定窗口的加权计数近似，
+    每次调用只需一次事务。
+    """
+
+    def __init__(self, name: str, limit: int, window: float, storage: Optional[str] = None):
+        super().__init__(name, storage)
+        self.limit = limit
+        self.window = window
+        self._hits: Dict[str, deque] = {}
+
+    def _acquire_memory(self, key: str) -> Tuple[bool, float]:
+        now = time.monotonic()
+        if len(self._hits) > 10000:
+            self._hits = {k: q for k, q in self._hits.items() if q and now - q[-1] < self.window}
+
+        hits = self._hits.setdefault(key, deque())
+        while hits and now - hits[0] >= self.window:
+            hits.popleft()
+        if len(hits) >= self.limit:
+            return False, hits[0] + self.window - now
+        hits.append(now)
+        return True, 0.0
+
+    async def _acquire_keyval(self, key: str) -> Tuple[bool, float]:
+        now = time.time()
+        window_id = int(now // self.window)
+        elapsed = now - window_id * self.window
+        db_key = self._db_key(key)
+        current_key = f"{db_key}:{window_id}"
+
+        db = KeyvalDB()
+        async with db.pipeline() as pipe:
+            pipe.get(f"{db_key}:{window_id - 1}")
+            pipe.incr(current_key, ex=int(self.window * 2) + 1)
+        previous, current = pipe.results
+
+        weighted = int(previous or 0) * (self.window - elapsed) / self.window + current
+        if weighted > self.limit:
+            # 先自增再检查，多进程同时请求也不会超出限额；被拒绝的调用撤销计数，与内存存储一样只记录允许的调用
+            await db.decr(current_key)
+            return False, self.window - elapsed
+        return True, 0.0
+
+
+class TokenBucketLimiter(RateLimiter):
+    """令牌桶限流，桶容量 capacity，每秒补充 rate 个令牌，允许短时间突发
+
+    KeyvalDB 存储用 compare_and_set 更新令牌数，多个进程共享同一个桶。
+    """
+
+    def __init__(self, name: str, capacity: int, rate: float, storage: Optional[str] = None):
+        super().__init__(name, storage)
+        self.capacity = capacity
+        self.rate = rate
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def _take(self, state: Optional[Tuple[float, float]], now: float) -> Tuple[bool, float, Tuple[float, float]]:
+        tokens, updated_at = state or (self.capacity, now)
+        tokens = min(self.capacity, tokens + (now - updated_at) * self.rate)
+        if tokens < 1:
+            return False, (1 - tokens) / self.rate, (tokens, now)
+        return True, 0.0, (tokens - 1, now)
+
+    def _acquire_memory(self, key: str) -> Tuple[bool, float]:
+        now = time.monotonic()
+        if len(self._buckets) > 10000:
+            full_after = self.capacity / self.rate
+            self._buckets = {k: s for k, s in self._buckets.items() if now - s[1] < full_after}
+
+        allowed, retry_after, self._buckets[key] = self._take(self._buckets.get(key), now)
+        return allowed, retry_after
+
+    async def _acquire_keyval(self, key: str) -> Tuple[bool, float]:
+        db = KeyvalDB()
+        db_key = self._db_key(key)
+        # 进程内的锁避免同一进程内的请求互相冲突；进程之间靠 compare_and_set 检测冲突，冲突时重新读取再试
+        async with self._lock(key):
+            for _ in range(10):
+                raw = await db.backend.get(db_key)  # 不经过读缓存，否则读到旧值会一直冲突
+                state = tuple(map(float, raw.split(":"))) if raw else None
+                allowed, retry_after, (tokens, now) = self._take(state, time.time())
+                if await db.compare_and_set(db_key, raw, f"{tokens}:{now}", ex=int(self.capacity / self.rate) + 1):
+                    return allowed, retry_after
+                await asyncio.sleep(random.uniform(0, 0.01))  # 错开同时重试的进程
+        logger.warning("限流: {} 更新 {} 的令牌桶冲突次数过多，本次拒绝", self.name, key)
+        return False, 1 / self.rate
+
+
+async def check_rate_limit(limiter: RateLimiter, bot, message: dict,
+                           key: Union[str, Callable[[dict], str]] = "user", notice: bool = True) -> bool:
+    """
+    消耗一次 message 对应的额度，用于在插件方法中间限流，例如扣积分、下载媒体之前
+
+    Args:
+        limiter (RateLimiter): 限流器
+        bot (WechatAPIClient): 被限流时用于提醒用户
+        message (dict): 消息
+        key (str | Callable): "user"、"chat"、"command"，或从消息中取键的函数. Defaults to "user".
+        notice (bool, optional): 被限流时是否提醒用户，同一窗口内只提醒一次. Defaults to True.
+
+    Returns:
+        bool: 是否允许
+    """
+    limit_key = (KEY_FUNCS[key] if isinstance(key, str) else key)(message)
+    allowed, retry_after = await limiter.acquire(limit_key)
+    if allowed:
+        return True
+
+    logger.debug("限流: {} 拒绝 {} {:.1f}秒后可用", limiter.name, limit_key, retry_after)
+    now = time.monotonic()
+    noticed = limiter._noticed
+    if notice and noticed.get(limit_key, 0) <= now:
+        if len(noticed) > 10000:
+            noticed.clear()
+        noticed[limit_key] = now + retry_after
+        await bot.send_at_message(message["FromWxid"],
+                                  f"\n-----XYBot-----\n😤操作太频繁啦，请{math.ceil(retry_after)}秒后再试",
+                                  [message["SenderWxid"]])
+    return False
+
+
+def rate_limit(
+        limiter: RateLimiter,
+        key: Union[str, Callable[[dict], str]] = "user",
+        commands: Optional[str] = None,
+        notice: bool = True
+) -> Callable:
+    """
+    限流装饰器，用于 (self, bot, message, ...) 形式的插件方法，超出限额时直接返回 False，不执行方法本身
+
+    需要在方法中间判断时（例如只限流会调用外部接口的消息）使用 check_rate_limit。
+
+    Args:
+        limiter (RateLimiter): 限流器
+        key (str | Callable): "user"、"chat"、"command"，或从消息中取键的函数. Defaults to "user".
+        commands (str, optional): 插件实例上保存指令列表的属性名，设置后只有指令消息计入限额
+        notice (bool, optional): 被限流时是否提醒用户，同一窗口内只提醒一次. Defaults to True.
+
+    例子:
+
+    - @rate_limit(SlidingWindowLimiter("music", limit=5, window=60), commands="command")
+    - @rate_limit(TokenBucketLimiter("dify", capacity=3, rate=0.1), key="chat")
+    """
+
+    def decorator(func: Callable):
+        @wraps(func)
+        async def wrapper(self, bot, message: dict, *args, **kwargs):
+            if commands is not None:
+                command = str(message.get("Content", "")).strip().split(" ")[0]
+                if command not in getattr(self, commands, ()):
+                    return await func(self, bot, message, *args, **kwargs)
+
+            if await check_rate_limit(limiter, bot, message, key, notice):
+                return await func(self, bot, message, *args, **kwargs)
+            return False
+
+        return wrapper
+
+    return decorator
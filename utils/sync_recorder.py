@@ -0,0 +1,130 @@
+import gzip
+import json
+import os
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from loguru import logger
+
+CAPTURE_VERSION = 1
+
+
+class SyncRecorder:
+    """把同步到的原始消息录制到 gzip 压缩的 JSONL 文件
+
+    每个文件第一行为文件头（机器人wxid等），之后每行一条 {"t": 接收时间, "m": 原始消息}。
+    单个文件超过 max_file_bytes（压缩后）时换新文件，文件数超过 max_files 时删除最旧的，占用空间不超过两者的乘积。
+    录制文件可用 python -m benchmarks.replay 回放。
+
+    注意：录制内容包含聊天记录和语音等原始数据，请妥善保管。
+
+    Args:
+        directory (str): 录制目录
+        max_file_bytes (int, optional): 单个文件的最大字节数. Defaults to 16 MB.
+        max_files (int, optional): 最多保留的文件数. Defaults to 8.
+        flush_interval (float, optional): 写入磁盘的间隔（秒）. Defaults to 5.
+    """
+
+    def __init__(self, directory: str, max_file_bytes: int = 16 * 1024 * 1024, max_files: int = 8,
+                 flush_interval: float = 5):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.flush_interval = flush_interval
+
+        self._raw_file = None
+        self._file: Optional[gzip.GzipFile] = None
+        self._path: Optional[Path] = None
+        self._wxid: Optional[str] = None
+        self._flushed_at = 0.0
+        # 文件序号接着已有的文件，重启后同一秒内新建的文件也排在后面
+        self._seq = max((_file_seq(path) for path in capture_files(self.directory)), default=0)
+        self.recorded = 0
+
+    def _open(self, wxid: str):
+        self._seq += 1
+        self._path = self.directory / f"sync-{time.strftime('%Y%m%d-%H%M%S')}-{self._seq:04d}.jsonl.gz"
+        self._raw_file = open(self._path, "wb")
+        self._file = gzip.GzipFile(filename="", mode="wb", fileobj=self._raw_file, compresslevel=6)
+        self._wxid = wxid
+        header = {"version": CAPTURE_VERSION, "wxid": wxid, "created": time.time()}
+        self._file.write(json.dumps(header, ensure_ascii=False).encode() + b"\n")
+        self._prune()
+
+    def _prune(self):
+        files = capture_files(self.directory)
+        for path in files[:max(0, len(files) - self.max_files)]:
+            try:
+                path.unlink()
+            except OSError as e:
+                logger.warning("删除旧的消息录制文件失败: {} {}", path, e)
+
+    def record(self, message: Dict[str, Any], wxid: str):
+        """录制一条原始消息，必须在消息被处理、修改之前调用
+
+        Args:
+            message (dict): sync_message 返回的 AddMsgs 中的一条
+            wxid (str): 机器人wxid，换号后新开文件
+        """
+        try:
+            if self._file is None or wxid != self._wxid or self._raw_file.tell() >= self.max_file_bytes:
+                self.close()
+                self._open(wxid)
+
+            line = json.dumps({"t": time.time(), "m": message}, ensure_ascii=False, separators=(",", ":"))
+            self._file.write(line.encode() + b"\n")
+            self.recorded += 1
+
+            now = time.monotonic()
+            if now - self._flushed_at >= self.flush_interval:
+                self._file.flush(zlib.Z_SYNC_FLUSH)  # 进程崩溃时最多丢失 flush_interval 秒的消息
+                self._flushed_at = now
+        except Exception as e:
+            logger.error("录制消息失败: {}", e)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._raw_file.close()
+            self._file = self._raw_file = None
+
+
+def _file_seq(path: Path) -> int:
+    seq = path.name.split(".")[0].rsplit("-", 1)[-1]
+    return int(seq) if seq.isdigit() else 0
+
+
+def capture_files(path: Union[str, os.PathLike]) -> List[Path]:
+    """录制目录中的文件，按录制顺序排列；path 为文件时只返回该文件"""
+    path = Path(path)
+    if path.is_file():
+        return [path]
+    return sorted(path.glob("sync-*.jsonl.gz"))
+
+
+def read_capture(path: Union[str, os.PathLike]) -> Iterator[Tuple[dict, float, Dict[str, Any]]]:
+    """按顺序读取录制的消息
+
+    Args:
+        path: 录制目录或单个录制文件
+
+    Yields:
+        Tuple[dict, float, dict]: (文件头, 接收时间, 原始消息)
+    """
+    for file in capture_files(path):
+        try:
+            with gzip.open(file, "rt", encoding="utf-8") as f:
+                header = None
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if header is None:
+                        header = record
+                        continue
+                    yield header, record["t"], record["m"]
+        except (EOFError, OSError, json.JSONDecodeError) as e:  # 最后一个文件可能还在写入或未正常关闭
+            logger.warning("录制文件不完整，跳过剩余内容: {} {}", file, e)
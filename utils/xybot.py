@@ -5,9 +5,19 @@ from typing import Dict, Any
 from loguru import logger
 
 from WechatAPI import WechatAPIClient
+from WechatAPI.Client.contact_directory import ContactDirectory
+from WechatAPI.Client.contact_store import ContactStore
+from WechatAPI.Client.image_optimizer import ImageOptimizer
+from WechatAPI.Client.media import SPOOL_THRESHOLD, decode_base64
 from WechatAPI.Client.protect import protector
+from WechatAPI.Client.video_transcoder import VideoTranscoder
 from database.messsagDB import MessageDB
 from utils.event_manager import EventManager
+from utils.member_index import ChatroomMemberIndex
+from utils.message_filter import MessageFilter
+from utils.message import Message, normalize_message
+from utils.message_xml import MessageXml, QuoteMessage, find_text
+from utils.sync_recorder import SyncRecorder
 
 
 class XYBot:
@@ -22,13 +32,61 @@ class XYBot:
             main_config = tomllib.load(f)
 
         self.ignore_protection = main_config.get("XYBot", {}).get("ignore-protection", False)
-
-        self.ignore_mode = main_config.get("XYBot", {}).get("ignore-mode", "")
-        self.whitelist = main_config.get("XYBot", {}).get("whitelist", [])
-        self.blacklist = main_config.get("XYBot", {}).get("blacklist", [])
+        self.eager_quote_parse = main_config.get("XYBot", {}).get("eager-quote-parse", False)
+        self.media_spool_threshold = main_config.get("XYBot", {}).get("media-spool-threshold", SPOOL_THRESHOLD)
+        self.media_spool_dir = main_config.get("XYBot", {}).get("media-spool-dir", "") or None
+        # 为True时图片、视频、文件消息的媒体字段与旧版本一样是base64字符串
+        self.media_content_base64 = main_config.get("XYBot", {}).get("media-content-base64", False)
+        self.message_filter = MessageFilter()
+        self.member_index = ChatroomMemberIndex()
+
+        contact_db_path = main_config.get("XYBot", {}).get("contactDB-path", "")
+        if contact_db_path and contact_db_path != self.bot.contact_store.path:
+            self.bot.contact_store.close()
+            self.bot.contact_store = ContactStore(path=contact_db_path)
+        contact_directory_path = main_config.get("XYBot", {}).get("contact-directory-path", "")
+        if contact_directory_path and contact_directory_path != self.bot.contact_directory.path:
+            self.bot.contact_directory = ContactDirectory(self.bot, path=contact_directory_path)
+
+        if main_config.get("XYBot", {}).get("image-optimize", False):
+            try:
+                self.bot.image_optimizer = ImageOptimizer(
+                    max_dimension=main_config["XYBot"].get("image-max-dimension", 1920),
+                    quality=main_config["XYBot"].get("image-quality", 85),
+                    min_bytes=main_config["XYBot"].get("image-optimize-min-bytes", 200 * 1024),
+                    workers=main_config["XYBot"].get("image-optimize-workers", 2))
+            except ImportError as e:
+                logger.warning("发送前压缩图片未启用: {}", e)
+
+        if main_config.get("XYBot", {}).get("video-transcode", False):
+            self.bot.video_transcoder = VideoTranscoder(
+                ffmpeg=main_config["XYBot"].get("ffmpeg-path", "ffmpeg"),
+                max_bitrate=main_config["XYBot"].get("video-max-bitrate", 1200),
+                target_size=main_config["XYBot"].get("video-target-size", 0),
+                max_height=main_config["XYBot"].get("video-max-height", 720),
+                concurrency=main_config["XYBot"].get("video-transcode-concurrency", 1),
+                timeout=main_config["XYBot"].get("video-transcode-timeout", 300))
+
+        self.sync_recorder = None
+        if main_config.get("XYBot", {}).get("sync-record", False):
+            self.sync_recorder = SyncRecorder(
+                directory=main_config["XYBot"].get("sync-record-dir", "logs/sync"),
+                max_file_bytes=main_config["XYBot"].get("sync-record-file-size", 16 * 1024 * 1024),
+                max_files=main_config["XYBot"].get("sync-record-files", 8))
+            logger.info("消息录制已开启: {}", self.sync_recorder.directory)
 
         self.msg_db = MessageDB()
 
+        # 处理方式 -> 处理函数，见 utils.message.MESSAGE_TYPES
+        self._handlers = {
+            "text": self.process_text_message,
+            "image": self.process_image_message,
+            "voice": self.process_voice_message,
+            "video": self.process_video_message,
+            "xml": self.process_xml_message,
+            "system": self.process_system_message,
+        }
+
     def update_profile(self, wxid: str, nickname: str, alias: str, phone: str):
         """更新机器人信息"""
         self.wxid = wxid
@@ -38,66 +96,33 @@ class XYBot:
 
     async def process_message(self, message: Dict[str, Any]):
         """处理接收到的消息"""
+        if self.sync_recorder is not None:  # 录制未经修改的原始消息，用于回放
+            self.sync_recorder.record(message, self.wxid)
 
-        msg_type = message.get("MsgType")
-
-        # 预处理消息
-        message["FromWxid"] = message.get("FromUserName", {}).get("string")
-        message.pop("FromUserName", None)
-        message["ToWxid"] = message.get("ToWxid", {}).get("string")
-
-        # 处理一下自己发的消息
-        if message.get("FromWxid") == self.wxid and message.get("ToWxid", "").endswith("@chatroom"):
-            message["FromWxid"], message["ToWxid"] = message["ToWxid"], message["FromWxid"]
+        # 预处理消息: 拆分 FromWxid/ToWxid/SenderWxid/IsGroup，转换为 Message
+        message, kind = normalize_message(message, self.wxid)
 
         # 根据消息类型触发不同的事件
-        if msg_type == 1:  # 文本消息
-            await self.process_text_message(message)
-        elif msg_type == 3:  # 图片消息
-            await self.process_image_message(message)
-        elif msg_type == 34:  # 语音消息
-            await self.process_voice_message(message)
-        elif msg_type == 43:  # 视频消息
-            await self.process_video_message(message)
-        elif msg_type == 49:  # xml消息
-            await self.process_xml_message(message)
-        elif msg_type == 10002:  # 系统消息
-            await self.process_system_message(message)
-        elif msg_type == 37:  # 好友请求
+        handler = self._handlers.get(kind)
+        if handler is not None:
+            # 被忽略的消息不保存、不解析；系统消息还要维护群成员索引，在处理函数中检查
+            if kind != "system" and not self.message_filter.check(message.FromWxid, message.SenderWxid, kind):
+                return
+            try:
+                await handler(message)
+            finally:
+                message.close()  # 消息处理结束，删除下载的附件/视频临时文件
+        elif kind == "friend_request":  # 好友请求
             if self.ignore_protection or not protector.check(14400):
                 await EventManager.emit("friend_request", self.bot, message)
             else:
                 logger.warning("风控保护: 新设备登录后4小时内请挂机")
-        elif msg_type == 51:
-            pass
-        else:
+        elif kind != "ignore":
             logger.info("未知的消息类型: {}", message)
 
-    async def process_text_message(self, message: Dict[str, Any]):
+    async def process_text_message(self, message: Message):
         """处理文本消息"""
-        message["Content"] = message.get("Content", {}).get("string", "")
-
-        if message["FromWxid"].endswith("@chatroom"):  # 群聊消息
-            message["IsGroup"] = True
-            split_content = message["Content"].split(":\n", 1)
-            if len(split_content) > 1:
-                message["Content"] = split_content[1]
-                message["SenderWxid"] = split_content[0]
-            else:
-                message["Content"] = split_content[0]
-                message["SenderWxid"] = self.wxid
-        else:
-            message["SenderWxid"] = message["FromWxid"]
-            if message["FromWxid"] == self.wxid:
-                message["FromWxid"] = message["ToWxid"]
-            message["IsGroup"] = False
-
-        try:
-            root = ET.fromstring(message.get("MsgSource", ""))
-            ats = root.find("atuserlist").text if root.find("atuserlist") is not None else ""
-        except Exception as e:
-            logger.error("解析文本消息失败: {}", e)
-            ats = ""
+        ats = find_text(message.get("MsgSource") or "", "msgsource/atuserlist") or ""
 
         if ats:
             ats = ats.strip(",").split(",")
@@ -118,42 +143,23 @@ class XYBot:
             logger.info("收到被@消息: 消息ID:{} 来自:{} 发送人:{} @:{} 内容:{}", 
                         message.get("MsgId", ""), message["FromWxid"], 
                         message["SenderWxid"], message["Ats"], message["Content"])
-            if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
-                if self.ignore_protection or not protector.check(14400):
-                    await EventManager.emit("at_message", self.bot, message)
-                else:
-                    logger.warning("风控保护: 新设备登录后4小时内请挂机")
+            if self.ignore_protection or not protector.check(14400):
+                await EventManager.emit("at_message", self.bot, message)
+            else:
+                logger.warning("风控保护: 新设备登录后4小时内请挂机")
             return
 
         logger.info("收到文本消息: 消息ID:{} 来自:{} 发送人:{} @:{} 内容:{}", 
                     message.get("MsgId", ""), message["FromWxid"], 
                     message["SenderWxid"], message["Ats"], message["Content"])
 
-        if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
-            if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("text_message", self.bot, message)
-            else:
-                logger.warning("风控保护: 新设备登录后4小时内请挂机")
-
-    async def process_image_message(self, message: Dict[str, Any]):
-        """处理图片消息"""
-        message["Content"] = message.get("Content", {}).get("string", "").replace("\n", "").replace("\t", "")
-
-        if message["FromWxid"].endswith("@chatroom"):
-            message["IsGroup"] = True
-            split_content = message["Content"].split(":", 1)
-            if len(split_content) > 1:
-                message["Content"] = split_content[1]
-                message["SenderWxid"] = split_content[0]
-            else:
-                message["Content"] = split_content[0]
-                message["SenderWxid"] = self.wxid
+        if self.ignore_protection or not protector.check(14400):
+            await EventManager.emit("text_message", self.bot, message)
         else:
-            message["SenderWxid"] = message["FromWxid"]
-            if message["FromWxid"] == self.wxid:
-                message["FromWxid"] = message["ToWxid"]
-            message["IsGroup"] = False
+            logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
+    async def process_image_message(self, message: Message):
+        """处理图片消息"""
         logger.info("收到图片消息: 消息ID:{} 来自:{} 发送人:{} XML:{}", 
                     message.get("MsgId", ""), message["FromWxid"], 
                     message["SenderWxid"], message["Content"])
@@ -167,45 +173,27 @@ class XYBot:
             is_group=message["IsGroup"]
         )
 
-        aeskey, cdnmidimgurl = None, None
-        try:
-            root = ET.fromstring(message["Content"])
-            img_element = root.find('img')
-            if img_element is not None:
-                aeskey = img_element.get('aeskey')
-                cdnmidimgurl = img_element.get('cdnmidimgurl')
-        except Exception as e:
-            logger.error("解析图片消息失败: {}, 内容: {}", e, message["Content"])
+        xml = MessageXml(message["Content"])
+        if xml.root_tag() is None:
+            logger.error("解析图片消息失败, 内容: {}", message["Content"])
             return
 
-        if aeskey and cdnmidimgurl:
-            message["Content"] = await self.bot.download_image(aeskey, cdnmidimgurl)
+        img_attrs = xml.attrs("msg/img", "aeskey", "cdnmidimgurl")
+        aeskey, cdnmidimgurl = img_attrs.get("aeskey"), img_attrs.get("cdnmidimgurl")
 
-        if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
-            if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("image_message", self.bot, message)
+        if aeskey and cdnmidimgurl:
+            if self.media_content_base64:
+                message["Content"] = await self.bot.download_image(aeskey, cdnmidimgurl)
             else:
-                logger.warning("风控保护: 新设备登录后4小时内请挂机")
+                message["Content"] = await self.bot.download_image_bytes(aeskey, cdnmidimgurl)
 
-    async def process_voice_message(self, message: Dict[str, Any]):
-        """处理语音消息"""
-        message["Content"] = message.get("Content", {}).get("string", "").replace("\n", "").replace("\t", "")
-
-        if message["FromWxid"].endswith("@chatroom"):
-            message["IsGroup"] = True
-            split_content = message["Content"].split(":", 1)
-            if len(split_content) > 1:
-                message["Content"] = split_content[1]
-                message["SenderWxid"] = split_content[0]
-            else:
-                message["Content"] = split_content[0]
-                message["SenderWxid"] = self.wxid
+        if self.ignore_protection or not protector.check(14400):
+            await EventManager.emit("image_message", self.bot, message)
         else:
-            message["SenderWxid"] = message["FromWxid"]
-            if message["FromWxid"] == self.wxid:
-                message["FromWxid"] = message["ToWxid"]
-            message["IsGroup"] = False
+            logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
+    async def process_voice_message(self, message: Message):
+        """处理语音消息"""
         logger.info("收到语音消息: 消息ID:{} 来自:{} 发送人:{} XML:{}", 
                     message.get("MsgId", ""), message["FromWxid"], 
                     message["SenderWxid"], message["Content"])
@@ -222,47 +210,28 @@ class XYBot:
         if message["IsGroup"] or not message.get("ImgBuf", {}).get("buffer", ""):
             voiceurl, length = None, None
             try:
-                root = ET.fromstring(message["Content"])
-                voicemsg_element = root.find('voicemsg')
-                if voicemsg_element is not None:
-                    voiceurl = voicemsg_element.get('voiceurl')
-                    length = int(voicemsg_element.get('length'))
+                voicemsg_attrs = MessageXml(message["Content"]).attrs("msg/voicemsg", "voiceurl", "length")
+                if voicemsg_attrs:
+                    voiceurl = voicemsg_attrs.get('voiceurl')
+                    length = int(voicemsg_attrs.get('length'))
             except Exception as e:
                 logger.error("解析语音消息失败: {}, 内容: {}", e, message["Content"])
                 return
 
             if voiceurl and length:
-                silk_base64 = await self.bot.download_voice(message["MsgId"], voiceurl, length)
-                message["Content"] = await self.bot.silk_base64_to_wav_byte(silk_base64)
+                silk_byte = await self.bot.download_voice_bytes(message["MsgId"], voiceurl, length)
+                message["Content"] = await self.bot.silk_byte_to_byte_wav_byte(silk_byte, message["MsgId"])
         else:
-            silk_base64 = message.get("ImgBuf", {}).get("buffer", "")
-            message["Content"] = await self.bot.silk_base64_to_wav_byte(silk_base64)
-
-        if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
-            if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("voice_message", self.bot, message)
-            else:
-                logger.warning("风控保护: 新设备登录后4小时内请挂机")
+            silk_byte = decode_base64(message.get("ImgBuf", {}).get("buffer", ""))
+            message["Content"] = await self.bot.silk_byte_to_byte_wav_byte(silk_byte, message.get("MsgId"))
 
-    async def process_xml_message(self, message: Dict[str, Any]):
-        """处理xml消息"""
-        message["Content"] = message.get("Content", {}).get("string", "").replace("\n", "").replace("\t", "")
-
-        if message["FromWxid"].endswith("@chatroom"):
-            message["IsGroup"] = True
-            split_content = message["Content"].split(":", 1)
-            if len(split_content) > 1:
-                message["Content"] = split_content[1]
-                message["SenderWxid"] = split_content[0]
-            else:
-                message["Content"] = split_content[0]
-                message["SenderWxid"] = self.wxid
+        if self.ignore_protection or not protector.check(14400):
+            await EventManager.emit("voice_message", self.bot, message)
         else:
-            message["SenderWxid"] = message["FromWxid"]
-            if message["FromWxid"] == self.wxid:
-                message["FromWxid"] = message["ToWxid"]
-            message["IsGroup"] = False
+            logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
+    async def process_xml_message(self, message: Message):
+        """处理xml消息"""
         # 保存消息到数据库（即使解析失败也保存）
         await self.msg_db.save_message(
             msg_id=int(message.get("MsgId", 0)),
@@ -273,103 +242,64 @@ class XYBot:
             is_group=message["IsGroup"]
         )
 
+        # 同一条消息的XML只解析一次，后续的引用/文件处理共用
+        xml = MessageXml(message["Content"])
         try:
-            root = ET.fromstring(message["Content"])
-            appmsg = root.find("appmsg")
-            if appmsg is None:
-                logger.warning("XML 中未找到 appmsg 节点，内容: {}", message["Content"])
+            type_text = xml.text("msg/appmsg/type")
+            if type_text is None:
+                logger.warning("XML 中未找到 appmsg/type 节点，内容: {}", message["Content"])
                 return
-            type_element = appmsg.find("type")
-            if type_element is None:
-                logger.warning("XML 中未找到 type 节点，内容: {}", message["Content"])
-                return
-            type_value = int(type_element.text)
+            type_value = int(type_text)
             logger.debug("解析到的 XML 类型: {}, 完整内容: {}", type_value, message["Content"])
-        except ET.ParseError as e:
-            logger.error("解析 XML 失败: {}, 完整内容: {}", e, message["Content"])
-            return
         except Exception as e:
             logger.error("处理 XML 时发生异常: {}, 完整内容: {}", e, message["Content"])
             return
 
         if type_value == 57:  # 引用消息
-            await self.process_quote_message(message)
+            await self.process_quote_message(message, xml)
         elif type_value == 6:  # 文件消息
-            await self.process_file_message(message)
+            await self.process_file_message(message, xml)
         elif type_value == 5:  # 公众号文章或链接分享消息
             logger.info("收到链接分享消息: 消息ID:{} 来自:{} 发送人:{} XML:{}", 
                         message.get("MsgId", ""), message["FromWxid"], 
                         message["SenderWxid"], message["Content"])
             logger.debug("完整 XML 内容: {}", message["Content"])
-            if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
-                if self.ignore_protection or not protector.check(14400):
-                    logger.debug("触发 article_message 事件: 消息ID: {}", message.get("MsgId", ""))
-                    await EventManager.emit("article_message", self.bot, message)
-                else:
-                    logger.warning("风控保护: 新设备登录后4小时内请挂机")
+            if self.ignore_protection or not protector.check(14400):
+                logger.debug("触发 article_message 事件: 消息ID: {}", message.get("MsgId", ""))
+                await EventManager.emit("article_message", self.bot, message)
+            else:
+                logger.warning("风控保护: 新设备登录后4小时内请挂机")
         elif type_value == 74:  # 文件消息，但还在上传，不用管
             logger.debug("收到上传中文件消息: 消息ID:{} 来自:{}", message.get("MsgId", ""), message["FromWxid"])
         else:
             logger.info("未知的 XML 消息类型: {}, 完整内容: {}", type_value, message["Content"])
 
-    async def process_quote_message(self, message: Dict[str, Any]):
+    async def process_quote_message(self, message: Message, xml: MessageXml = None):
         """处理引用消息"""
-        quote_message = {}
         try:
-            root = ET.fromstring(message["Content"])
-            appmsg = root.find("appmsg")
+            xml = xml or MessageXml(message["Content"])
+            appmsg = xml.root.find("appmsg")
             text = appmsg.find("title").text
             refermsg = appmsg.find("refermsg")
 
-            quote_message["MsgType"] = int(refermsg.find("type").text)
-
-            if quote_message["MsgType"] == 1:  # 文本消息
-                quote_message["NewMsgId"] = refermsg.find("svrid").text
-                quote_message["ToWxid"] = refermsg.find("fromusr").text
-                quote_message["FromWxid"] = refermsg.find("chatusr").text
-                quote_message["Nickname"] = refermsg.find("displayname").text
-                quote_message["MsgSource"] = refermsg.find("msgsource").text
-                quote_message["Content"] = refermsg.find("content").text
-                quote_message["Createtime"] = refermsg.find("createtime").text
-
-            elif quote_message["MsgType"] == 49:  # 引用消息
-                quote_message["NewMsgId"] = refermsg.find("svrid").text
-                quote_message["ToWxid"] = refermsg.find("fromusr").text
-                quote_message["FromWxid"] = refermsg.find("chatusr").text
-                quote_message["Nickname"] = refermsg.find("displayname").text
-                quote_message["MsgSource"] = refermsg.find("msgsource").text
-                quote_message["Createtime"] = refermsg.find("createtime").text
-
-                quote_message["Content"] = refermsg.find("content").text
-
-                quote_root = ET.fromstring(quote_message["Content"])
-                quote_appmsg = quote_root.find("appmsg")
-
-                quote_message["Content"] = quote_appmsg.find("title").text if isinstance(quote_appmsg.find("title"), ET.Element) else ""
-                quote_message["destination"] = quote_appmsg.find("des").text if isinstance(quote_appmsg.find("des"), ET.Element) else ""
-                quote_message["action"] = quote_appmsg.find("action").text if isinstance(quote_appmsg.find("action"), ET.Element) else ""
-                quote_message["XmlType"] = int(quote_appmsg.find("type").text) if isinstance(quote_appmsg.find("type"), ET.Element) else 0
-                quote_message["showtype"] = int(quote_appmsg.find("showtype").text) if isinstance(quote_appmsg.find("showtype"), ET.Element) else 0
-                quote_message["soundtype"] = int(quote_appmsg.find("soundtype").text) if isinstance(quote_appmsg.find("soundtype"), ET.Element) else 0
-                quote_message["url"] = quote_appmsg.find("url").text if isinstance(quote_appmsg.find("url"), ET.Element) else ""
-                quote_message["lowurl"] = quote_appmsg.find("lowurl").text if isinstance(quote_appmsg.find("lowurl"), ET.Element) else ""
-                quote_message["dataurl"] = quote_appmsg.find("dataurl").text if isinstance(quote_appmsg.find("dataurl"), ET.Element) else ""
-                quote_message["lowdataurl"] = quote_appmsg.find("lowdataurl").text if isinstance(quote_appmsg.find("lowdataurl"), ET.Element) else ""
-                quote_message["songlyric"] = quote_appmsg.find("songlyric").text if isinstance(quote_appmsg.find("songlyric"), ET.Element) else ""
-                quote_message["appattach"] = {}
-                quote_message["appattach"]["totallen"] = int(quote_appmsg.find("appattach").find("totallen").text) if isinstance(quote_appmsg.find("appattach").find("totallen"), ET.Element) else 0
-                quote_message["appattach"]["attachid"] = quote_appmsg.find("appattach").find("attachid").text if isinstance(quote_appmsg.find("appattach").find("attachid"), ET.Element) else ""
-                quote_message["appattach"]["emoticonmd5"] = quote_appmsg.find("appattach").find("emoticonmd5").text if isinstance(quote_appmsg.find("appattach").find("emoticonmd5"), ET.Element) else ""
-                quote_message["appattach"]["fileext"] = quote_appmsg.find("appattach").find("fileext").text if isinstance(quote_appmsg.find("appattach").find("fileext"), ET.Element) else ""
-                quote_message["appattach"]["cdnthumbaeskey"] = quote_appmsg.find("appattach").find("cdnthumbaeskey").text if isinstance(quote_appmsg.find("appattach").find("cdnthumbaeskey"), ET.Element) else ""
-                quote_message["appattach"]["aeskey"] = quote_appmsg.find("appattach").find("aeskey").text if isinstance(quote_appmsg.find("appattach").find("aeskey"), ET.Element) else ""
-                quote_message["extinfo"] = quote_appmsg.find("extinfo").text if isinstance(quote_appmsg.find("extinfo"), ET.Element) else ""
-                quote_message["sourceusername"] = quote_appmsg.find("sourceusername").text if isinstance(quote_appmsg.find("sourceusername"), ET.Element) else ""
-                quote_message["sourcedisplayname"] = quote_appmsg.find("sourcedisplayname").text if isinstance(quote_appmsg.find("sourcedisplayname"), ET.Element) else ""
-                quote_message["thumburl"] = quote_appmsg.find("thumburl").text if isinstance(quote_appmsg.find("thumburl"), ET.Element) else ""
-                quote_message["md5"] = quote_appmsg.find("md5").text if isinstance(quote_appmsg.find("md5"), ET.Element) else ""
-                quote_message["statextstr"] = quote_appmsg.find("statextstr").text if isinstance(quote_appmsg.find("statextstr"), ET.Element) else ""
-                quote_message["directshare"] = int(quote_appmsg.find("directshare").text) if isinstance(quote_appmsg.find("directshare"), ET.Element) else 0
+            quote_fields = {"MsgType": int(refermsg.find("type").text)}
+            appmsg_content = None
+
+            if quote_fields["MsgType"] in (1, 49):  # 文本消息 / xml消息
+                quote_fields["NewMsgId"] = refermsg.find("svrid").text
+                quote_fields["ToWxid"] = refermsg.find("fromusr").text
+                quote_fields["FromWxid"] = refermsg.find("chatusr").text
+                quote_fields["Nickname"] = refermsg.find("displayname").text
+                quote_fields["MsgSource"] = refermsg.find("msgsource").text
+                quote_fields["Content"] = refermsg.find("content").text
+                quote_fields["Createtime"] = refermsg.find("createtime").text
+
+            if quote_fields["MsgType"] == 49:  # 被引用的xml消息，标题/链接/附件等字段读取时再解析
+                appmsg_content = quote_fields["Content"]
+
+            quote_message = QuoteMessage(quote_fields, appmsg_content)
+            if self.eager_quote_parse:
+                quote_message.load()
 
         except Exception as e:
             logger.error("解析引用消息失败: {}, 完整内容: {}", e, message["Content"])
@@ -382,30 +312,12 @@ class XYBot:
                     message.get("MsgId", ""), message["FromWxid"], 
                     message["SenderWxid"], message["Content"], message["Quote"])
 
-        if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
-            if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("quote_message", self.bot, message)
-            else:
-                logger.warning("风控保护: 新设备登录后4小时内请挂机")
-
-    async def process_video_message(self, message):
-        message["Content"] = message.get("Content", {}).get("string", "")
-
-        if message["FromWxid"].endswith("@chatroom"):
-            message["IsGroup"] = True
-            split_content = message["Content"].split(":", 1)
-            if len(split_content) > 1:
-                message["Content"] = split_content[1]
-                message["SenderWxid"] = split_content[0]
-            else:
-                message["Content"] = split_content[0]
-                message["SenderWxid"] = self.wxid
+        if self.ignore_protection or not protector.check(14400):
+            await EventManager.emit("quote_message", self.bot, message)
         else:
-            message["SenderWxid"] = message["FromWxid"]
-            if message["FromWxid"] == self.wxid:
-                message["FromWxid"] = message["ToWxid"]
-            message["IsGroup"] = False
+            logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
+    async def process_video_message(self, message: Message):
         logger.info("收到视频消息: 消息ID:{} 来自:{} 发送人:{} XML:{}", 
                     message.get("MsgId", ""), message["FromWxid"], 
                     message["SenderWxid"], message["Content"])
@@ -419,23 +331,24 @@ class XYBot:
             is_group=message["IsGroup"]
         )
 
-        message["Video"] = await self.bot.download_video(message.get("MsgId", 0))
+        if self.media_content_base64:
+            message["Video"] = await self.bot.download_video(message.get("MsgId", 0))
+        else:
+            message["Video"] = await self.bot.download_video_media(message.get("MsgId", 0), self.media_spool_threshold,
+                                                                   self.media_spool_dir)
 
-        if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
-            if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("video_message", self.bot, message)
-            else:
-                logger.warning("风控保护: 新设备登录后4小时内请挂机")
+        if self.ignore_protection or not protector.check(14400):
+            await EventManager.emit("video_message", self.bot, message)
+        else:
+            logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
-    async def process_file_message(self, message: Dict[str, Any]):
+    async def process_file_message(self, message: Message, xml: MessageXml = None):
         """处理文件消息"""
-        try:
-            root = ET.fromstring(message["Content"])
-            filename = root.find("appmsg").find("title").text
-            attach_id = root.find("appmsg").find("appattach").find("attachid").text
-            file_extend = root.find("appmsg").find("appattach").find("fileext").text
-        except Exception as e:
-            logger.error("解析文件消息失败: {}, 内容: {}", e, message["Content"])
+        xml = xml or MessageXml(message["Content"])
+        filename, attach_id, file_extend = xml.texts("msg/appmsg/title", "msg/appmsg/appattach/attachid",
+                                                     "msg/appmsg/appattach/fileext")
+        if attach_id is None:
+            logger.error("解析文件消息失败, 内容: {}", message["Content"])
             return
 
         message["Filename"] = filename
@@ -454,62 +367,55 @@ class XYBot:
             is_group=message["IsGroup"]
         )
 
-        message["File"] = await self.bot.download_attach(attach_id)
+        if self.media_content_base64:
+            message["File"] = await self.bot.download_attach(attach_id)
+        else:
+            message["File"] = await self.bot.download_attach_media(attach_id, self.media_spool_threshold,
+                                                                   self.media_spool_dir)
 
-        if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
-            if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("file_message", self.bot, message)
-            else:
-                logger.warning("风控保护: 新设备登录后4小时内请挂机")
+        if self.ignore_protection or not protector.check(14400):
+            await EventManager.emit("file_message", self.bot, message)
+        else:
+            logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
-    async def process_system_message(self, message: Dict[str, Any]):
+    async def process_system_message(self, message: Message):
         """处理系统消息"""
-        message["Content"] = message.get("Content", {}).get("string", "")
-
-        if message["FromWxid"].endswith("@chatroom"):
-            message["IsGroup"] = True
-            split_content = message["Content"].split(":", 1)
-            if len(split_content) > 1:
-                message["Content"] = split_content[1]
-                message["SenderWxid"] = split_content[0]
-            else:
-                message["Content"] = split_content[0]
-                message["SenderWxid"] = self.wxid
-        else:
-            message["SenderWxid"] = message["FromWxid"]
-            if message["FromWxid"] == self.wxid:
-                message["FromWxid"] = message["ToWxid"]
-            message["IsGroup"] = False
+        xml = MessageXml(message["Content"])
+        msg_type = xml.root_attrs("type").get("type")
+        if msg_type is None:
+            logger.error("解析系统消息失败, 内容: {}", message["Content"])
+            return
 
-        try:
-            root = ET.fromstring(message["Content"])
-            msg_type = root.attrib["type"]
-        except Exception as e:
-            logger.error("解析系统消息失败: {}, 内容: {}", e, message["Content"])
+        # 被忽略的群也要根据进群/退群消息维护成员索引
+        if msg_type == "sysmsgtemplate" and message["IsGroup"]:
+            try:
+                self.member_index.apply_system_message(message["FromWxid"], xml.root)
+            except ET.ParseError as e:
+                logger.error("解析系统消息失败: {}, 内容: {}", e, message["Content"])
+            if "修改群名为" in message["Content"]:  # 群名变更，群资料缓存失效
+                self.bot.contact_store.invalidate(message["FromWxid"])
+
+        if not self.message_filter.check(message["FromWxid"], message["SenderWxid"], "system"):
             return
 
         if msg_type == "pat":
-            await self.process_pat_message(message)
+            await self.process_pat_message(message, xml)
         elif msg_type == "ClientCheckGetExtInfo":
             pass
         else:
             logger.info("收到系统消息: {}, 完整内容: {}", message, message["Content"])
-            if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
-                if self.ignore_protection or not protector.check(14400):
-                    await EventManager.emit("system_message", self.bot, message)
-                else:
-                    logger.warning("风控保护: 新设备登录后4小时内请挂机")
+            if self.ignore_protection or not protector.check(14400):
+                await EventManager.emit("system_message", self.bot, message)
+            else:
+                logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
-    async def process_pat_message(self, message: Dict[str, Any]):
+    async def process_pat_message(self, message: Message, xml: MessageXml = None):
         """处理拍一拍请求消息"""
-        try:
-            root = ET.fromstring(message["Content"])
-            pat = root.find("pat")
-            patter = pat.find("fromusername").text
-            patted = pat.find("pattedusername").text
-            pat_suffix = pat.find("patsuffix").text
-        except Exception as e:
-            logger.error("解析拍一拍消息失败: {}, 内容: {}", e, message["Content"])
+        xml = xml or MessageXml(message["Content"])
+        patter, patted, pat_suffix = xml.texts("sysmsg/pat/fromusername", "sysmsg/pat/pattedusername",
+                                               "sysmsg/pat/patsuffix")
+        if patter is None:
+            logger.error("解析拍一拍消息失败, 内容: {}", message["Content"])
             return
 
         message["Patter"] = patter
@@ -530,16 +436,11 @@ class XYBot:
             is_group=message["IsGroup"]
         )
 
-        if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
-            if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("pat_message", self.bot, message)
-            else:
-                logger.warning("风控保护: 新设备登录后4小时内请挂机")
-
-    def ignore_check(self, FromWxid: str, SenderWxid: str):
-        if self.ignore_mode == "Whitelist":
-            return (FromWxid in self.whitelist) or (SenderWxid in self.whitelist)
-        elif self.ignore_mode == "blacklist":
-            return (FromWxid not in self.blacklist) and (SenderWxid not in self.blacklist)
+        if self.ignore_protection or not protector.check(14400):
+            await EventManager.emit("pat_message", self.bot, message)
         else:
-            return True
\ No newline at end of file
+            logger.warning("风控保护: 新设备登录后4小时内请挂机")
+
+    def ignore_check(self, FromWxid: str, SenderWxid: str) -> bool:
+        """是否处理来自 FromWxid/SenderWxid 的消息，见 utils.message_filter"""
+        return self.message_filter.check(FromWxid, SenderWxid)